@@ -2,28 +2,34 @@
 Alarms API endpoints.
 """
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select, func, and_
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.core.database import get_db
-from app.models import Alarm, Device
+from app.core.database import get_db, get_read_db
+from app.api.pagination import Keyset
+from app.models import Alarm
 from app.schemas import AlarmCreate, AlarmResponse, AlarmAcknowledge
+from app.services.device_registry import device_registry
+
+ALARM_ORDER = Keyset(Alarm.ts_open, Alarm.id, descending=True)
 
 router = APIRouter(prefix="/alarms", tags=["Alarms"])
 
 
 @router.get("", response_model=list[AlarmResponse])
 async def list_alarms(
+    response: Response,
     device_id: str | None = None,
     severity: str | None = None,
     active_only: bool = True,
     acknowledged: bool | None = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=500),
-    db: AsyncSession = Depends(get_db)
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List alarms with filters."""
+    """List alarms with filters, newest first. Pass the X-Next-Cursor header back as cursor for the next page."""
     query = select(Alarm).options(selectinload(Alarm.device))
     
     conditions = []
@@ -39,13 +45,13 @@ async def list_alarms(
     if conditions:
         query = query.where(and_(*conditions))
     
-    query = query.order_by(Alarm.ts_open.desc()).offset(skip).limit(limit)
+    query = ALARM_ORDER.apply(query, cursor, skip, limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return ALARM_ORDER.page(result.scalars().all(), limit, response)
 
 
 @router.get("/summary")
-async def get_alarm_summary(db: AsyncSession = Depends(get_db)):
+async def get_alarm_summary(db: AsyncSession = Depends(get_read_db)):
     """Get alarm counts by severity."""
     query = select(
         Alarm.severity,
@@ -66,7 +72,7 @@ async def get_alarm_summary(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{alarm_id}", response_model=AlarmResponse)
-async def get_alarm(alarm_id: str, db: AsyncSession = Depends(get_db)):
+async def get_alarm(alarm_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get alarm details."""
     result = await db.execute(
         select(Alarm).options(selectinload(Alarm.device)).where(Alarm.id == alarm_id)
@@ -83,8 +89,7 @@ async def get_alarm(alarm_id: str, db: AsyncSession = Depends(get_db)):
 async def create_alarm(alarm_data: AlarmCreate, db: AsyncSession = Depends(get_db)):
     """Create a new alarm."""
     # Verify device exists
-    result = await db.execute(select(Device.id).where(Device.id == alarm_data.device_id))
-    if not result.scalar_one_or_none():
+    if not await device_registry.ensure_exists(db, alarm_data.device_id):
         raise HTTPException(status_code=404, detail="Device not found")
     
     alarm = Alarm(**alarm_data.model_dump())
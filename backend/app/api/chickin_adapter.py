@@ -25,6 +25,7 @@ from app.schemas import (
     ChickinFlockResponse,
 )
 from app.services.chickin_client import chickin_client, ChickinUpstreamError
+from app.services.device_registry import device_registry
 
 logger = logging.getLogger(__name__)
 
@@ -168,6 +169,8 @@ async def chickin_get_flock(
     existing = result.scalar_one_or_none()
 
     if existing:
+        if flock_data.get("part_number") not in (None, existing.part_number):
+            await device_registry.mark_stale()
         for key in ("name", "part_number", "device_name", "type", "type_code",
                      "version", "version_code", "mode", "day", "population",
                      "connected", "actual_temperature", "ideal_temperature",
@@ -218,6 +221,8 @@ async def chickin_get_flock(
                 features=flock_data.get("features", {}),
             )
             db.add(new_flock)
+            if new_flock.part_number:
+                await device_registry.mark_stale()
 
     await db.flush()
     return flock_data
@@ -1,14 +1,17 @@
 """
 Coops/Kandang API endpoints.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.api.pagination import Keyset
 from app.models import Coop
 from app.schemas import CoopCreate, CoopUpdate, CoopResponse, CoopDetail
 
+COOP_ORDER = Keyset(Coop.name, Coop.id)
+
 router = APIRouter(prefix="/coops", tags=["Coops"])
 
 
@@ -21,15 +24,17 @@ def _coop_to_response(coop: Coop) -> CoopResponse:
 
 @router.get("", response_model=list[CoopResponse])
 async def list_coops(
+    response: Response,
     province: str | None = None,
     regency: str | None = None,
     active: bool | None = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List kandang/coops with optional filters."""
-    query = select(Coop).options(selectinload(Coop.flocks)).order_by(Coop.name)
+    """List kandang/coops with optional filters, cursor-paginated by name."""
+    query = select(Coop).options(selectinload(Coop.flocks))
 
     if province:
         query = query.where(Coop.province == province)
@@ -38,14 +43,14 @@ async def list_coops(
     if active is not None:
         query = query.where(Coop.active == active)
 
-    query = query.offset(skip).limit(limit)
+    query = COOP_ORDER.apply(query, cursor, skip, limit)
     result = await db.execute(query)
-    coops = result.scalars().all()
+    coops = COOP_ORDER.page(result.scalars().all(), limit, response)
     return [_coop_to_response(coop) for coop in coops]
 
 
 @router.get("/{coop_id}", response_model=CoopDetail)
-async def get_coop(coop_id: str, db: AsyncSession = Depends(get_db)):
+async def get_coop(coop_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get kandang detail with flock data."""
     result = await db.execute(
         select(Coop)
@@ -111,7 +116,7 @@ async def delete_coop(coop_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/map/data")
-async def get_coops_map_data(db: AsyncSession = Depends(get_db)):
+async def get_coops_map_data(db: AsyncSession = Depends(get_read_db)):
     """Get kandang map data with farm-specific summary."""
     result = await db.execute(
         select(Coop).options(selectinload(Coop.flocks)).order_by(Coop.name)
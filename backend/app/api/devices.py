@@ -2,32 +2,51 @@
 Devices API endpoints.
 """
 from datetime import datetime
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select, func, or_
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.api.filters import json_object_param
+from app.api.pagination import Keyset
 from app.core.redis import redis_manager
 from app.models import Device, Site, Command
+from app.models.models import json_contains
 from app.schemas import (
     DeviceCreate, DeviceUpdate, DeviceResponse, DeviceDetail,
     CommandCreate, CommandResponse
 )
+from app.services.command_tracker import command_tracker
+from app.services.device_registry import device_registry
+from app.services.latest_values import latest_cache
+from app.services.metric_catalog import metric_catalog
 from app.services.mqtt_service import mqtt_service
+from app.services.shadow_store import shadow_store
+
+DEVICE_ORDER = Keyset(Device.name, Device.id)
+COMMAND_ORDER = Keyset(Command.ts_sent, Command.id, descending=True)
 
 router = APIRouter(prefix="/devices", tags=["Devices"])
 
 
 @router.get("", response_model=list[DeviceResponse])
 async def list_devices(
+    response: Response,
     site_id: str | None = None,
     type: str | None = None,
     status: str | None = None,
     search: str | None = None,
+    meta: str | None = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db)
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List devices with filters."""
+    """
+    List devices with filters. meta is a JSON object the device metadata must
+    contain, e.g. meta={"vendor":"chickin"}. Pass the X-Next-Cursor header
+    back as cursor for the next page.
+    """
+    meta_filter = json_object_param(meta, "meta")
     query = select(Device)
     
     if site_id:
@@ -43,10 +62,12 @@ async def list_devices(
                 Device.device_key.ilike(f"%{search}%")
             )
         )
+    if meta_filter:
+        query = query.where(json_contains(Device.meta_data, meta_filter))
     
-    query = query.order_by(Device.name).offset(skip).limit(limit)
+    query = DEVICE_ORDER.apply(query, cursor, skip, limit)
     result = await db.execute(query)
-    devices = result.scalars().all()
+    devices = DEVICE_ORDER.page(result.scalars().all(), limit, response)
     
     # Update status from Redis for real-time accuracy
     for device in devices:
@@ -56,7 +77,7 @@ async def list_devices(
 
 
 @router.get("/types")
-async def get_device_types(db: AsyncSession = Depends(get_db)):
+async def get_device_types(db: AsyncSession = Depends(get_read_db)):
     """Get distinct device types with counts."""
     query = select(Device.type, func.count(Device.id)).group_by(Device.type)
     result = await db.execute(query)
@@ -64,7 +85,7 @@ async def get_device_types(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/{device_id}", response_model=DeviceDetail)
-async def get_device(device_id: str, db: AsyncSession = Depends(get_db)):
+async def get_device(device_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get device details with shadow state."""
     result = await db.execute(
         select(Device).where(Device.id == device_id).options()
@@ -99,6 +120,7 @@ async def create_device(device_data: DeviceCreate, db: AsyncSession = Depends(ge
     db.add(device)
     await db.flush()
     await db.refresh(device)
+    await device_registry.upsert(device)
     return device
 
 
@@ -129,6 +151,7 @@ async def update_device(
     device.updated_at = datetime.utcnow()
     await db.flush()
     await db.refresh(device)
+    await device_registry.upsert(device)
     return device
 
 
@@ -142,6 +165,13 @@ async def delete_device(device_id: str, db: AsyncSession = Depends(get_db)):
         raise HTTPException(status_code=404, detail="Device not found")
     
     await db.delete(device)
+    # Commit before forgetting: until then ingest still sees the row and
+    # filter_known would put the device straight back in the registry
+    await db.commit()
+    await device_registry.remove(device_id)
+    shadow_store.forget(device_id)
+    latest_cache.forget(device_id)
+    metric_catalog.forget(device_id)
 
 
 @router.post("/{device_id}/commands", response_model=CommandResponse, status_code=201)
@@ -151,14 +181,12 @@ async def send_command(
     db: AsyncSession = Depends(get_db)
 ):
     """Send command to device."""
-    # Verify device exists
-    result = await db.execute(select(Device).where(Device.id == device_id))
-    device = result.scalar_one_or_none()
-    
-    if not device:
+    # Verify device exists (registry lookup, no query on hit)
+    if not await device_registry.ensure_exists(db, device_id):
         raise HTTPException(status_code=404, detail="Device not found")
     
-    if not device.site_id:
+    site_id = device_registry.site_of(device_id)
+    if not site_id:
         raise HTTPException(status_code=400, detail="Device has no site assigned")
     
     # Create command record
@@ -171,6 +199,8 @@ async def send_command(
     db.add(command)
     await db.flush()
     await db.refresh(command)
+    # Commit before publishing so a fast device ack finds the row
+    await db.commit()
     
     # Publish to MQTT
     mqtt_payload = {
@@ -178,7 +208,14 @@ async def send_command(
         "type": command.command_type,
         "payload": command.payload
     }
-    await mqtt_service.publish_command(device.site_id, device.id, mqtt_payload)
+    try:
+        await mqtt_service.publish_command(site_id, device_id, mqtt_payload)
+    except Exception as e:
+        print(f"MQTT: Command {command.id} not acknowledged by broker: {e!r}")
+        command.status = "failed"
+        await db.flush()
+    else:
+        command_tracker.track(command.id, command.ts_sent)
     
     return command
 
@@ -186,16 +223,18 @@ async def send_command(
 @router.get("/{device_id}/commands", response_model=list[CommandResponse])
 async def get_device_commands(
     device_id: str,
+    response: Response,
     status: str | None = None,
     limit: int = Query(50, ge=1, le=200),
-    db: AsyncSession = Depends(get_db)
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get command history for a device."""
+    """Get command history for a device, newest first (cursor-paginated)."""
     query = select(Command).where(Command.device_id == device_id)
     
     if status:
         query = query.where(Command.status == status)
     
-    query = query.order_by(Command.ts_sent.desc()).limit(limit)
+    query = COMMAND_ORDER.apply(query, cursor, 0, limit)
     result = await db.execute(query)
-    return result.scalars().all()
+    return COMMAND_ORDER.page(result.scalars().all(), limit, response)
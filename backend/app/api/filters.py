@@ -0,0 +1,18 @@
+"""
+Query-string filters shared by list endpoints.
+"""
+import json
+from fastapi import HTTPException
+
+
+def json_object_param(raw: str | None, name: str) -> dict | None:
+    """Parse a JSON object passed as a query parameter, e.g. meta={"vendor":"chickin"}."""
+    if raw is None:
+        return None
+    try:
+        doc = json.loads(raw)
+    except ValueError:
+        doc = None
+    if not isinstance(doc, dict) or not doc:
+        raise HTTPException(status_code=400, detail=f"{name} must be a non-empty JSON object")
+    return doc
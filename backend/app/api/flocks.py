@@ -5,8 +5,10 @@ from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import selectinload
-from app.core.database import get_db
+from app.api.filters import json_object_param
+from app.core.database import get_db, get_read_db
 from app.models import Coop, Flock, DailyMetric, MaintenanceLog
+from app.models.models import json_contains
 from app.schemas import (
     FlockCreate,
     FlockUpdate,
@@ -17,6 +19,7 @@ from app.schemas import (
     MaintenanceLogCreate,
     MaintenanceLogResponse,
 )
+from app.services.device_registry import device_registry
 
 router = APIRouter(prefix="/flocks", tags=["Flocks"])
 
@@ -25,23 +28,34 @@ router = APIRouter(prefix="/flocks", tags=["Flocks"])
 async def list_flocks(
     coop_id: str | None = None,
     connected: bool | None = None,
+    sensors: str | None = None,
+    features: str | None = None,
     limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """List flocks with optional coop and connection filters."""
+    """
+    List flocks with optional coop and connection filters. sensors / features
+    are JSON objects the flock's sensors / features must contain.
+    """
+    sensors_filter = json_object_param(sensors, "sensors")
+    features_filter = json_object_param(features, "features")
     query = select(Flock).order_by(Flock.name).limit(limit)
 
     if coop_id:
         query = query.where(Flock.coop_id == coop_id)
     if connected is not None:
         query = query.where(Flock.connected == connected)
+    if sensors_filter:
+        query = query.where(json_contains(Flock.sensors, sensors_filter))
+    if features_filter:
+        query = query.where(json_contains(Flock.features, features_filter))
 
     result = await db.execute(query)
     return result.scalars().all()
 
 
 @router.get("/{flock_id}", response_model=FlockDetail)
-async def get_flock(flock_id: str, db: AsyncSession = Depends(get_db)):
+async def get_flock(flock_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get flock detail with daily metrics and maintenance logs."""
     result = await db.execute(
         select(Flock)
@@ -70,6 +84,8 @@ async def create_flock(body: FlockCreate, db: AsyncSession = Depends(get_db)):
     db.add(flock)
     await db.flush()
     await db.refresh(flock)
+    if flock.part_number:
+        await device_registry.mark_stale()
     return flock
 
 
@@ -82,11 +98,14 @@ async def update_flock(flock_id: str, body: FlockUpdate, db: AsyncSession = Depe
     if not flock:
         raise HTTPException(status_code=404, detail="Flock not found")
 
-    for key, value in body.model_dump(exclude_unset=True).items():
+    update_data = body.model_dump(exclude_unset=True)
+    for key, value in update_data.items():
         setattr(flock, key, value)
 
     await db.flush()
     await db.refresh(flock)
+    if update_data.keys() & {"part_number", "floor_index", "deleted"}:
+        await device_registry.mark_stale()
     return flock
 
 
@@ -94,7 +113,7 @@ async def update_flock(flock_id: str, body: FlockUpdate, db: AsyncSession = Depe
 async def list_daily_metrics(
     flock_id: str,
     limit: int = Query(30, ge=1, le=365),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """List daily production metrics for a flock."""
     query = (
@@ -142,7 +161,7 @@ async def create_daily_metric(
 async def list_maintenance_logs(
     flock_id: str,
     limit: int = Query(50, ge=1, le=200),
-    db: AsyncSession = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """List maintenance logs for a flock."""
     query = (
@@ -0,0 +1,66 @@
+"""
+Keyset (cursor) pagination for list endpoints.
+A page is fetched with WHERE (sort key) > (sort key of the previous page's
+last row) instead of OFFSET, so deep pages cost the same as the first one and
+concurrent inserts never shift rows between pages. The cursor is opaque to
+clients: URL-safe base64 of the JSON-encoded key of the last row. The next
+page's cursor is returned in the X-Next-Cursor response header (absent on the
+last page), which keeps the list response bodies unchanged.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+from fastapi import HTTPException, Response
+from sqlalchemy import tuple_
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+class Keyset:
+    """Ordering key of a list endpoint, e.g. Keyset(Device.name, Device.id)."""
+
+    def __init__(self, *columns, descending: bool = False):
+        self.columns = columns
+        self.descending = descending
+
+    def encode(self, row) -> str:
+        values = [getattr(row, column.key) for column in self.columns]
+        raw = json.dumps([v.isoformat() if isinstance(v, datetime) else v for v in values])
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+    def decode(self, cursor: str) -> list:
+        try:
+            raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+            values = json.loads(raw)
+            if not isinstance(values, list) or len(values) != len(self.columns):
+                raise ValueError
+            return [
+                datetime.fromisoformat(value) if column.type.python_type is datetime else value
+                for column, value in zip(self.columns, values)
+            ]
+        except (binascii.Error, ValueError, TypeError):
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    def apply(self, query, cursor: str | None, skip: int, limit: int):
+        """
+        Order query by the key and select one page. With a cursor the page
+        starts after it; otherwise skip (offset) is honoured for compatibility.
+        One extra row is fetched so page() can tell whether more rows follow.
+        """
+        key = tuple_(*self.columns)
+        if cursor:
+            after = self.decode(cursor)
+            query = query.where(key < tuple(after) if self.descending else key > tuple(after))
+        elif skip:
+            query = query.offset(skip)
+        order = [column.desc() if self.descending else column.asc() for column in self.columns]
+        return query.order_by(*order).limit(limit + 1)
+
+    def page(self, rows, limit: int, response: Response) -> list:
+        """Trim the look-ahead row and set X-Next-Cursor when another page exists."""
+        rows = list(rows)
+        if len(rows) > limit:
+            rows = rows[:limit]
+            response.headers[NEXT_CURSOR_HEADER] = self.encode(rows[-1])
+        return rows
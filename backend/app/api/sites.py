@@ -1,35 +1,40 @@
 """
 Sites API endpoints.
 """
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
+from app.core.database import get_db, get_read_db
+from app.api.pagination import Keyset
 from app.models import Site, Device
 from app.schemas import SiteCreate, SiteUpdate, SiteResponse, SiteWithDevices
 
+SITE_ORDER = Keyset(Site.name, Site.id)
+
 router = APIRouter(prefix="/sites", tags=["Sites"])
 
 
 @router.get("", response_model=list[SiteResponse])
 async def list_sites(
+    response: Response,
     region: str | None = None,
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: AsyncSession = Depends(get_db)
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """List all sites with optional region filter."""
+    """List all sites with optional region filter, cursor-paginated by name."""
     query = select(Site)
     
     if region:
         query = query.where(Site.region == region)
     
-    query = query.offset(skip).limit(limit)
+    query = SITE_ORDER.apply(query, cursor, skip, limit)
     result = await db.execute(query)
-    sites = result.scalars().all()
+    sites = SITE_ORDER.page(result.scalars().all(), limit, response)
     
     # Get device counts
-    response = []
+    items = []
     for site in sites:
         count_query = select(func.count(Device.id)).where(Device.site_id == site.id)
         count_result = await db.execute(count_query)
@@ -37,13 +42,13 @@ async def list_sites(
         
         site_data = SiteResponse.model_validate(site)
         site_data.device_count = device_count
-        response.append(site_data)
+        items.append(site_data)
     
-    return response
+    return items
 
 
 @router.get("/{site_id}", response_model=SiteWithDevices)
-async def get_site(site_id: str, db: AsyncSession = Depends(get_db)):
+async def get_site(site_id: str, db: AsyncSession = Depends(get_read_db)):
     """Get site details with devices."""
     result = await db.execute(select(Site).where(Site.id == site_id))
     site = result.scalar_one_or_none()
@@ -102,7 +107,7 @@ async def delete_site(site_id: str, db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/map/data")
-async def get_sites_map_data(db: AsyncSession = Depends(get_db)):
+async def get_sites_map_data(db: AsyncSession = Depends(get_read_db)):
     """Get minimal site data for map display."""
     query = select(Site.id, Site.name, Site.latitude, Site.longitude, Site.region)
     result = await db.execute(query)
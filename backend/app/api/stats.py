@@ -4,16 +4,29 @@ Stats/Overview API endpoints for dashboard KPIs.
 from fastapi import APIRouter, Depends
 from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
+from app.core.database import get_read_db
 from app.core.redis import redis_manager
 from app.models import Site, Device, Alarm
 from app.schemas import OverviewStats
+from app.services.archive import telemetry_archive
+from app.services.aggregation import time_bucket
+from app.services.command_tracker import command_tracker
+from app.services.device_registry import device_registry
+from app.services.latest_values import latest_cache
+from app.services.metric_catalog import metric_catalog
+from app.services.metric_dictionary import metric_dictionary
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.retention import retention_job
+from app.services.shadow_store import shadow_store
+from app.services.status_writer import status_writer
+from app.services.telemetry_writer import telemetry_writer
+from app.services.topic_router import topic_router
 
 router = APIRouter(prefix="/stats", tags=["Stats"])
 
 
 @router.get("/overview", response_model=OverviewStats)
-async def get_overview_stats(db: AsyncSession = Depends(get_db)):
+async def get_overview_stats(db: AsyncSession = Depends(get_read_db)):
     """Get dashboard overview statistics."""
     
     # Total sites
@@ -56,7 +69,7 @@ async def get_overview_stats(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/devices/by-type")
-async def get_devices_by_type(db: AsyncSession = Depends(get_db)):
+async def get_devices_by_type(db: AsyncSession = Depends(get_read_db)):
     """Get device counts by type."""
     query = select(
         Device.type,
@@ -72,7 +85,7 @@ async def get_devices_by_type(db: AsyncSession = Depends(get_db)):
 
 
 @router.get("/devices/by-site")
-async def get_devices_by_site(db: AsyncSession = Depends(get_db)):
+async def get_devices_by_site(db: AsyncSession = Depends(get_read_db)):
     """Get device counts by site."""
     query = select(
         Site.id,
@@ -96,26 +109,22 @@ async def get_devices_by_site(db: AsyncSession = Depends(get_db)):
 @router.get("/alarms/timeline")
 async def get_alarms_timeline(
     hours: int = 24,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get alarm counts over time for trend chart."""
     from datetime import datetime, timedelta
-    from sqlalchemy import text
     
     start_time = datetime.utcnow() - timedelta(hours=hours)
     
-    query = text("""
-        SELECT 
-            date_trunc('hour', ts_open) as hour,
-            severity,
-            COUNT(*) as count
-        FROM alarms
-        WHERE ts_open >= :start_time
-        GROUP BY hour, severity
-        ORDER BY hour
-    """)
+    hour = time_bucket(db.get_bind().dialect.name, Alarm.ts_open, 3600).label("hour")
+    query = (
+        select(hour, Alarm.severity, func.count().label("count"))
+        .where(Alarm.ts_open >= start_time)
+        .group_by(hour, Alarm.severity)
+        .order_by(hour)
+    )
     
-    result = await db.execute(query, {"start_time": start_time})
+    result = await db.execute(query)
     rows = result.fetchall()
     
     timeline = {}
@@ -129,3 +138,22 @@ async def get_alarms_timeline(
         {"time": time, **counts}
         for time, counts in sorted(timeline.items())
     ]
+
+
+@router.get("/ingest")
+async def get_ingest_stats():
+    """Get ingest pipeline stats (write queue depth, flush latency, registry)."""
+    return {
+        **telemetry_writer.stats(),
+        "registry": device_registry.stats(),
+        "topics": topic_router.stats(),
+        "publisher": mqtt_publisher.stats(),
+        "commands": command_tracker.stats(),
+        "device_status": status_writer.stats(),
+        "shadows": shadow_store.stats(),
+        "latest": latest_cache.stats(),
+        "metrics": metric_dictionary.stats(),
+        "catalog": metric_catalog.stats(),
+        "retention": retention_job.stats(),
+        "archive": telemetry_archive.stats(),
+    }
@@ -1,16 +1,160 @@
 """
 Telemetry API endpoints.
 """
+import asyncio
+import csv
+import io
+import json
+import math
+from collections import defaultdict
 from datetime import datetime, timedelta
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy import select, func, text
+from itertools import islice
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
+from sqlalchemy import select, func
 from sqlalchemy.ext.asyncio import AsyncSession
-from app.core.database import get_db
-from app.models import Device, Telemetry
-from app.schemas import TelemetryCreate, TelemetryResponse, TelemetryPoint
+from app.core.config import get_settings
+from app.core.database import db_manager, get_db, get_read_db
+from app.models import Flock, Metric, Telemetry
+from app.schemas import (
+    TelemetryCreate, TelemetryResponse, TelemetryPoint,
+    TelemetryBatchCreate, TelemetryBatchReject, TelemetryBatchResult,
+    TelemetryStreamResult, TelemetryImportResult,
+)
+from app.services.aggregation import (
+    INTERVALS, floor_time, naive_utc, sketch_bins_query, telemetry_aggregate_query, uses_rollups, uses_sketches,
+)
+from app.services.archive import from_us, merge_aggregates, telemetry_archive, to_us
+from app.services.device_registry import chickin_device_key, device_registry
+from app.services.downsampling import downsample
+from app.services.latest_values import latest_cache
+from app.services.metric_catalog import metric_catalog
+from app.services.metric_dictionary import metric_dictionary
+from app.services.retention import retention_job
+from app.services.sketches import distribution
+from app.services.telemetry_import import TelemetryImport
+from app.services.telemetry_writer import write_telemetry_rows
+
+settings = get_settings()
 
 router = APIRouter(prefix="/telemetry", tags=["Telemetry"])
 
+# Cap on rejects echoed back by the streaming endpoint (the count is always exact)
+MAX_REPORTED_REJECTS = 100
+
+# Limits of GET /telemetry/compare
+MAX_COMPARE_DEVICES = 100
+MAX_COMPARE_BUCKETS = 2000
+# Devices per GET /telemetry/export
+MAX_EXPORT_DEVICES = 1000
+# Buckets per metric fetched by GET /telemetry/devices/{id} before downsampling
+MAX_SERIES_BUCKETS = 200_000
+
+
+def _time_range(start: datetime | None, end: datetime | None) -> tuple[datetime, datetime]:
+    """Query range as naive UTC (stored timestamps are naive UTC); default: the last 24 hours."""
+    end = naive_utc(end)
+    start = end - timedelta(hours=24) if start is None else naive_utc(start)
+    return start, end
+
+
+async def _bucket_rows(
+    db: AsyncSession,
+    device_ids: list[str],
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    metrics: list[str] | None,
+) -> list[dict]:
+    """
+    min/max/sum/count/avg per (bucket, device, metric) in one grouped query,
+    merged with the segment archive for days past the hot window.
+    """
+    # Bucketed aggregation, compiled natively for the active dialect
+    query = telemetry_aggregate_query(
+        db.get_bind().dialect.name,
+        device_ids,
+        seconds,
+        start,
+        end,
+        metrics=metrics,
+        aggregates=("min", "max", "sum", "count"),
+    )
+    result = await db.execute(query)
+    row_sets = [[dict(row._mapping) for row in result]]
+    
+    # Days past the hot window live in the segment archive (rollups already cover them,
+    # except 1m rollups older than TELEMETRY_ROLLUP_1M_RETENTION_DAYS)
+    if (settings.telemetry_archive_enabled and not uses_rollups(seconds, start)
+            and floor_time(start, 86400) < retention_job.hot_window_start()):
+        row_sets.append(await asyncio.to_thread(
+            telemetry_archive.aggregate, device_ids, seconds, start, end, metrics
+        ))
+    return merge_aggregates(*row_sets)
+
+
+async def _sketch_bins(
+    db: AsyncSession,
+    device_ids: list[str],
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    metrics: list[str] | None,
+) -> dict[tuple, list]:
+    """(bucket µs, device_id, metric) → merged sketch bins, read from the rollups (400 if not kept)."""
+    if not uses_sketches(seconds):
+        raise HTTPException(
+            status_code=400,
+            detail="Percentiles need an interval of 1h, 6h or 1d and rollups with sketches enabled",
+        )
+    result = await db.execute(sketch_bins_query(
+        db.get_bind().dialect.name, device_ids, seconds, start, end, metrics
+    ))
+    bins: dict[tuple, list] = defaultdict(list)
+    for row in result:
+        bins[(to_us(row.bucket_time), row.device_id, row.metric)].append((row.bin, row.samples))
+    return bins
+
+
+def _distribution(
+    row: dict,
+    bins: dict[tuple, list],
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    threshold: float | None,
+) -> dict:
+    """p50/p95/p99 (and seconds_above threshold) of one bucket row."""
+    bucket = to_us(row["bucket_time"])
+    covered = min(bucket + seconds * 1_000_000, to_us(end)) - max(bucket, to_us(start))
+    return distribution(
+        bins.get((bucket, row["device_id"], row["metric"]), []),
+        row["min_value"],
+        row["max_value"],
+        max(covered, 0) / 1_000_000,
+        threshold,
+    )
+
+
+def _round(value: float | None, digits: int = 4) -> float | None:
+    return None if value is None else round(value, digits)
+
+
+async def _coop_device_ids(db: AsyncSession, coop_id: str) -> list[str]:
+    """Devices of the Ci-Touch floors (flocks) of a coop."""
+    result = await db.execute(
+        select(Flock.part_number, Flock.floor_index)
+        .where(Flock.coop_id == coop_id, Flock.part_number.is_not(None), Flock.deleted.is_(False))
+        .order_by(Flock.floor_index)
+    )
+    ids = []
+    for part_number, floor_index in result:
+        device_id = device_registry.resolve_key(chickin_device_key(part_number, (floor_index or 0) + 1))
+        if device_id is not None:
+            ids.append(device_id)
+    return ids
+
 
 @router.get("/devices/{device_id}")
 async def get_device_telemetry(
@@ -19,90 +163,296 @@ async def get_device_telemetry(
     start: datetime | None = None,
     end: datetime | None = None,
     interval: str = Query("1m", pattern="^(1m|5m|15m|1h|6h|1d)$"),
-    db: AsyncSession = Depends(get_db)
+    max_points: int = Query(1000, ge=3, le=10000),
+    downsample_method: str = Query("lttb", alias="downsample", pattern="^(lttb|minmax)$"),
+    percentiles: bool = False,
+    above: float | None = None,
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Get telemetry data for a device with time-bucket aggregation.
     
     Intervals: 1m, 5m, 15m, 1h, 6h, 1d
+    Each metric covers the whole range and is thinned to at most max_points
+    buckets (downsample: lttb or minmax), newest first.
+    percentiles=true adds p50/p95/p99 per bucket and above=<value> adds
+    seconds_above (estimated time above that value), both from the 1h / 1d
+    rollup quantile sketches (within 1% of the exact value; interval 1h, 6h or 1d).
     """
     # Verify device exists
-    result = await db.execute(select(Device.id).where(Device.id == device_id))
-    if not result.scalar_one_or_none():
+    if not await device_registry.ensure_exists(db, device_id):
         raise HTTPException(status_code=404, detail="Device not found")
     
     # Default time range: last 24 hours
-    if not end:
-        end = datetime.utcnow()
-    if not start:
-        start = end - timedelta(hours=24)
-    
-    # Map interval to TimescaleDB bucket
-    interval_map = {
-        "1m": "1 minute",
-        "5m": "5 minutes",
-        "15m": "15 minutes",
-        "1h": "1 hour",
-        "6h": "6 hours",
-        "1d": "1 day"
-    }
-    bucket = interval_map.get(interval, "5 minutes")
-    
-    # Build aggregation query (TimescaleDB time_bucket)
-    query = text("""
-        SELECT 
-            time_bucket(:bucket, time) AS bucket_time,
-            metric,
-            AVG(value) as avg_value,
-            MIN(value) as min_value,
-            MAX(value) as max_value,
-            COUNT(*) as count
-        FROM telemetry
-        WHERE device_id = :device_id
-            AND time >= :start
-            AND time <= :end
-            AND (:metric IS NULL OR metric = :metric)
-        GROUP BY bucket_time, metric
-        ORDER BY bucket_time DESC
-        LIMIT 1000
-    """)
+    start, end = _time_range(start, end)
     
-    result = await db.execute(
-        query,
-        {
-            "bucket": bucket,
-            "device_id": device_id,
-            "start": start,
-            "end": end,
-            "metric": metric
-        }
-    )
-    rows = result.fetchall()
+    seconds = INTERVALS[interval]
+    if (end - start).total_seconds() / seconds > MAX_SERIES_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {MAX_SERIES_BUCKETS} buckets; use a coarser interval",
+        )
+    metrics = [metric] if metric else None
+    rows = await _bucket_rows(db, [device_id], seconds, start, end, metrics)
+    rows.sort(key=lambda row: to_us(row["bucket_time"]))
+    bins = None
+    if percentiles or above is not None:
+        bins = await _sketch_bins(db, [device_id], seconds, start, end, metrics)
     
-    # Group by metric
-    data: dict[str, list] = {}
+    # Group by metric, then thin each series to the point budget
+    series: dict[str, list] = {}
     for row in rows:
-        metric_name = row.metric
-        if metric_name not in data:
-            data[metric_name] = []
-        
-        data[metric_name].append({
-            "time": row.bucket_time.isoformat(),
-            "avg": round(row.avg_value, 4),
-            "min": round(row.min_value, 4),
-            "max": round(row.max_value, 4),
-            "count": row.count
-        })
+        series.setdefault(row["metric"], []).append(row)
+    
+    data: dict[str, list] = {}
+    for metric_name, metric_rows in series.items():
+        points = []
+        for row in reversed(downsample(metric_rows, max_points, downsample_method)):
+            point = {
+                "time": row["bucket_time"].isoformat(),
+                "avg": round(row["avg_value"], 4),
+                "min": round(row["min_value"], 4),
+                "max": round(row["max_value"], 4),
+                "count": row["count_value"]
+            }
+            if bins is not None:
+                stats = _distribution(row, bins, seconds, start, end, above)
+                if percentiles:
+                    point.update(p50=_round(stats["p50"]), p95=_round(stats["p95"]), p99=_round(stats["p99"]))
+                if above is not None:
+                    point["seconds_above"] = _round(stats["seconds_above"], 1)
+            points.append(point)
+        data[metric_name] = points
     
     return {
         "device_id": device_id,
         "start": start.isoformat(),
         "end": end.isoformat(),
         "interval": interval,
+        "max_points": max_points,
+        "above": above,
         "metrics": data
     }
 
 
+async def _select_devices(
+    db: AsyncSession,
+    device_ids: list[str],
+    site_id: str | None,
+    coop_id: str | None,
+    max_devices: int,
+) -> list[str]:
+    """Existing devices named by device_ids, a site and/or a coop (400/404 otherwise)."""
+    ids = list(dict.fromkeys(device_ids))
+    if site_id:
+        ids += [device_id for device_id in device_registry.devices_in_site(site_id) if device_id not in ids]
+    if coop_id:
+        ids += [device_id for device_id in await _coop_device_ids(db, coop_id) if device_id not in ids]
+    if not ids:
+        raise HTTPException(status_code=400, detail="Specify device_ids, site_id or coop_id")
+    if len(ids) > max_devices:
+        raise HTTPException(status_code=400, detail=f"At most {max_devices} devices can be selected")
+    known = await device_registry.filter_known(db, set(ids))
+    ids = [device_id for device_id in ids if device_id in known]
+    if not ids:
+        raise HTTPException(status_code=404, detail="Device not found")
+    return ids
+
+
+@router.get("/compare")
+async def compare_telemetry(
+    metric: str,
+    device_ids: list[str] = Query(default=[]),
+    site_id: str | None = None,
+    coop_id: str | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    interval: str = Query("1h", pattern="^(1m|5m|15m|1h|6h|1d)$"),
+    agg: str = Query("avg", pattern="^(avg|min|max|count|p50|p95|p99|seconds_above)$"),
+    above: float | None = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Compare one metric across many devices in a single grouped aggregation.
+    Select devices with device_ids (repeatable), site_id and/or coop_id.
+    Returns one shared time axis and, per device, the chosen aggregate for
+    each bucket (null where the device has no data). p50/p95/p99 and
+    seconds_above (requires above=<value>) come from the rollup sketches.
+    """
+    if agg == "seconds_above" and above is None:
+        raise HTTPException(status_code=400, detail="agg=seconds_above requires above")
+    ids = await _select_devices(db, device_ids, site_id, coop_id, MAX_COMPARE_DEVICES)
+    
+    start, end = _time_range(start, end)
+    seconds = INTERVALS[interval]
+    if (end - start).total_seconds() / seconds > MAX_COMPARE_BUCKETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Range spans more than {MAX_COMPARE_BUCKETS} buckets; use a coarser interval",
+        )
+    
+    rows = await _bucket_rows(db, ids, seconds, start, end, [metric])
+    bins = None
+    if agg in ("p50", "p95", "p99", "seconds_above"):
+        bins = await _sketch_bins(db, ids, seconds, start, end, [metric])
+    
+    # Align every device on the union of bucket times
+    times = sorted({to_us(row["bucket_time"]) for row in rows})
+    position = {bucket: index for index, bucket in enumerate(times)}
+    series: dict[str, list] = {device_id: [None] * len(times) for device_id in ids}
+    for row in rows:
+        if bins is not None:
+            value = _distribution(row, bins, seconds, start, end, above)[agg]
+        else:
+            value = row[f"{agg}_value"]
+        series[row["device_id"]][position[to_us(row["bucket_time"])]] = (
+            value if agg == "count" else _round(value)
+        )
+    
+    return {
+        "metric": metric,
+        "start": start.isoformat(),
+        "end": end.isoformat(),
+        "interval": interval,
+        "aggregate": agg,
+        "above": above,
+        "times": [from_us(bucket).isoformat() for bucket in times],
+        "series": series,
+    }
+
+
+async def _archived_points(device_id: str, metrics: list[str] | None, start: datetime, end: datetime, batch_rows: int):
+    """Archived points of a device, read from the segment files in a worker thread."""
+    points = telemetry_archive.points(device_id, metrics, start, end)
+    while batch := await asyncio.to_thread(list, islice(points, batch_rows)):
+        for point in batch:
+            yield point
+
+
+async def _export_records(query, device_ids: list[str], start: datetime, end: datetime, metrics: list[str]):
+    """
+    Batches of (time, device_id, metric, value) for an export. Uses its own
+    read session (the request session is closed once streaming starts) and a
+    server-side cursor, fetching telemetry_export_batch_rows rows at a time.
+    When the range reaches past the hot window, each device is read on its
+    own and its raw rows are merged in time order with its archived points.
+    A day archived but not yet deleted is in both; the raw row wins.
+    """
+    batch_rows = settings.telemetry_export_batch_rows
+    archived = (settings.telemetry_archive_enabled
+                and floor_time(start, 86400) < retention_job.hot_window_start())
+    async with db_manager.read_session_factory() as session:
+        if not archived:
+            result = await session.stream(query.execution_options(yield_per=batch_rows))
+            async for partition in result.partitions():
+                yield [(row.time, row.device_id, row.metric, row.value) for row in partition]
+            return
+        
+        for device_id in device_ids:
+            points = _archived_points(device_id, metrics or None, start, end, batch_rows)
+            point = await anext(points, None)
+            # Archived points at the timestamp of the current raw rows, by metric
+            same_time_us, same_time = None, {}
+            result = await session.stream(
+                query.where(Telemetry.device_id == device_id).execution_options(yield_per=batch_rows)
+            )
+            async for partition in result.partitions():
+                batch = []
+                for row in partition:
+                    row_us = to_us(row.time)
+                    if same_time_us is not None and same_time_us < row_us:
+                        batch.extend((from_us(same_time_us), device_id, metric, value)
+                                     for metric, value in same_time.items())
+                        same_time_us, same_time = None, {}
+                    while point is not None and point[0] < row_us:
+                        batch.append((from_us(point[0]), device_id, point[1], point[2]))
+                        point = await anext(points, None)
+                    while point is not None and point[0] == row_us:
+                        same_time_us = row_us
+                        same_time[point[1]] = point[2]
+                        point = await anext(points, None)
+                    same_time.pop(row.metric, None)
+                    batch.append((row.time, row.device_id, row.metric, row.value))
+                yield batch
+            batch = [(from_us(same_time_us), device_id, metric, value) for metric, value in same_time.items()]
+            while point is not None:
+                while point is not None and len(batch) < batch_rows:
+                    batch.append((from_us(point[0]), device_id, point[1], point[2]))
+                    point = await anext(points, None)
+                yield batch
+                batch = []
+            if batch:
+                yield batch
+
+
+async def _export_rows(records, fmt: str):
+    """Encode export record batches as CSV or NDJSON text chunks (times as naive UTC)."""
+    if fmt == "csv":
+        yield "time,device_id,metric,value\r\n"
+    async for batch in records:
+        buffer = io.StringIO()
+        if fmt == "csv":
+            writer = csv.writer(buffer)
+            writer.writerows(
+                (from_us(to_us(ts)).isoformat(), device_id, metric, value)
+                for ts, device_id, metric, value in batch
+            )
+        else:
+            for ts, device_id, metric, value in batch:
+                buffer.write(json.dumps({
+                    "time": from_us(to_us(ts)).isoformat(),
+                    "device_id": device_id,
+                    "metric": metric,
+                    "value": value,
+                }))
+                buffer.write("\n")
+        yield buffer.getvalue()
+
+
+@router.get("/export")
+async def export_telemetry(
+    start: datetime,
+    end: datetime | None = None,
+    device_ids: list[str] = Query(default=[]),
+    site_id: str | None = None,
+    coop_id: str | None = None,
+    metrics: list[str] = Query(default=[]),
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Stream raw telemetry rows (time, device_id, metric, value) as CSV or
+    NDJSON, ordered by device then time. Select devices with device_ids
+    (repeatable), site_id and/or coop_id; metrics (repeatable) narrows the
+    export. Rows are read through a server-side cursor and written as they
+    arrive, so memory use does not grow with the export size. Days already
+    moved to the cold-tier archive are read back from their segments; days
+    deleted with the archive disabled are no longer available.
+    """
+    ids = await _select_devices(db, device_ids, site_id, coop_id, MAX_EXPORT_DEVICES)
+    start, end = _time_range(start, end)
+    
+    query = (
+        select(Telemetry.time, Telemetry.device_id, Metric.name.label("metric"), Telemetry.value)
+        .join(Metric, Metric.id == Telemetry.metric_id)
+        .where(
+            Telemetry.device_id.in_(ids),
+            Telemetry.time >= start,
+            Telemetry.time <= end,
+        )
+        .order_by(Telemetry.device_id, Telemetry.time, Telemetry.metric_id)
+    )
+    if metrics:
+        query = query.where(Metric.name.in_(metrics))
+    
+    filename = f"telemetry_{start:%Y%m%d}_{end:%Y%m%d}.{format}"
+    return StreamingResponse(
+        _export_rows(_export_records(query, ids, start, end, metrics), format),
+        media_type="text/csv" if format == "csv" else "application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
 @router.post("")
 async def ingest_telemetry(
     data: TelemetryCreate,
@@ -113,71 +463,263 @@ async def ingest_telemetry(
     Used for HTTP ingestion (alternative to MQTT).
     """
     # Verify device exists
-    result = await db.execute(select(Device.id).where(Device.id == data.device_id))
-    if not result.scalar_one_or_none():
+    if not await device_registry.ensure_exists(db, data.device_id):
         raise HTTPException(status_code=404, detail="Device not found")
     
-    timestamp = data.timestamp or datetime.utcnow()
-    
-    # Insert telemetry points
-    for metric, value in data.metrics.items():
-        telemetry = Telemetry(
-            time=timestamp,
-            device_id=data.device_id,
-            metric=metric,
-            value=value
-        )
-        db.add(telemetry)
+    timestamp = naive_utc(data.timestamp)
+    rejected = {
+        metric: reason for metric in data.metrics
+        if (reason := metric_dictionary.reject_reason(metric))
+    }
     
-    await db.flush()
+    # Insert telemetry points in one statement
+    await write_telemetry_rows(db, [
+        {"time": timestamp, "device_id": data.device_id, "metric": metric, "value": value}
+        for metric, value in data.metrics.items() if metric not in rejected
+    ])
     
+    if rejected:
+        return {"status": "partial", "points": len(data.metrics) - len(rejected), "rejected": rejected}
     return {"status": "ok", "points": len(data.metrics)}
 
 
+@router.post("/batch", response_model=TelemetryBatchResult)
+async def ingest_telemetry_batch(
+    data: TelemetryBatchCreate,
+    db: AsyncSession = Depends(get_db)
+):
+    """
+    Ingest many (device, time, metric, value) rows in one request.
+    Used by gateways that aggregate a whole kandang. Valid rows are written
+    in a single multi-row insert; invalid rows are reported by index.
+    """
+    default_time = naive_utc(data.timestamp)
+    known = await device_registry.filter_known(db, {row.device_id for row in data.rows})
+    
+    rows: list[dict] = []
+    rejected: list[TelemetryBatchReject] = []
+    seen: set[tuple] = set()
+    for index, row in enumerate(data.rows):
+        if row.device_id not in known:
+            rejected.append(TelemetryBatchReject(index=index, reason="Device not found"))
+            continue
+        if not math.isfinite(row.value):
+            rejected.append(TelemetryBatchReject(index=index, reason="Value is not a finite number"))
+            continue
+        if reason := metric_dictionary.reject_reason(row.metric):
+            rejected.append(TelemetryBatchReject(index=index, reason=reason))
+            continue
+        
+        timestamp = naive_utc(row.time) if row.time else default_time
+        key = (timestamp, row.device_id, row.metric)
+        if key in seen:
+            rejected.append(TelemetryBatchReject(index=index, reason="Duplicate row in batch"))
+            continue
+        seen.add(key)
+        
+        rows.append({
+            "time": timestamp,
+            "device_id": row.device_id,
+            "metric": row.metric,
+            "value": row.value,
+        })
+    
+    accepted = await write_telemetry_rows(db, rows)
+    
+    return TelemetryBatchResult(
+        status="ok" if not rejected else "partial",
+        accepted=accepted,
+        rejected=rejected,
+    )
+
+
+async def _iter_body_lines(request: Request, max_line_bytes: int):
+    """
+    Yield (line_number, line) from a streamed request body.
+    Only the current partial line is buffered. Lines longer than
+    max_line_bytes are yielded as None so the caller can reject them.
+    """
+    buffer = b""
+    line_number = 0
+    oversized = False
+    async for chunk in request.stream():
+        buffer += chunk
+        *complete, buffer = buffer.split(b"\n")
+        for line in complete:
+            line_number += 1
+            if oversized or len(line) > max_line_bytes:
+                oversized = False
+                yield line_number, None
+            elif line.strip():
+                yield line_number, line
+        if len(buffer) > max_line_bytes:
+            # Drop the oversized line's bytes as they arrive
+            oversized = True
+            buffer = b""
+    if oversized or buffer.strip():
+        line_number += 1
+        yield line_number, None if oversized else buffer
+
+
+async def _write_chunk(rows: list[dict]) -> int:
+    """Write and commit one chunk of telemetry rows in a writer session of its own."""
+    async with db_manager.session_factory() as session:
+        written = await write_telemetry_rows(session, rows)
+        await session.commit()
+    return written
+
+
+@router.post("/stream", response_model=TelemetryStreamResult)
+async def ingest_telemetry_stream(
+    request: Request,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Ingest newline-delimited JSON, one TelemetryCreate object per line.
+    The body is parsed incrementally and committed in chunks, so a gateway
+    replaying buffered data after an outage never needs the whole payload
+    in memory. Each chunk is written in its own short writer session, so a
+    slow upload does not hold the (single, on SQLite) writer connection
+    while the body is being received.
+    """
+    chunk_rows = settings.telemetry_stream_chunk_rows
+    unknown: set[str] = set()
+    rows: list[dict] = []
+    seen: set[tuple] = set()
+    rejected: list[TelemetryBatchReject] = []
+    rejected_count = 0
+    lines = 0
+    accepted = 0
+    chunks = 0
+    
+    def reject(line_number: int, reason: str):
+        nonlocal rejected_count
+        rejected_count += 1
+        if len(rejected) < MAX_REPORTED_REJECTS:
+            rejected.append(TelemetryBatchReject(index=line_number, reason=reason))
+    
+    async for line_number, line in _iter_body_lines(request, settings.telemetry_stream_max_line_bytes):
+        lines += 1
+        if line is None:
+            reject(line_number, "Line too long")
+            continue
+        try:
+            point = TelemetryCreate.model_validate_json(line)
+        except ValidationError as e:
+            reject(line_number, f"Invalid line: {e.errors()[0]['msg']}")
+            continue
+        
+        if point.device_id in unknown or not await device_registry.ensure_exists(db, point.device_id):
+            unknown.add(point.device_id)
+            reject(line_number, "Device not found")
+            continue
+        
+        timestamp = naive_utc(point.timestamp)
+        invalid = []
+        for metric, value in point.metrics.items():
+            key = (timestamp, point.device_id, metric)
+            if not math.isfinite(value) or key in seen:
+                continue
+            if reason := metric_dictionary.reject_reason(metric):
+                invalid.append(f"{reason}: {metric!r}")
+                continue
+            seen.add(key)
+            rows.append({"time": timestamp, "device_id": point.device_id, "metric": metric, "value": value})
+        if invalid:
+            # The line's other metrics are still written
+            reject(line_number, "; ".join(invalid))
+        
+        if len(rows) >= chunk_rows:
+            accepted += await _write_chunk(rows)
+            chunks += 1
+            rows = []
+            seen.clear()
+    
+    if rows:
+        accepted += await _write_chunk(rows)
+        chunks += 1
+    
+    return TelemetryStreamResult(
+        status="ok" if not rejected_count else "partial",
+        lines=lines,
+        accepted=accepted,
+        chunks=chunks,
+        rejected_count=rejected_count,
+        rejected=rejected,
+    )
+
+
+@router.post("/import", response_model=TelemetryImportResult)
+async def import_telemetry_csv(
+    request: Request,
+    device_key: str | None = None,
+):
+    """
+    Admin: bulk-import historical telemetry from a CSV request body.
+    Layouts and device mapping are described in app.services.telemetry_import;
+    device_key names the device for files without a device column. The body
+    is read incrementally and written in chunks of TELEMETRY_IMPORT_CHUNK_ROWS
+    records, each in its own transaction. Rows already stored are skipped, so
+    a failed import can be re-sent. For very large backfills prefer the
+    import_telemetry.py CLI.
+    """
+    importer = TelemetryImport(device_key=device_key)
+    try:
+        async for line_number, line in _iter_body_lines(request, settings.telemetry_stream_max_line_bytes):
+            if line is None:
+                raise HTTPException(status_code=400, detail=f"Line {line_number} too long")
+            await importer.feed([line.decode("utf-8-sig")])
+        await importer.finish()
+    except (ValueError, UnicodeDecodeError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    
+    return TelemetryImportResult(**importer.result())
+
+
 @router.get("/metrics")
 async def get_available_metrics(
     device_id: str | None = None,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
-    """Get list of available metrics."""
-    query = select(Telemetry.metric).distinct()
-    
-    if device_id:
-        query = query.where(Telemetry.device_id == device_id)
+    """Get list of available metrics (from the metric catalog, not a telemetry scan)."""
+    return await metric_catalog.metrics(db, device_id)
+
+
+def _format_latest(metrics: dict) -> dict:
+    return {
+        metric: {"value": value, "time": ts.isoformat()}
+        for metric, (ts, value) in metrics.items()
+    }
+
+
+@router.get("/latest")
+async def get_latest_telemetry_bulk(
+    device_ids: list[str] = Query(default=[]),
+    site_id: str | None = None,
+    db: AsyncSession = Depends(get_read_db)
+):
+    """
+    Get latest telemetry values for many devices in one call.
+    Pass device_ids (repeatable) and/or site_id for every device of a site.
+    """
+    ids = list(dict.fromkeys(device_ids))
+    if site_id:
+        ids += [device_id for device_id in device_registry.devices_in_site(site_id) if device_id not in ids]
     
-    result = await db.execute(query)
-    return [row[0] for row in result.fetchall()]
+    latest = await latest_cache.get_many(db, ids)
+    return {
+        "devices": {device_id: _format_latest(metrics) for device_id, metrics in latest.items()}
+    }
 
 
 @router.get("/latest/{device_id}")
 async def get_latest_telemetry(
     device_id: str,
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """Get latest telemetry values for each metric of a device."""
-    # Get distinct metrics for device
-    metrics_query = select(Telemetry.metric).where(
-        Telemetry.device_id == device_id
-    ).distinct()
-    metrics_result = await db.execute(metrics_query)
-    metrics = [row[0] for row in metrics_result.fetchall()]
-    
-    latest = {}
-    for metric in metrics:
-        query = select(Telemetry).where(
-            Telemetry.device_id == device_id,
-            Telemetry.metric == metric
-        ).order_by(Telemetry.time.desc()).limit(1)
-        
-        result = await db.execute(query)
-        row = result.scalar_one_or_none()
-        if row:
-            latest[metric] = {
-                "value": row.value,
-                "time": row.time.isoformat()
-            }
-    
+    metrics = await latest_cache.get(db, device_id)
     return {
         "device_id": device_id,
-        "latest": latest
+        "latest": _format_latest(metrics)
     }
@@ -1,6 +1,6 @@
 """Core module exports."""
 from .config import get_settings, Settings
-from .database import Base, get_db, init_db, db_manager
+from .database import Base, get_db, get_read_db, init_db, db_manager
 from .redis import redis_manager, RedisManager
 
 __all__ = [
@@ -8,6 +8,7 @@ __all__ = [
     "Settings",
     "Base",
     "get_db",
+    "get_read_db",
     "init_db",
     "db_manager",
     "redis_manager",
@@ -1,6 +1,7 @@
 """
 IoT Data Center Dashboard - Backend Configuration
 """
+from pydantic import model_validator
 from pydantic_settings import BaseSettings
 from functools import lru_cache
 
@@ -16,6 +17,18 @@ class Settings(BaseSettings):
     
     # Database - SQLite for local dev, PostgreSQL for production
     database_url: str = "sqlite+aiosqlite:///./iot_dashboard.db"
+    # PostgreSQL bucketing for widths other than a minute/hour/day (those use date_trunc):
+    # "date_bin" (PostgreSQL 14+) or "time_bucket" (TimescaleDB)
+    pg_bucket_function: str = "date_bin"
+    # GIN indexes (jsonb_path_ops) on devices.meta_data, flocks.sensors, flocks.features
+    pg_json_gin_indexes: bool = True
+    # SQLite performance profile: WAL, single writer engine + pooled read-only engine
+    sqlite_wal: bool = True
+    sqlite_busy_timeout_ms: int = 5000
+    sqlite_cache_size_kb: int = 65536
+    sqlite_mmap_size: int = 268435456
+    sqlite_read_pool_size: int = 4
+    sqlite_writer_pool_timeout: float = 30.0  # seconds a session waits for the single writer connection
     
     # Redis (optional for local dev)
     redis_url: str = "redis://localhost:6379"
@@ -28,6 +41,56 @@ class Settings(BaseSettings):
     mqtt_password: str = ""
     mqtt_client_id: str = "iot-backend"
     mqtt_enabled: bool = False
+    mqtt_publish_qos: int = 1
+    mqtt_publish_inflight: int = 8      # concurrent unacknowledged publishes
+    mqtt_publish_queue_size: int = 1000
+    mqtt_publish_timeout: float = 10.0  # seconds to wait for broker ack
+    
+    # Telemetry write-behind pipeline (MQTT → telemetry table)
+    telemetry_queue_size: int = 50000
+    telemetry_batch_size: int = 1000
+    telemetry_flush_interval: float = 1.0  # seconds
+    telemetry_dedup_window: float = 300.0  # seconds a committed key is remembered
+    telemetry_dedup_max_keys: int = 200000
+    telemetry_max_metrics: int = 10000  # distinct metric names ingest may create (ids are SMALLINT on PostgreSQL)
+    telemetry_rollups_enabled: bool = True  # maintain 1m/1h/1d rollups at ingest
+    telemetry_sketches_enabled: bool = True  # quantile-sketch bins alongside 1h/1d rollups (p50/p95/p99)
+    telemetry_latest_cache_ttl: float = 5.0  # seconds a cached latest-values entry is trusted
+    telemetry_catalog_cache_ttl: float = 30.0  # seconds before the metric catalog mirror is reloaded
+    
+    # Command acknowledgement tracking
+    command_timeout_seconds: float = 30.0  # sent → timeout without a device ack
+    command_flush_interval: float = 1.0    # seconds between ack flushes / sweeps
+    
+    # Telemetry retention (opt-in): raw rows older than N days (already in the rollups) are archived, then deleted
+    telemetry_retention_enabled: bool = False
+    telemetry_retention_days: int = 90
+    telemetry_retention_overrides: dict[str, int] = {}  # metric → days, e.g. {"blower_1": 30}
+    telemetry_retention_interval: float = 3600.0        # seconds between runs
+    telemetry_retention_chunk_rows: int = 10000         # raw rows deleted per transaction
+    telemetry_rollup_1m_retention_days: int = 30        # with retention on: 1m rollups kept N days (0 = forever); 1h/1d kept
+    # Cold tier (opt-in): expired days are exported to columnar segment files before deletion
+    telemetry_archive_enabled: bool = False
+    telemetry_archive_dir: str = ""                     # required when enabled; shared volume when running several hosts
+    telemetry_archive_compress: bool = False            # zlib columns (smaller, no memory-mapping)
+    
+    # Device status write-back (devices.status / last_seen)
+    device_status_flush_interval: float = 5.0  # seconds between bulk UPDATEs
+    device_offline_after: float = 120.0        # seconds without a report → offline
+    
+    # Device shadow write-back: seconds between batched shadow_reported UPDATEs
+    shadow_flush_interval: float = 2.0
+    
+    # Device registry: seconds between checks of the shared (Redis) version
+    device_registry_sync_interval: float = 5.0
+    
+    # NDJSON streaming ingest (POST /telemetry/stream)
+    telemetry_stream_chunk_rows: int = 5000
+    telemetry_stream_max_line_bytes: int = 65536
+    # Telemetry export (GET /telemetry/export): rows fetched per server-side cursor batch
+    telemetry_export_batch_rows: int = 5000
+    # Bulk CSV import (import_telemetry.py, POST /telemetry/import): rows per transaction
+    telemetry_import_chunk_rows: int = 50000
     
     # Chickin Integration - external service base URLs
     chickin_auth_base_url: str = "https://auth.chickinindonesia.com"
@@ -47,6 +110,12 @@ class Settings(BaseSettings):
         env_file = ".env"
         env_file_encoding = "utf-8"
 
+    @model_validator(mode="after")
+    def _check_archive_dir(self):
+        if self.telemetry_archive_enabled and not self.telemetry_archive_dir:
+            raise ValueError("TELEMETRY_ARCHIVE_DIR must be set when TELEMETRY_ARCHIVE_ENABLED is true")
+        return self
+
 
 @lru_cache()
 def get_settings() -> Settings:
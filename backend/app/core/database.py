@@ -2,12 +2,28 @@
 Database connection and session management.
 Supports both SQLite (local dev) and PostgreSQL (production).
 Supports hot-swap: change database URL at runtime via Settings page.
+
+SQLite performance profile (sqlite_wal): the database runs in WAL mode with
+synchronous=NORMAL, a large page cache, mmap and a busy timeout. Writes go
+through a single-connection writer engine (SQLite allows one writer at a
+time anyway, so queueing in the pool beats SQLITE_BUSY retries), while API
+reads use a separate pooled engine whose connections are query_only and read
+from the last committed WAL snapshot without blocking on the writer.
+Everything that writes (the background flushers and the /stream and /import
+request paths) shares that one connection, so each holds it only for one
+short transaction at a time; a session that cannot get it within
+SQLITE_WRITER_POOL_TIMEOUT seconds fails with a pool TimeoutError (the
+flushers keep their pending data and retry).
 """
 import sqlalchemy
+from sqlalchemy import event
 from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine, async_sessionmaker
-from sqlalchemy.orm import DeclarativeBase
+from sqlalchemy.orm import DeclarativeBase, Session
 from .config import get_settings
 
+# Session.info slot holding callbacks to run once the current transaction commits
+_AFTER_COMMIT = "after_commit_callbacks"
+
 
 class Base(DeclarativeBase):
     """Base class for all database models."""
@@ -20,32 +36,105 @@ class DatabaseManager:
     def __init__(self):
         self._engine = None
         self._session_factory = None
+        self._read_engine = None
+        self._read_session_factory = None
         self._current_url: str = ""
+        # Hooks of services mirroring database state, run by swap() (see on_swap)
+        self._flush_hooks: list = []
+        self._reset_hooks: list = []
+        self._reload_hooks: list = []
 
     def _build_engine_kwargs(self, url: str) -> dict:
         """Build engine kwargs based on database type."""
         kwargs = {"echo": get_settings().debug}
         if url.startswith("sqlite"):
             kwargs["connect_args"] = {"check_same_thread": False}
+            if self._split_sqlite(url):
+                # Single writer connection; sessions queue for it in the pool
+                kwargs["pool_size"] = 1
+                kwargs["max_overflow"] = 0
+                kwargs["pool_timeout"] = get_settings().sqlite_writer_pool_timeout
         else:
             kwargs["pool_pre_ping"] = True
             kwargs["pool_size"] = 10
             kwargs["max_overflow"] = 20
         return kwargs
 
-    def _create(self, url: str):
-        """Create engine and session factory for a given URL."""
-        kwargs = self._build_engine_kwargs(url)
-        self._engine = create_async_engine(url, **kwargs)
-        self._session_factory = async_sessionmaker(
-            self._engine,
+    @staticmethod
+    def _split_sqlite(url: str) -> bool:
+        """Whether the SQLite performance profile applies (file databases only)."""
+        return (
+            get_settings().sqlite_wal
+            and url.startswith("sqlite")
+            and ":memory:" not in url
+            and "mode=memory" not in url
+        )
+
+    @staticmethod
+    def _sqlite_pragmas(read_only: bool) -> list[str]:
+        settings = get_settings()
+        pragmas = [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}",
+            f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+            f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+            "PRAGMA temp_store=MEMORY",
+        ]
+        if read_only:
+            pragmas.append("PRAGMA query_only=ON")
+        return pragmas
+
+    def _apply_pragmas(self, engine, read_only: bool):
+        pragmas = self._sqlite_pragmas(read_only)
+
+        @event.listens_for(engine.sync_engine, "connect")
+        def _on_connect(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    @staticmethod
+    def _make_factory(engine):
+        return async_sessionmaker(
+            engine,
             class_=AsyncSession,
             expire_on_commit=False,
             autocommit=False,
             autoflush=False,
         )
+
+    def _build(self, url: str) -> tuple:
+        """Writer engine, its session factory, read engine (or None) and read session factory for a URL."""
+        kwargs = self._build_engine_kwargs(url)
+        engine = create_async_engine(url, **kwargs)
+        factory = self._make_factory(engine)
+        if not self._split_sqlite(url):
+            # PostgreSQL handles concurrent readers itself; reads share the main pool
+            return engine, factory, None, factory
+        self._apply_pragmas(engine, read_only=False)
+        read_engine = create_async_engine(
+            url,
+            echo=kwargs["echo"],
+            connect_args={"check_same_thread": False},
+            pool_size=get_settings().sqlite_read_pool_size,
+            max_overflow=0,
+        )
+        self._apply_pragmas(read_engine, read_only=True)
+        return engine, factory, read_engine, self._make_factory(read_engine)
+
+    def _create(self, url: str):
+        """Create the writer engine, the read engine and their session factories for a given URL."""
+        self._engine, self._session_factory, self._read_engine, self._read_session_factory = self._build(url)
         self._current_url = url
 
+    async def _dispose(self, engine, read_engine):
+        if engine is not None:
+            await engine.dispose()
+        if read_engine is not None:
+            await read_engine.dispose()
+
     @property
     def engine(self):
         """Current async engine (lazy-initialized)."""
@@ -60,16 +149,38 @@ class DatabaseManager:
             self._create(get_settings().database_url)
         return self._session_factory
 
+    @property
+    def read_session_factory(self):
+        """Session factory for read-only queries (the read engine on SQLite)."""
+        if self._read_session_factory is None:
+            self._create(get_settings().database_url)
+        return self._read_session_factory
+
     @property
     def current_url(self) -> str:
         """Currently active database URL."""
         return self._current_url or get_settings().database_url
 
+    def on_swap(self, reload=None, flush=None, reset=None):
+        """
+        Register hooks for swap() of a service that mirrors database state:
+        await flush() while the old database is still active (pending writes),
+        reset() in the same step that switches engines (so nothing reads the
+        old state against the new database), then await reload().
+        """
+        if flush is not None:
+            self._flush_hooks.append(flush)
+        if reset is not None:
+            self._reset_hooks.append(reset)
+        if reload is not None:
+            self._reload_hooks.append(reload)
+
     async def swap(self, new_url: str) -> dict:
         """
         Hot-swap to a new database URL.
-        Tests connection first, then creates tables, then disposes old engine.
-        On failure, reverts to the previous engine.
+        Tests connection first, then creates tables, then switches engines,
+        disposes the old ones and reloads mirrored state (on_swap hooks).
+        On failure the current engine stays in place.
 
         Returns {"success": True/False, "message": str, "database_type": str}
         """
@@ -80,49 +191,51 @@ class DatabaseManager:
                 "database_type": self._detect_type(new_url),
             }
 
-        old_engine = self._engine
-        old_factory = self._session_factory
-        old_url = self._current_url
-
+        new = None
         try:
             # 1. Create new engine
-            self._create(new_url)
+            new = self._build(new_url)
 
             # 2. Test connection
-            async with self._engine.connect() as conn:
+            async with new[0].connect() as conn:
                 await conn.execute(sqlalchemy.text("SELECT 1"))
 
             # 3. Initialize tables on new DB
-            async with self._engine.begin() as conn:
+            async with new[0].begin() as conn:
                 await conn.run_sync(Base.metadata.create_all)
-
-            # 4. Dispose old engine
-            if old_engine is not None:
-                await old_engine.dispose()
-
-            db_type = self._detect_type(new_url)
-            return {
-                "success": True,
-                "message": f"Switched to {db_type} database successfully. Tables initialized.",
-                "database_type": db_type,
-            }
-
         except Exception as e:
-            # Revert to old engine on failure
-            if self._engine is not None and self._engine is not old_engine:
+            if new is not None:
                 try:
-                    await self._engine.dispose()
+                    await self._dispose(new[0], new[2])
                 except Exception:
                     pass
-            self._engine = old_engine
-            self._session_factory = old_factory
-            self._current_url = old_url
             return {
                 "success": False,
                 "message": f"Connection failed: {str(e)}",
                 "database_type": "unknown",
             }
 
+        # 4. Write what is still pending to the old database, then switch
+        for flush in self._flush_hooks:
+            await flush()
+        old_engine, old_read_engine = self._engine, self._read_engine
+        self._engine, self._session_factory, self._read_engine, self._read_session_factory = new
+        self._current_url = new_url
+        for reset in self._reset_hooks:
+            reset()
+
+        # 5. Dispose old engines and reload mirrored state from the new database
+        db_type = self._detect_type(new_url)
+        message = f"Switched to {db_type} database successfully. Tables initialized."
+        try:
+            await self._dispose(old_engine, old_read_engine)
+            for reload in self._reload_hooks:
+                await reload()
+        except Exception as e:
+            print(f"Database: Reloading state after swap failed: {e}")
+            message += f" Reloading cached state failed: {e}"
+        return {"success": True, "message": message, "database_type": db_type}
+
     @staticmethod
     def _detect_type(url: str) -> str:
         if "sqlite" in url:
@@ -138,6 +251,26 @@ class DatabaseManager:
 db_manager = DatabaseManager()
 
 
+def on_commit(session: AsyncSession | Session, callback, *args):
+    """
+    Run callback(*args) after the session's current transaction commits;
+    dropped if it rolls back. Used to publish writes to in-memory mirrors
+    only once they are durable.
+    """
+    session.info.setdefault(_AFTER_COMMIT, []).append((callback, args))
+
+
+@event.listens_for(Session, "after_commit")
+def _run_commit_callbacks(session):
+    for callback, args in session.info.pop(_AFTER_COMMIT, ()):
+        callback(*args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_commit_callbacks(session):
+    session.info.pop(_AFTER_COMMIT, None)
+
+
 async def get_db() -> AsyncSession:
     """Dependency for getting database session."""
     async with db_manager.session_factory() as session:
@@ -151,6 +284,16 @@ async def get_db() -> AsyncSession:
             await session.close()
 
 
+async def get_read_db() -> AsyncSession:
+    """Dependency for read-only endpoints: never commits, uses the read engine on SQLite."""
+    async with db_manager.read_session_factory() as session:
+        try:
+            yield session
+        finally:
+            await session.rollback()
+            await session.close()
+
+
 async def init_db():
     """Initialize database tables."""
     async with db_manager.engine.begin() as conn:
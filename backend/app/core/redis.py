@@ -102,6 +102,21 @@ class RedisManager:
             return int(count) if count else 0
         return self._mem_counters.get("minute", 0)
     
+    # Shared counters (e.g. cache versions)
+    async def get_counter(self, key: str) -> int:
+        """Get integer counter value (0 if unset)."""
+        if self._connected:
+            value = await self._redis.get(key)
+            return int(value) if value else 0
+        return self._mem_counters.get(key, 0)
+    
+    async def incr_counter(self, key: str) -> int:
+        """Increment integer counter and return the new value."""
+        if self._connected:
+            return await self._redis.incr(key)
+        self._mem_counters[key] = self._mem_counters.get(key, 0) + 1
+        return self._mem_counters[key]
+    
     # Pub/Sub for WebSocket
     async def publish_event(self, channel: str, message: str):
         """Publish event to channel."""
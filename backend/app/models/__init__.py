@@ -10,7 +10,12 @@ from .models import (
     MarketSearch,
     AnalysisSession,
     AnalysisMessage,
+    Metric,
     Telemetry,
+    TelemetryRollup,
+    TelemetryRollupBin,
+    TelemetryLatest,
+    TelemetryCatalog,
     Alarm,
     Command,
 )
@@ -26,7 +31,12 @@ __all__ = [
     "MarketSearch",
     "AnalysisSession",
     "AnalysisMessage",
+    "Metric",
     "Telemetry",
+    "TelemetryRollup",
+    "TelemetryRollupBin",
+    "TelemetryLatest",
+    "TelemetryCatalog",
     "Alarm",
     "Command",
 ]
@@ -16,36 +16,115 @@ from sqlalchemy import (
     DateTime,
     Date,
     Integer,
+    BigInteger,
+    SmallInteger,
     Index,
     UniqueConstraint,
     TypeDecorator,
 )
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import Mapped, mapped_column, relationship
-from sqlalchemy import types
+from sqlalchemy.sql.expression import ColumnElement
+from sqlalchemy import and_, bindparam, func, types
+from app.core.config import get_settings
 from app.core.database import Base
 
+settings = get_settings()
+
 
 class JSONType(TypeDecorator):
-    """Platform-independent JSON type. Uses TEXT for portability."""
+    """
+    Platform-independent JSON type. JSONB on PostgreSQL (queryable and
+    GIN-indexable), TEXT holding the serialized document elsewhere.
+    """
 
     impl = types.Text
     cache_ok = True
 
+    def load_dialect_impl(self, dialect):
+        if dialect.name == "postgresql":
+            return dialect.type_descriptor(postgresql.JSONB(none_as_null=True))
+        return dialect.type_descriptor(types.Text())
+
     def process_bind_param(self, value, dialect):
-        if value is not None:
-            return json.dumps(value)
-        return None
+        if value is None or dialect.name == "postgresql":
+            return value
+        return json.dumps(value)
 
     def process_result_value(self, value, dialect):
-        if value is not None:
-            return json.loads(value)
-        return None
+        if value is None or dialect.name == "postgresql":
+            return value
+        return json.loads(value)
+
+
+class _JSONContains(ColumnElement):
+    type = types.Boolean()
+    inherit_cache = False
+
+    def __init__(self, column, doc: dict):
+        self.column = column
+        self.doc = doc
+
+
+def json_contains(column, doc: dict):
+    """
+    Filter on a JSONType column containing doc, e.g.
+    json_contains(Device.meta_data, {"vendor": "chickin"}).
+    PostgreSQL uses JSONB containment (@>, served by the GIN indexes);
+    elsewhere each leaf of doc is compared with json_extract, so nested
+    objects match key by key and arrays must match exactly.
+    """
+    return _JSONContains(column, doc)
+
+
+def _json_leaves(doc: dict, path: str = "$"):
+    """(json path, value) of every non-object leaf of doc."""
+    for key, value in doc.items():
+        quoted = str(key).replace('"', "")
+        key_path = f'{path}."{quoted}"'
+        if isinstance(value, dict) and value:
+            yield from _json_leaves(value, key_path)
+        else:
+            yield key_path, value
+
+
+@compiles(_JSONContains)
+def _compile_json_contains(element, compiler, **kw):
+    clauses = []
+    for path, value in _json_leaves(element.doc):
+        extracted = func.json_extract(element.column, path)
+        if value is None:
+            clauses.append(extracted.is_(None))
+        elif isinstance(value, (dict, list)):
+            clauses.append(extracted == func.json(json.dumps(value)))
+        else:
+            clauses.append(extracted == value)
+    # Parenthesized: SQLite appends "= 1" to boolean expressions in WHERE
+    return f"({compiler.process(and_(*clauses), **kw)})"
+
+
+@compiles(_JSONContains, "postgresql")
+def _compile_json_contains_postgresql(element, compiler, **kw):
+    doc = bindparam(None, element.doc, type_=postgresql.JSONB)
+    return compiler.process(element.column.op("@>", return_type=types.Boolean)(doc), **kw)
+
+
+def _json_gin_index(name: str, column: str) -> tuple:
+    """GIN index on a JSONB column, created on PostgreSQL only (and only when enabled)."""
+    if not settings.pg_json_gin_indexes:
+        return ()
+    index = Index(name, column, postgresql_using="gin", postgresql_ops={column: "jsonb_path_ops"})
+    return (index.ddl_if(dialect="postgresql"),)
 
 
 class Site(Base):
     """Generic geo site/location model."""
 
     __tablename__ = "sites"
+    __table_args__ = (
+        Index("idx_sites_name", "name", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -63,6 +142,10 @@ class Device(Base):
     """IoT device model with generic telemetry and shadow state."""
 
     __tablename__ = "devices"
+    __table_args__ = (
+        Index("idx_devices_name", "name", "id"),
+        *_json_gin_index("idx_devices_meta_data", "meta_data"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     device_key: Mapped[str] = mapped_column(String(100), unique=True, nullable=False, index=True)
@@ -96,6 +179,9 @@ class Coop(Base):
     """Farm coop/kandang domain model."""
 
     __tablename__ = "coops"
+    __table_args__ = (
+        Index("idx_coops_name", "name", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     external_id: Mapped[str | None] = mapped_column(String(100), unique=True)
@@ -135,6 +221,8 @@ class Flock(Base):
     __tablename__ = "flocks"
     __table_args__ = (
         UniqueConstraint("coop_id", "floor_index", name="uq_flocks_coop_floor"),
+        *_json_gin_index("idx_flocks_sensors", "sensors"),
+        *_json_gin_index("idx_flocks_features", "features"),
     )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
@@ -329,6 +417,18 @@ class AnalysisMessage(Base):
     session: Mapped["AnalysisSession"] = relationship("AnalysisSession", back_populates="messages")
 
 
+class Metric(Base):
+    """Metric name dictionary; telemetry rows reference metrics by id."""
+
+    __tablename__ = "metrics"
+
+    # SMALLSERIAL on PostgreSQL; INTEGER PRIMARY KEY (rowid alias) on SQLite
+    id: Mapped[int] = mapped_column(
+        SmallInteger().with_variant(Integer(), "sqlite"), primary_key=True, autoincrement=True
+    )
+    name: Mapped[str] = mapped_column(String(50), unique=True, nullable=False)
+
+
 class Telemetry(Base):
     """Time-series telemetry data."""
 
@@ -336,19 +436,77 @@ class Telemetry(Base):
 
     time: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True, default=datetime.utcnow)
     device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), primary_key=True)
-    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    metric_id: Mapped[int] = mapped_column(SmallInteger, ForeignKey("metrics.id"), primary_key=True)
     value: Mapped[float] = mapped_column(Float, nullable=False)
 
     __table_args__ = (
         Index("idx_telemetry_device_time", "device_id", "time"),
-        Index("idx_telemetry_metric", "metric"),
+        Index("idx_telemetry_metric", "metric_id"),
+    )
+
+
+class TelemetryRollup(Base):
+    """Pre-aggregated telemetry per (resolution, device, metric, bucket)."""
+
+    __tablename__ = "telemetry_rollups"
+
+    resolution: Mapped[str] = mapped_column(String(4), primary_key=True)   # 1m | 1h | 1d
+    device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    min_value: Mapped[float] = mapped_column(Float, nullable=False)
+    max_value: Mapped[float] = mapped_column(Float, nullable=False)
+    sum_value: Mapped[float] = mapped_column(Float, nullable=False)
+    samples: Mapped[int] = mapped_column(Integer, nullable=False)
+
+    __table_args__ = (
+        Index("idx_rollups_device_bucket", "resolution", "device_id", "bucket"),
     )
 
 
+class TelemetryRollupBin(Base):
+    """Quantile-sketch bin counts per rollup bucket (see app.services.sketches)."""
+
+    __tablename__ = "telemetry_rollup_bins"
+
+    resolution: Mapped[str] = mapped_column(String(4), primary_key=True)   # 1m | 1h | 1d
+    device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    bucket: Mapped[datetime] = mapped_column(DateTime(timezone=True), primary_key=True)
+    bin: Mapped[int] = mapped_column(Integer, primary_key=True)
+    samples: Mapped[int] = mapped_column(Integer, nullable=False)
+
+
+class TelemetryLatest(Base):
+    """Most recent value per (device, metric), kept current by the ingest path."""
+
+    __tablename__ = "telemetry_latest"
+
+    device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    time: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    value: Mapped[float] = mapped_column(Float, nullable=False)
+
+
+class TelemetryCatalog(Base):
+    """Metrics seen per device with first/last sample time and count, kept current by the ingest path."""
+
+    __tablename__ = "telemetry_catalog"
+
+    device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), primary_key=True)
+    metric: Mapped[str] = mapped_column(String(50), primary_key=True)
+    first_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    last_seen: Mapped[datetime] = mapped_column(DateTime(timezone=True), nullable=False)
+    samples: Mapped[int] = mapped_column(BigInteger, nullable=False)
+
+
 class Alarm(Base):
     """Alarm/alert model."""
 
     __tablename__ = "alarms"
+    __table_args__ = (
+        Index("idx_alarms_time", "ts_open", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), index=True)
@@ -366,6 +524,9 @@ class Command(Base):
     """Device command model with acknowledgement tracking."""
 
     __tablename__ = "commands"
+    __table_args__ = (
+        Index("idx_commands_device_time", "device_id", "ts_sent", "id"),
+    )
 
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=lambda: str(uuid4()))
     device_id: Mapped[str] = mapped_column(String(36), ForeignKey("devices.id"), index=True)
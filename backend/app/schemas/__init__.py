@@ -13,6 +13,8 @@ from .schemas import (
     ChickinCoopResponse, ChickinFlockResponse,
     IntegrationErrorResponse,
     TelemetryPoint, TelemetryCreate, TelemetryResponse, TelemetryAggregated,
+    TelemetryBatchRow, TelemetryBatchCreate, TelemetryBatchReject, TelemetryBatchResult,
+    TelemetryStreamResult, TelemetryImportResult,
     AlarmBase, AlarmCreate, AlarmResponse, AlarmAcknowledge,
     CommandBase, CommandCreate, CommandResponse,
     OverviewStats, DeviceTypeCount,
@@ -33,6 +35,9 @@ __all__ = [
     "ChickinCoopResponse", "ChickinFlockResponse",
     "IntegrationErrorResponse",
     "TelemetryPoint", "TelemetryCreate", "TelemetryResponse", "TelemetryAggregated",
+    "TelemetryBatchRow", "TelemetryBatchCreate", "TelemetryBatchReject", "TelemetryBatchResult",
+    "TelemetryStreamResult",
+    "TelemetryImportResult",
     "AlarmBase", "AlarmCreate", "AlarmResponse", "AlarmAcknowledge",
     "CommandBase", "CommandCreate", "CommandResponse",
     "OverviewStats", "DeviceTypeCount",
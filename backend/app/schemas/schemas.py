@@ -484,6 +484,52 @@ class TelemetryCreate(BaseModel):
     timestamp: Optional[datetime] = None
 
 
+class TelemetryBatchRow(BaseModel):
+    device_id: str
+    metric: str  # name checked per row (rejected individually)
+    value: float
+    time: Optional[datetime] = None
+
+
+class TelemetryBatchCreate(BaseModel):
+    rows: list[TelemetryBatchRow] = Field(..., min_length=1, max_length=50000)
+    timestamp: Optional[datetime] = None  # default for rows without time
+
+
+class TelemetryBatchReject(BaseModel):
+    index: int
+    reason: str
+
+
+class TelemetryBatchResult(BaseModel):
+    status: str
+    accepted: int
+    rejected: list[TelemetryBatchReject] = []
+
+
+class TelemetryStreamResult(BaseModel):
+    status: str
+    lines: int
+    accepted: int
+    chunks: int
+    rejected_count: int
+    rejected: list[TelemetryBatchReject] = []  # first rejects only; index is the line number
+
+
+class TelemetryImportResult(BaseModel):
+    status: str
+    lines: int
+    rows: int
+    inserted: int
+    duplicates: int
+    chunks: int
+    rejected_count: int
+    rejected: list[TelemetryBatchReject] = []  # first rejects only; index is the CSV record number
+    unknown_devices: list[str] = []
+    seconds: float
+    rows_per_sec: int
+
+
 class TelemetryResponse(BaseModel):
     device_id: str
     data: list[TelemetryPoint]
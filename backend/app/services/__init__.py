@@ -1,6 +1,15 @@
 """Services module exports."""
 from .mqtt_service import mqtt_service, MQTTService
 from .websocket_service import ws_manager, WebSocketManager, websocket_endpoint
+from .telemetry_writer import telemetry_writer, TelemetryWriter
+from .device_registry import device_registry, DeviceRegistry
+from .mqtt_publisher import mqtt_publisher, MQTTPublisher
+from .command_tracker import command_tracker, CommandTracker
+from .status_writer import status_writer, StatusWriter
+from .shadow_store import shadow_store, ShadowStore
+from .retention import retention_job, RetentionJob
+from .metric_dictionary import metric_dictionary, MetricDictionary
+from .metric_catalog import metric_catalog, MetricCatalog
 
 __all__ = [
     "mqtt_service",
@@ -8,4 +17,22 @@ __all__ = [
     "ws_manager",
     "WebSocketManager",
     "websocket_endpoint",
+    "telemetry_writer",
+    "TelemetryWriter",
+    "device_registry",
+    "DeviceRegistry",
+    "mqtt_publisher",
+    "MQTTPublisher",
+    "command_tracker",
+    "CommandTracker",
+    "status_writer",
+    "StatusWriter",
+    "shadow_store",
+    "ShadowStore",
+    "retention_job",
+    "RetentionJob",
+    "metric_dictionary",
+    "MetricDictionary",
+    "metric_catalog",
+    "MetricCatalog",
 ]
@@ -0,0 +1,252 @@
+"""
+Time-bucket aggregation query builder.
+Turns (bucket width, metrics, time range, aggregates) into native SQL for the
+active dialect so aggregation always runs inside the database:
+
+- SQLite:     epoch integer division, strftime('%s', time) / width * width
+- PostgreSQL: date_trunc(unit, time, 'UTC') for whole minutes / hours / days,
+              otherwise date_bin() (PostgreSQL 14+, the default) or
+              time_bucket() (TimescaleDB, PG_BUCKET_FUNCTION=time_bucket)
+
+When the requested width is a multiple of a rollup resolution (1m / 1h / 1d)
+the query reads the coarsest such rollup instead of raw telemetry rows;
+sketch_bins_query merges the quantile-sketch bins of that rollup the same way.
+Raw rows store metric ids; the raw query groups by id and joins metrics for
+the name.
+"""
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import DateTime, Integer, Select, cast, func, literal, select, type_coerce
+from app.core.config import get_settings
+from app.models import Metric, Telemetry, TelemetryRollup, TelemetryRollupBin
+
+settings = get_settings()
+
+# API interval codes → bucket width in seconds
+INTERVALS: dict[str, int] = {
+    "1m": 60,
+    "5m": 300,
+    "15m": 900,
+    "1h": 3600,
+    "6h": 21600,
+    "1d": 86400,
+}
+
+# Rollup resolutions maintained at ingest, finest first
+RESOLUTIONS: dict[str, int] = {
+    "1m": 60,
+    "1h": 3600,
+    "1d": 86400,
+}
+
+# Rollup resolutions that also keep quantile-sketch bins (app.services.sketches)
+SKETCH_RESOLUTIONS: dict[str, int] = {
+    "1h": 3600,
+    "1d": 86400,
+}
+
+AGGREGATES = {
+    "avg": func.avg,
+    "min": func.min,
+    "max": func.max,
+    "sum": func.sum,
+    "count": func.count,
+}
+
+# Re-aggregation of rollup columns into the same aggregates
+ROLLUP_AGGREGATES = {
+    "avg": lambda: func.sum(TelemetryRollup.sum_value) / func.sum(TelemetryRollup.samples),
+    "min": lambda: func.min(TelemetryRollup.min_value),
+    "max": lambda: func.max(TelemetryRollup.max_value),
+    "sum": lambda: func.sum(TelemetryRollup.sum_value),
+    "count": lambda: func.sum(TelemetryRollup.samples),
+}
+
+# date_bin() needs an origin; buckets are aligned to the epoch like time_bucket()
+EPOCH = datetime(1970, 1, 1)
+
+# Bucket widths date_trunc() can produce directly
+TRUNC_UNITS = {60: "minute", 3600: "hour", 86400: "day"}
+
+
+def time_bucket(dialect_name: str, column, seconds: int):
+    """SQL expression flooring a timestamp column to a bucket of `seconds`."""
+    if dialect_name == "sqlite":
+        epoch = cast(func.strftime("%s", column), Integer) // seconds * seconds
+        # Same text layout SQLAlchemy stores DateTime in, so buckets compare/insert cleanly
+        return type_coerce(func.strftime("%Y-%m-%d %H:%M:%S.000000", epoch, "unixepoch"), DateTime())
+    if dialect_name == "postgresql":
+        if seconds in TRUNC_UNITS:
+            # Truncate in UTC, not the session time zone, to match epoch-aligned buckets
+            return func.date_trunc(TRUNC_UNITS[seconds], column, "UTC")
+        width = timedelta(seconds=seconds)
+        if settings.pg_bucket_function == "time_bucket":
+            return func.time_bucket(width, column)
+        return func.date_bin(width, column, literal(EPOCH.replace(tzinfo=timezone.utc), DateTime(timezone=True)))
+    raise ValueError(f"Time-bucket aggregation is not supported on {dialect_name}")
+
+
+def naive_utc(ts: datetime | None) -> datetime:
+    """A naive-UTC or aware timestamp as naive UTC (how times are stored); None → now."""
+    if ts is None:
+        return datetime.utcnow()
+    if ts.tzinfo is not None:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def floor_time(ts: datetime, seconds: int) -> datetime:
+    """Floor a (naive UTC or aware) timestamp to a bucket boundary, as naive UTC."""
+    ts = naive_utc(ts)
+    epoch = int((ts - EPOCH).total_seconds()) // seconds * seconds
+    return EPOCH + timedelta(seconds=epoch)
+
+
+def pick_resolution(seconds: int, resolutions: dict[str, int] = RESOLUTIONS) -> str | None:
+    """Coarsest rollup resolution whose buckets tile a `seconds`-wide bucket."""
+    fitting = [name for name, width in resolutions.items() if seconds % width == 0]
+    return fitting[-1] if fitting else None
+
+
+def minute_rollup_start() -> datetime | None:
+    """Oldest day still kept in the 1m rollups (older ones are pruned by retention); None = all."""
+    days = settings.telemetry_rollup_1m_retention_days
+    if not settings.telemetry_retention_enabled or not days:
+        return None
+    return floor_time(datetime.utcnow() - timedelta(days=days), 86400)
+
+
+def uses_rollups(seconds: int, start: datetime | None = None) -> bool:
+    """
+    Whether telemetry_aggregate_query serves this bucket width from a rollup.
+    A range starting before minute_rollup_start() cannot be served from the
+    1m rollups and is aggregated from raw rows (and the archive) instead.
+    """
+    resolution = pick_resolution(seconds)
+    if not settings.telemetry_rollups_enabled or resolution is None:
+        return False
+    if resolution == "1m" and start is not None:
+        horizon = minute_rollup_start()
+        return horizon is None or floor_time(start, 86400) >= horizon
+    return True
+
+
+def uses_sketches(seconds: int) -> bool:
+    """Whether sketch_bins_query can serve this bucket width (a multiple of 1h)."""
+    return (settings.telemetry_rollups_enabled and settings.telemetry_sketches_enabled
+            and pick_resolution(seconds, SKETCH_RESOLUTIONS) is not None)
+
+
+def rollup_aggregate_query(
+    dialect_name: str,
+    resolution: str,
+    device_ids: list[str] | None,
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    metrics: list[str] | None = None,
+    aggregates: tuple[str, ...] = ("avg", "min", "max", "count"),
+) -> Select:
+    """Same result shape as telemetry_aggregate_query, read from a rollup table."""
+    bucket = time_bucket(dialect_name, TelemetryRollup.bucket, seconds).label("bucket_time")
+    width = RESOLUTIONS[resolution]
+    query = (
+        select(
+            bucket,
+            TelemetryRollup.device_id,
+            TelemetryRollup.metric,
+            *(ROLLUP_AGGREGATES[name]().label(f"{name}_value") for name in aggregates),
+        )
+        .where(
+            TelemetryRollup.resolution == resolution,
+            TelemetryRollup.bucket >= floor_time(start, width),
+            TelemetryRollup.bucket <= end,
+        )
+        .group_by(bucket, TelemetryRollup.device_id, TelemetryRollup.metric)
+        .order_by(bucket)
+    )
+    if device_ids is not None:
+        query = query.where(TelemetryRollup.device_id.in_(device_ids))
+    if metrics:
+        query = query.where(TelemetryRollup.metric.in_(metrics))
+    return query
+
+
+def sketch_bins_query(
+    dialect_name: str,
+    device_ids: list[str] | None,
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    metrics: list[str] | None = None,
+) -> Select:
+    """
+    Merged sketch of every (bucket, device, metric): result columns
+    bucket_time, device_id, metric, bin and samples, one row per non-empty
+    bin, read from the coarsest sketch resolution (1h / 1d) that tiles the bucket.
+    """
+    resolution = pick_resolution(seconds, SKETCH_RESOLUTIONS)
+    width = SKETCH_RESOLUTIONS[resolution]
+    bucket = time_bucket(dialect_name, TelemetryRollupBin.bucket, seconds).label("bucket_time")
+    query = (
+        select(
+            bucket,
+            TelemetryRollupBin.device_id,
+            TelemetryRollupBin.metric,
+            TelemetryRollupBin.bin,
+            func.sum(TelemetryRollupBin.samples).label("samples"),
+        )
+        .where(
+            TelemetryRollupBin.resolution == resolution,
+            TelemetryRollupBin.bucket >= floor_time(start, width),
+            TelemetryRollupBin.bucket <= end,
+        )
+        .group_by(bucket, TelemetryRollupBin.device_id, TelemetryRollupBin.metric, TelemetryRollupBin.bin)
+    )
+    if device_ids is not None:
+        query = query.where(TelemetryRollupBin.device_id.in_(device_ids))
+    if metrics:
+        query = query.where(TelemetryRollupBin.metric.in_(metrics))
+    return query
+
+
+def telemetry_aggregate_query(
+    dialect_name: str,
+    device_ids: list[str] | None,
+    seconds: int,
+    start: datetime,
+    end: datetime,
+    metrics: list[str] | None = None,
+    aggregates: tuple[str, ...] = ("avg", "min", "max", "count"),
+    use_rollups: bool = True,
+) -> Select:
+    """
+    Aggregate telemetry per (bucket, device, metric).
+    Result columns: bucket_time, device_id, metric and <aggregate>_value for
+    each requested aggregate, ordered by bucket_time. device_ids=None means
+    all devices.
+    """
+    if use_rollups and uses_rollups(seconds, start):
+        return rollup_aggregate_query(
+            dialect_name, pick_resolution(seconds), device_ids, seconds, start, end, metrics, aggregates
+        )
+    bucket = time_bucket(dialect_name, Telemetry.time, seconds).label("bucket_time")
+    query = (
+        select(
+            bucket,
+            Telemetry.device_id,
+            Metric.name.label("metric"),
+            *(AGGREGATES[name](Telemetry.value).label(f"{name}_value") for name in aggregates),
+        )
+        .join(Metric, Metric.id == Telemetry.metric_id)
+        .where(
+            Telemetry.time >= start,
+            Telemetry.time <= end,
+        )
+        .group_by(bucket, Telemetry.device_id, Telemetry.metric_id, Metric.name)
+        .order_by(bucket)
+    )
+    if device_ids is not None:
+        query = query.where(Telemetry.device_id.in_(device_ids))
+    if metrics:
+        query = query.where(Metric.name.in_(metrics))
+    return query
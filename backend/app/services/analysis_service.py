@@ -22,6 +22,7 @@ from datetime import datetime
 from typing import Optional
 from app.core.app_settings import app_settings
 from app.services.ai_roles import detect_role, get_role_prompt, get_role_info, get_all_roles
+from app.services.metric_catalog import metric_catalog
 
 
 # SQL keywords that are NOT allowed (DML/DDL protection)
@@ -44,12 +45,13 @@ CURRENT ACTIVE ROLE: {role_name}
 DATABASE SCHEMA (available for data queries):
 - sites (id TEXT PK, name TEXT, latitude REAL, longitude REAL, region TEXT, address TEXT, created_at DATETIME)
 - devices (id TEXT PK, device_key TEXT UNIQUE, name TEXT, type TEXT, site_id TEXT FK→sites.id, firmware TEXT, status TEXT ['online','offline'], last_seen DATETIME, shadow_desired TEXT/JSON, shadow_reported TEXT/JSON, meta_data TEXT/JSON, created_at DATETIME, updated_at DATETIME)
-- telemetry (time DATETIME PK, device_id TEXT PK FK→devices.id, metric TEXT PK, value REAL)
+- telemetry (time DATETIME PK, device_id TEXT PK FK→devices.id, metric_id INTEGER PK FK→metrics.id, value REAL)
+- metrics (id INTEGER PK, name TEXT UNIQUE) — telemetry stores metric ids; JOIN metrics ON metrics.id = telemetry.metric_id to filter or group by metric name
 - alarms (id TEXT PK, device_id TEXT FK→devices.id, severity TEXT ['critical','warning','info'], message TEXT, ts_open DATETIME, ts_close DATETIME, acknowledged BOOLEAN, acknowledged_by TEXT)
 - commands (id TEXT PK, device_id TEXT FK→devices.id, command_type TEXT, payload TEXT/JSON, status TEXT, ts_sent DATETIME, ts_ack DATETIME, response TEXT/JSON)
 
 DEVICE TYPES: temperature, humidity, pressure, power
-TELEMETRY METRICS: temperature, humidity, pressure, power_watts, ammonia, wind_speed
+TELEMETRY METRICS (devices reporting, data range): {telemetry_metrics}
 ALARM SEVERITIES: critical, warning, info
 
 DATABASE TYPE: {db_type}
@@ -96,11 +98,25 @@ SQLITE_NOTES = """For SQLite:
 - Use GROUP BY strftime('%Y-%m-%d %H:00', time) for hourly grouping"""
 
 POSTGRES_NOTES = """For PostgreSQL/TimescaleDB:
-- Use time_bucket('1 hour', time) for time aggregation
+- Use date_trunc('hour', time) for time aggregation (time_bucket only exists on TimescaleDB)
 - Use NOW() - INTERVAL '7 days' for date math
 - Use JSONB operators for JSON fields
 - Use TO_CHAR(time, 'YYYY-MM-DD') for formatting"""
 
+# Listed when the metric catalog is still empty (fresh database)
+DEFAULT_TELEMETRY_METRICS = "temperature, humidity, pressure, power_watts, ammonia, wind_speed"
+
+
+def describe_telemetry_metrics() -> str:
+    """Metrics of the metric catalog with device count and data range, for the schema prompt."""
+    summary = metric_catalog.summary()
+    if not summary:
+        return DEFAULT_TELEMETRY_METRICS
+    return ", ".join(
+        f"{metric} ({entry['devices']} devices, {entry['first_seen']:%Y-%m-%d}..{entry['last_seen']:%Y-%m-%d})"
+        for metric, entry in sorted(summary.items())
+    )
+
 
 class ConversationMemory:
     """Manages multi-turn conversation context."""
@@ -327,6 +343,7 @@ class AnalysisService:
             db_type=db_type,
             db_specific_notes=db_notes,
             conversation_context=conv_context,
+            telemetry_metrics=describe_telemetry_metrics(),
         )
 
     async def generate_response(self, question: str, role_id: str = "data_analyst", session_id: str = "") -> dict:
@@ -338,6 +355,7 @@ class AnalysisService:
         role_config = ROLES.get(role_id, {})
         uses_search = role_config.get("uses_search", False)
 
+        await metric_catalog.refresh()
         prompt = f"{self._get_system_prompt(role_id, session_id)}\n\nUser question: {question}"
 
         # Retry with backoff for rate limit errors
@@ -420,7 +438,7 @@ class AnalysisService:
 
         sql = result
 
-        async with db_manager.session_factory() as session:
+        async with db_manager.read_session_factory() as session:
             try:
                 result = await session.execute(text(sql))
                 columns = list(result.keys())
@@ -699,7 +717,7 @@ class AnalysisService:
         from app.core.database import db_manager
 
         summary = {}
-        async with db_manager.session_factory() as session:
+        async with db_manager.read_session_factory() as session:
             try:
                 # Device counts
                 r = await session.execute(text(
@@ -718,10 +736,11 @@ class AnalysisService:
 
                 # Latest telemetry stats
                 r = await session.execute(text(
-                    "SELECT metric, ROUND(AVG(value), 2) as avg_val, "
-                    "ROUND(MAX(value), 2) as max_val, ROUND(MIN(value), 2) as min_val "
-                    "FROM telemetry WHERE time > datetime('now', '-1 day') "
-                    "GROUP BY metric"
+                    "SELECT m.name, ROUND(AVG(t.value), 2) as avg_val, "
+                    "ROUND(MAX(t.value), 2) as max_val, ROUND(MIN(t.value), 2) as min_val "
+                    "FROM telemetry t JOIN metrics m ON m.id = t.metric_id "
+                    "WHERE t.time > datetime('now', '-1 day') "
+                    "GROUP BY m.name"
                 ))
                 summary["latest_metrics"] = {}
                 for row in r.fetchall():
@@ -0,0 +1,327 @@
+"""
+Cold-tier telemetry archive.
+Before the retention job deletes a day of raw telemetry it is written to one
+columnar segment file per (device, metric, day):
+
+    {archive_dir}/{device_id}/{metric}/{YYYY-MM-DD}.seg
+
+Segment layout (little endian):
+    header  magic "TSG1", version, flags, count, first/last timestamp (µs
+            since epoch), min, max, sum, byte length of each column
+    times   int64 deltas in µs (first delta is 0; cumsum + first = timestamps)
+    values  float64
+With FLAG_ZLIB both columns are zlib-compressed; otherwise they are read
+zero-copy through np.memmap. The header doubles as the segment index: whole
+days inside a daily bucket are aggregated from it without touching the data.
+The sorted day list of every metric directory is cached and re-listed only
+when the directory changes (a segment written here or by another worker).
+"""
+import asyncio
+import bisect
+import os
+import struct
+import zlib
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from urllib.parse import quote, unquote
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.models import Metric, Telemetry
+from app.services.aggregation import EPOCH, floor_time
+
+settings = get_settings()
+
+MAGIC = b"TSG1"
+VERSION = 1
+FLAG_ZLIB = 1
+HEADER = struct.Struct("<4sHHIqqdddII")
+DAY_US = 86_400_000_000
+
+
+def to_us(ts: datetime) -> int:
+    """Microseconds since the epoch for a naive-UTC or aware timestamp."""
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return (ts - EPOCH) // timedelta(microseconds=1)
+
+
+def from_us(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+def write_segment(path: Path, times_us: np.ndarray, values: np.ndarray, compress: bool):
+    """Write one segment atomically (tmp file + rename)."""
+    deltas = np.diff(times_us, prepend=times_us[0]).astype("<i8").tobytes()
+    column = values.astype("<f8").tobytes()
+    flags = 0
+    if compress:
+        deltas, column, flags = zlib.compress(deltas), zlib.compress(column), FLAG_ZLIB
+    header = HEADER.pack(
+        MAGIC, VERSION, flags, len(times_us),
+        int(times_us[0]), int(times_us[-1]),
+        float(values.min()), float(values.max()), float(values.sum()),
+        len(deltas), len(column),
+    )
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    with open(tmp, "wb") as f:
+        f.write(header)
+        f.write(deltas)
+        f.write(column)
+    os.replace(tmp, path)
+
+
+def read_header(path: Path) -> dict:
+    with open(path, "rb") as f:
+        raw = f.read(HEADER.size)
+    magic, version, flags, count, first, last, vmin, vmax, vsum, ts_bytes, val_bytes = HEADER.unpack(raw)
+    if magic != MAGIC:
+        raise ValueError(f"Not a telemetry segment: {path}")
+    return {
+        "flags": flags, "count": count, "first": first, "last": last,
+        "min": vmin, "max": vmax, "sum": vsum,
+        "ts_bytes": ts_bytes, "val_bytes": val_bytes,
+    }
+
+
+def read_segment(path: Path, header: dict | None = None) -> tuple[np.ndarray, np.ndarray]:
+    """(timestamps in µs, values) of a segment; uncompressed columns are memory-mapped."""
+    header = header or read_header(path)
+    count = header["count"]
+    if header["flags"] & FLAG_ZLIB:
+        with open(path, "rb") as f:
+            f.seek(HEADER.size)
+            deltas = np.frombuffer(zlib.decompress(f.read(header["ts_bytes"])), dtype="<i8")
+            values = np.frombuffer(zlib.decompress(f.read(header["val_bytes"])), dtype="<f8")
+    else:
+        deltas = np.memmap(path, dtype="<i8", mode="r", offset=HEADER.size, shape=(count,))
+        values = np.memmap(path, dtype="<f8", mode="r", offset=HEADER.size + header["ts_bytes"], shape=(count,))
+    return header["first"] + np.cumsum(deltas), values
+
+
+class TelemetryArchive:
+    """Segment writer (retention side) and aggregating reader (query side)."""
+
+    def __init__(self, root: str, compress: bool):
+        self._root = Path(root)
+        self._compress = compress
+        self._segments_written = 0
+        self._rows_archived = 0
+        self._segments_read = 0
+        # (device_id, metric dir name) → (dir mtime_ns, sorted segment file names)
+        self._days: dict[tuple[str, str], tuple[int, list[str]]] = {}
+
+    def _path(self, device_id: str, metric: str, day: datetime) -> Path:
+        return self._root / device_id / quote(metric, safe="") / f"{day:%Y-%m-%d}.seg"
+
+    # ---- Writing ----
+
+    async def archive_day(
+        self, session: AsyncSession, day: datetime, day_end: datetime, metrics: list[str] | None = None
+    ) -> int:
+        """Export one day of raw telemetry to segments; returns the number of rows archived."""
+        query = (
+            select(Telemetry.device_id, Metric.name.label("metric"), Telemetry.time, Telemetry.value)
+            .join(Metric, Metric.id == Telemetry.metric_id)
+            .where(Telemetry.time >= day, Telemetry.time < day_end)
+            .order_by(Telemetry.device_id, Telemetry.metric_id, Telemetry.time)
+        )
+        if metrics is not None:
+            query = query.where(Metric.name.in_(metrics))
+
+        archived = 0
+        key, times, values = None, [], []
+        result = await session.stream(query)
+        async for partition in result.partitions(10000):
+            for row in partition:
+                if (row.device_id, row.metric) != key:
+                    if times:
+                        archived += await self._write(key, day, times, values)
+                    key, times, values = (row.device_id, row.metric), [], []
+                times.append(to_us(row.time))
+                values.append(row.value)
+        if times:
+            archived += await self._write(key, day, times, values)
+        return archived
+
+    async def _write(self, key: tuple[str, str], day: datetime, times: list, values: list) -> int:
+        path = self._path(key[0], key[1], day)
+        times_us = np.asarray(times, dtype=np.int64)
+        column = np.asarray(values, dtype=np.float64)
+        await asyncio.to_thread(self._merge_and_write, path, times_us, column)
+        self._days.pop((key[0], path.parent.name), None)
+        self._segments_written += 1
+        self._rows_archived += len(times_us)
+        return len(times_us)
+
+    def _merge_and_write(self, path: Path, times_us: np.ndarray, values: np.ndarray):
+        if path.exists():
+            # Late rows for an already archived day: merge, existing points win
+            old_times, old_values = read_segment(path)
+            times_us = np.concatenate([np.asarray(old_times), times_us])
+            values = np.concatenate([np.asarray(old_values), values])
+            times_us, first = np.unique(times_us, return_index=True)
+            values = values[first]
+        write_segment(path, times_us, values, self._compress)
+
+    # ---- Reading ----
+
+    def segments(self, device_id: str, metrics: list[str] | None, start: datetime, end: datetime):
+        """Yield (metric, path) for segments of a device whose day overlaps [start, end]."""
+        device_dir = self._root / device_id
+        if not device_dir.is_dir():
+            return
+        first_day = f"{floor_time(start, 86400):%Y-%m-%d}.seg"
+        last_day = f"{floor_time(end, 86400):%Y-%m-%d}.seg"
+        wanted = {quote(metric, safe="") for metric in metrics} if metrics else None
+        for metric_dir in device_dir.iterdir():
+            if wanted is not None and metric_dir.name not in wanted:
+                continue
+            days = self._day_index(device_id, metric_dir)
+            lo = bisect.bisect_left(days, first_day)
+            hi = bisect.bisect_right(days, last_day)
+            for name in days[lo:hi]:
+                yield unquote(metric_dir.name), metric_dir / name
+
+    def _day_index(self, device_id: str, metric_dir: Path) -> list[str]:
+        """Sorted segment file names of a metric directory (cached per directory mtime)."""
+        key = (device_id, metric_dir.name)
+        mtime = metric_dir.stat().st_mtime_ns
+        cached = self._days.get(key)
+        if cached is not None and cached[0] == mtime:
+            return cached[1]
+        days = sorted(segment.name for segment in metric_dir.glob("*.seg"))
+        self._days[key] = (mtime, days)
+        return days
+
+    def points(self, device_id: str, metrics: list[str] | None, start: datetime, end: datetime):
+        """
+        Yield the archived points (time µs, metric, value) of one device within
+        [start, end] in time order, reading one day of segments at a time.
+        """
+        by_day: dict[str, list] = {}
+        for metric, path in self.segments(device_id, metrics, start, end):
+            by_day.setdefault(path.name, []).append((metric, path))
+        start_us, end_us = to_us(start), to_us(end)
+        for day in sorted(by_day):
+            times, names, values = [], [], []
+            for metric, path in by_day[day]:
+                times_us, column = read_segment(path)
+                self._segments_read += 1
+                mask = (times_us >= start_us) & (times_us <= end_us)
+                times.append(times_us[mask])
+                values.append(np.asarray(column)[mask])
+                names.extend([metric] * int(mask.sum()))
+            times_us = np.concatenate(times)
+            order = np.argsort(times_us, kind="stable")
+            column = np.concatenate(values)
+            for index in order:
+                yield int(times_us[index]), names[index], float(column[index])
+
+    def aggregate(
+        self,
+        device_ids: list[str],
+        seconds: int,
+        start: datetime,
+        end: datetime,
+        metrics: list[str] | None = None,
+    ) -> list[dict]:
+        """
+        Bucketed min/max/sum/count from archived segments, in the same shape as
+        the SQL aggregation rows (bucket_time, device_id, metric, *_value).
+        """
+        start_us, end_us = to_us(start), to_us(end)
+        width_us = seconds * 1_000_000
+        buckets: dict[tuple, list] = {}
+
+        def add(key, vmin, vmax, vsum, count):
+            acc = buckets.get(key)
+            if acc is None:
+                buckets[key] = [vmin, vmax, vsum, count]
+            else:
+                acc[0] = min(acc[0], vmin)
+                acc[1] = max(acc[1], vmax)
+                acc[2] += vsum
+                acc[3] += count
+
+        for device_id in device_ids:
+            for metric, path in self.segments(device_id, metrics, start, end):
+                header = read_header(path)
+                self._segments_read += 1
+                first_bucket = header["first"] // width_us
+                if (first_bucket == header["last"] // width_us
+                        and start_us <= header["first"] and header["last"] <= end_us):
+                    # Whole segment falls in one bucket: answer from the header
+                    add((first_bucket, device_id, metric),
+                        header["min"], header["max"], header["sum"], header["count"])
+                    continue
+
+                times_us, values = read_segment(path, header)
+                mask = (times_us >= start_us) & (times_us <= end_us)
+                if not mask.any():
+                    continue
+                times_us, values = times_us[mask], np.asarray(values)[mask]
+                bucket_ids = times_us // width_us
+                starts = np.flatnonzero(np.r_[True, bucket_ids[1:] != bucket_ids[:-1]])
+                counts = np.diff(np.r_[starts, len(values)])
+                mins = np.minimum.reduceat(values, starts)
+                maxs = np.maximum.reduceat(values, starts)
+                sums = np.add.reduceat(values, starts)
+                for i, index in enumerate(starts):
+                    add((int(bucket_ids[index]), device_id, metric),
+                        float(mins[i]), float(maxs[i]), float(sums[i]), int(counts[i]))
+
+        return [
+            {
+                "bucket_time": from_us(bucket * width_us),
+                "device_id": device_id,
+                "metric": metric,
+                "min_value": acc[0],
+                "max_value": acc[1],
+                "sum_value": acc[2],
+                "count_value": acc[3],
+            }
+            for (bucket, device_id, metric), acc in buckets.items()
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "root": str(self._root),
+            "compress": self._compress,
+            "segments_written": self._segments_written,
+            "rows_archived": self._rows_archived,
+            "segments_read": self._segments_read,
+        }
+
+
+def merge_aggregates(*row_sets) -> list[dict]:
+    """
+    Combine bucket rows (min/max/sum/count) from several sources and add avg_value.
+    Buckets are matched on naive-UTC time, so aware SQL timestamps (PostgreSQL)
+    merge with naive archive ones; merged rows carry naive-UTC bucket_time.
+    """
+    merged: dict[tuple, dict] = {}
+    for rows in row_sets:
+        for row in rows:
+            bucket = to_us(row["bucket_time"])
+            key = (bucket, row["device_id"], row["metric"])
+            current = merged.get(key)
+            if current is None:
+                merged[key] = {**row, "bucket_time": from_us(bucket)}
+                continue
+            current["min_value"] = min(current["min_value"], row["min_value"])
+            current["max_value"] = max(current["max_value"], row["max_value"])
+            current["sum_value"] += row["sum_value"]
+            current["count_value"] += row["count_value"]
+    for row in merged.values():
+        row["avg_value"] = row["sum_value"] / row["count_value"]
+    return list(merged.values())
+
+
+# Global instance
+telemetry_archive = TelemetryArchive(
+    root=settings.telemetry_archive_dir,
+    compress=settings.telemetry_archive_compress,
+)
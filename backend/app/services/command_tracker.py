@@ -0,0 +1,156 @@
+"""
+Command acknowledgement tracking.
+Device acks arriving on iot/+/+/commands/response are collected in memory and
+applied to the commands table in batched UPDATEs. Outstanding commands sit
+in a deadline heap; a sweeper pops expired entries and marks them "timeout"
+without scanning the table.
+"""
+import asyncio
+import heapq
+import time
+from datetime import datetime, timezone
+from sqlalchemy import bindparam, select, update
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Command
+
+settings = get_settings()
+
+# Device-reported statuses that mean the command was rejected
+FAILED_STATUSES = {"failed", "error", "rejected"}
+
+ACK_UPDATE = (
+    update(Command.__table__)
+    .where(Command.__table__.c.id == bindparam("b_id"))
+    .values(
+        status=bindparam("b_status"),
+        ts_ack=bindparam("b_ts_ack"),
+        response=bindparam("b_response"),
+    )
+)
+
+
+def _epoch(ts: datetime) -> float:
+    """Epoch seconds for a naive-UTC (or aware) datetime."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return ts.timestamp()
+
+
+class CommandTracker:
+    """Batches command acks and times out unanswered commands."""
+
+    def __init__(self, timeout: float, flush_interval: float):
+        self._timeout = timeout
+        self._flush_interval = flush_interval
+        self._acks: dict[str, dict] = {}           # command_id → column updates
+        self._deadlines: list[tuple[float, str]] = []  # (deadline epoch, command_id)
+        self._outstanding: set[str] = set()
+        self._running = False
+        self._acked = 0
+        self._timed_out = 0
+        self._flush_errors = 0
+
+    def track(self, command_id: str, ts_sent: datetime | None = None):
+        """Start waiting for an ack of a command that was just sent."""
+        sent = _epoch(ts_sent) if ts_sent else time.time()
+        heapq.heappush(self._deadlines, (sent + self._timeout, command_id))
+        self._outstanding.add(command_id)
+
+    def ack(self, command_id: str, status: str | None, response=None):
+        """Record a device acknowledgement (applied on the next flush)."""
+        self._outstanding.discard(command_id)
+        self._acks[command_id] = {
+            "b_id": command_id,
+            "b_status": "failed" if (status or "").lower() in FAILED_STATUSES else "acked",
+            "b_ts_ack": datetime.utcnow(),
+            "b_response": response if isinstance(response, dict) else {"value": response},
+        }
+
+    async def load(self):
+        """Re-arm deadlines for commands still marked sent (e.g. after a restart)."""
+        async with db_manager.session_factory() as session:
+            result = await session.execute(
+                select(Command.id, Command.ts_sent).where(Command.status == "sent")
+            )
+            rows = result.all()
+        for command_id, ts_sent in rows:
+            self.track(command_id, ts_sent)
+        if rows:
+            print(f"CommandTracker: Tracking {len(rows)} outstanding commands")
+
+    async def run(self):
+        """Flush acks and sweep expired deadlines every flush interval."""
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self._flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"CommandTracker: Flush failed: {e}")
+
+    async def stop(self):
+        self._running = False
+        await self.flush()
+
+    async def flush(self):
+        pending, self._acks = self._acks, {}
+        expired = self._pop_expired()
+        if not pending and not expired:
+            return
+
+        acks = list(pending.values())
+        try:
+            async with db_manager.session_factory() as session:
+                if acks:
+                    # One executemany; acks for unknown ids simply match no row
+                    await session.execute(ACK_UPDATE, acks)
+                if expired:
+                    await session.execute(
+                        update(Command)
+                        .where(Command.id.in_(expired), Command.status == "sent")
+                        .values(status="timeout")
+                    )
+                await session.commit()
+        except Exception as e:
+            self._flush_errors += 1
+            print(f"CommandTracker: Flush of {len(acks)} acks / {len(expired)} timeouts failed: {e}")
+            # Retry on the next flush; acks received meanwhile are newer and win
+            for command_id, ack in pending.items():
+                self._acks.setdefault(command_id, ack)
+            now = time.time()
+            for command_id in expired:
+                if command_id not in self._acks:
+                    heapq.heappush(self._deadlines, (now, command_id))
+                    self._outstanding.add(command_id)
+            return
+        self._acked += len(acks)
+        self._timed_out += len(expired)
+
+    def _pop_expired(self) -> list[str]:
+        now = time.time()
+        expired = []
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, command_id = heapq.heappop(self._deadlines)
+            if command_id in self._outstanding:
+                self._outstanding.discard(command_id)
+                expired.append(command_id)
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "outstanding": len(self._outstanding),
+            "pending_acks": len(self._acks),
+            "acked": self._acked,
+            "timed_out": self._timed_out,
+            "flush_errors": self._flush_errors,
+            "timeout_seconds": self._timeout,
+        }
+
+
+# Global instance
+command_tracker = CommandTracker(
+    timeout=settings.command_timeout_seconds,
+    flush_interval=settings.command_flush_interval,
+)
+db_manager.on_swap(flush=command_tracker.flush)
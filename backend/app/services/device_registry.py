@@ -0,0 +1,202 @@
+"""
+In-process device registry for the ingest hot path.
+Keeps device ids (with their site), device_key → id and Ci-Touch
+(part_number, floor) → device/flock mappings in memory so that existence
+checks and MQTT routing cost no database round trip.
+
+The registry is loaded at startup and updated on device create/update/delete.
+When Redis is available a shared version counter lets every worker notice
+changes made by other processes and reload.
+"""
+import asyncio
+import re
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.core.redis import redis_manager
+from app.models import Device, Flock
+
+settings = get_settings()
+
+VERSION_KEY = "registry:devices:version"
+
+# Device keys of Ci-Touch floors are registered as "{pn}/Lantai{n}"
+CHICKIN_DEVICE_KEY = re.compile(r"^(?P<pn>[^/]+)/Lantai(?P<floor>\d+)$")
+
+
+def chickin_device_key(part_number: str, floor: int) -> str:
+    """Device key used to register one floor of a Ci-Touch controller."""
+    return f"{part_number}/Lantai{floor}"
+
+
+class DeviceRegistry:
+    """Device id / key / part-number lookup cache."""
+
+    def __init__(self, sync_interval: float = 5.0):
+        self._sites: dict[str, str | None] = {}     # device_id → site_id
+        self._keys: dict[str, str] = {}             # device_key → device_id
+        self._key_of: dict[str, str] = {}           # device_id → device_key
+        self._flocks: dict[tuple[str, int], str] = {}  # (part_number, floor) → flock_id
+        self._version = 0
+        self._shared_version: int | None = None
+        self._stale = False
+        self._loaded = False
+        self._running = False
+        self._sync_interval = sync_interval
+
+    # ---- Loading ----
+
+    async def load(self):
+        """Load all devices and Ci-Touch flocks from the database."""
+        async with db_manager.session_factory() as session:
+            device_rows = (await session.execute(
+                select(Device.id, Device.device_key, Device.site_id)
+            )).all()
+            flock_rows = (await session.execute(
+                select(Flock.id, Flock.part_number, Flock.floor_index)
+                .where(Flock.part_number.is_not(None), Flock.deleted.is_(False))
+            )).all()
+
+        self._sites = {row.id: row.site_id for row in device_rows}
+        self._keys = {row.device_key: row.id for row in device_rows}
+        self._key_of = {row.id: row.device_key for row in device_rows}
+        self._flocks = {
+            (row.part_number, (row.floor_index or 0) + 1): row.id for row in flock_rows
+        }
+        self._stale = False
+        self._loaded = True
+        self._version += 1
+        if redis_manager.is_connected:
+            self._shared_version = await redis_manager.get_counter(VERSION_KEY)
+        print(f"DeviceRegistry: Loaded {len(self._sites)} devices, {len(self._flocks)} Ci-Touch floors")
+
+    async def run(self):
+        """Reload when marked stale or when another worker bumped the shared version."""
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self._sync_interval)
+            try:
+                if redis_manager.is_connected:
+                    shared = await redis_manager.get_counter(VERSION_KEY)
+                    if shared != self._shared_version:
+                        self._stale = True
+                if self._stale:
+                    await self.load()
+            except Exception as e:
+                print(f"DeviceRegistry: Sync failed: {e}")
+
+    async def stop(self):
+        self._running = False
+
+    # ---- Invalidation ----
+
+    async def upsert(self, device: Device):
+        """Record a created or updated device."""
+        old_key = self._key_of.get(device.id)
+        if old_key is not None and old_key != device.device_key:
+            self._keys.pop(old_key, None)
+        self._sites[device.id] = device.site_id
+        self._keys[device.device_key] = device.id
+        self._key_of[device.id] = device.device_key
+        await self._changed()
+
+    async def remove(self, device_id: str):
+        """Forget a deleted device."""
+        self._sites.pop(device_id, None)
+        key = self._key_of.pop(device_id, None)
+        if key is not None:
+            self._keys.pop(key, None)
+        await self._changed()
+
+    def clear(self):
+        """Forget every device (database swapped; load() repopulates)."""
+        self._sites, self._keys, self._key_of, self._flocks = {}, {}, {}, {}
+        self._loaded = False
+        self._version += 1
+
+    async def mark_stale(self):
+        """Schedule a full reload (e.g. after flock part numbers changed)."""
+        self._stale = True
+        await self._changed(bump_local=False)
+
+    async def _changed(self, bump_local: bool = True):
+        if bump_local:
+            self._version += 1
+        if redis_manager.is_connected:
+            self._shared_version = await redis_manager.incr_counter(VERSION_KEY)
+
+    # ---- Lookups ----
+
+    @property
+    def version(self) -> int:
+        """Local version, bumped on every change (used by the topic router)."""
+        return self._version
+
+    def exists(self, device_id: str) -> bool:
+        return device_id in self._sites
+
+    def site_of(self, device_id: str) -> str | None:
+        return self._sites.get(device_id)
+
+    def devices_in_site(self, site_id: str) -> list[str]:
+        return [device_id for device_id, site in self._sites.items() if site == site_id]
+
+    def resolve_key(self, device_key: str) -> str | None:
+        return self._keys.get(device_key)
+
+    def known(self, device_ids) -> set[str]:
+        """Subset of device_ids present in the registry."""
+        return {device_id for device_id in device_ids if device_id in self._sites}
+
+    async def filter_known(self, session: AsyncSession, device_ids: set[str]) -> set[str]:
+        """
+        Subset of device_ids that exist. Registry hits cost nothing; misses are
+        confirmed with one IN query (covers devices created by another worker
+        before the shared version is picked up).
+        """
+        known = self.known(device_ids)
+        missing = device_ids - known
+        if missing:
+            result = await session.execute(
+                select(Device.id, Device.device_key, Device.site_id).where(Device.id.in_(missing))
+            )
+            for row in result:
+                self._sites[row.id] = row.site_id
+                self._keys[row.device_key] = row.id
+                self._key_of[row.id] = row.device_key
+                known.add(row.id)
+                self._version += 1
+        return known
+
+    async def ensure_exists(self, session: AsyncSession, device_id: str) -> bool:
+        """Single-device variant of filter_known."""
+        if device_id in self._sites:
+            return True
+        return bool(await self.filter_known(session, {device_id}))
+
+    def chickin_floors(self) -> dict[tuple[str, int], tuple[str | None, str | None]]:
+        """(part_number, floor) → (device_id, flock_id) for every known Ci-Touch floor."""
+        floors: dict[tuple[str, int], tuple[str | None, str | None]] = {}
+        for device_key, device_id in self._keys.items():
+            match = CHICKIN_DEVICE_KEY.match(device_key)
+            if match:
+                floors[(match["pn"], int(match["floor"]))] = (device_id, None)
+        for key, flock_id in self._flocks.items():
+            device_id = self._keys.get(chickin_device_key(*key))
+            floors[key] = (device_id, flock_id)
+        return floors
+
+    def stats(self) -> dict:
+        return {
+            "loaded": self._loaded,
+            "devices": len(self._sites),
+            "chickin_floors": len(self._flocks),
+            "version": self._version,
+            "shared_version": self._shared_version,
+        }
+
+
+# Global instance
+device_registry = DeviceRegistry(sync_interval=settings.device_registry_sync_interval)
+db_manager.on_swap(device_registry.load, reset=device_registry.clear)
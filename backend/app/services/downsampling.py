@@ -0,0 +1,82 @@
+"""
+Point-budget downsampling for chart series.
+A series of bucket rows (ascending bucket_time) is thinned to at most
+max_points rows while keeping its visual shape:
+
+    lttb    Largest-Triangle-Three-Buckets on (bucket_time, avg): per bucket
+            the point forming the largest triangle with the previously kept
+            point and the mean of the next bucket.
+    minmax  the buckets holding the lowest min_value and highest max_value of
+            each of (max_points - 2) / 2 ranges plus both ends, so spikes
+            always survive.
+
+Selected rows are returned whole (avg/min/max/count of the original bucket).
+"""
+import numpy as np
+from app.services.archive import to_us
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """Indices of the n_out points LTTB keeps; first and last are always kept."""
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+    # n_out - 2 buckets over the interior points 1 .. n-2
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    cum_x = np.concatenate(([0.0], np.cumsum(x)))
+    cum_y = np.concatenate(([0.0], np.cumsum(y)))
+    sizes = edges[1:] - edges[:-1]
+    mean_x = (cum_x[edges[1:]] - cum_x[edges[:-1]]) / sizes
+    mean_y = (cum_y[edges[1:]] - cum_y[edges[:-1]]) / sizes
+    # The bucket after the last interior one is the final point itself
+    next_x = np.append(mean_x[1:], x[-1])
+    next_y = np.append(mean_y[1:], y[-1])
+
+    selected = np.empty(n_out, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, stop = edges[i], edges[i + 1]
+        areas = np.abs(
+            (x[a] - next_x[i]) * (y[start:stop] - y[a])
+            - (x[a] - x[start:stop]) * (next_y[i] - y[a])
+        )
+        a = start + int(np.argmax(areas))
+        selected[i + 1] = a
+    return selected
+
+
+def minmax_indices(low: np.ndarray, high: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Indices of the lowest low and highest high in each of (n_out - 2) // 2
+    equal ranges, plus the first and last point so the series spans the range.
+    """
+    n = len(low)
+    bins = (n_out - 2) // 2
+    if n_out >= n:
+        return np.arange(n)
+    if bins < 1:
+        return np.array([0, n - 1])
+    segment = np.arange(n) * bins // n
+    firsts = np.flatnonzero(np.r_[True, segment[1:] != segment[:-1]])
+    # Within each segment the first row after sorting by value is the extreme
+    argmins = np.lexsort((low, segment))[firsts]
+    argmaxs = np.lexsort((-high, segment))[firsts]
+    return np.unique(np.concatenate(([0, n - 1], argmins, argmaxs)))
+
+
+def downsample(rows: list[dict], max_points: int, method: str = "lttb") -> list[dict]:
+    """Thin bucket rows (sorted by bucket_time ascending) to at most max_points rows."""
+    if len(rows) <= max_points:
+        return rows
+    if method == "lttb":
+        x = np.fromiter((to_us(row["bucket_time"]) for row in rows), dtype=np.float64, count=len(rows))
+        y = np.fromiter((row["avg_value"] for row in rows), dtype=np.float64, count=len(rows))
+        keep = lttb_indices(x, y, max_points)
+    elif method == "minmax":
+        low = np.fromiter((row["min_value"] for row in rows), dtype=np.float64, count=len(rows))
+        high = np.fromiter((row["max_value"] for row in rows), dtype=np.float64, count=len(rows))
+        keep = minmax_indices(low, high, max_points)
+    else:
+        raise ValueError(f"Unknown downsampling method: {method}")
+    return [rows[i] for i in keep]
@@ -0,0 +1,154 @@
+"""
+Latest telemetry value per (device, metric).
+The ingest path upserts telemetry_latest in the same transaction as the raw
+rows (older timestamps never overwrite newer ones), so a dashboard tile is
+one primary-key lookup instead of a DISTINCT plus one query per metric.
+
+LatestCache mirrors the table in memory. Writes committed by this process
+update cached devices immediately; entries also expire after a short TTL so
+values written by other workers are picked up.
+"""
+import time
+from sqlalchemy import and_, func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager, on_commit
+from app.models import Metric, Telemetry, TelemetryLatest
+
+settings = get_settings()
+
+
+def _upsert_statement(dialect_name: str):
+    """INSERT that replaces the stored value only with a newer one."""
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(TelemetryLatest)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(TelemetryLatest)
+    else:
+        raise ValueError(f"Latest-value upsert is not supported on {dialect_name}")
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["device_id", "metric"],
+        set_={"time": excluded.time, "value": excluded.value},
+        where=excluded.time > TelemetryLatest.time,
+    )
+
+
+def newest_per_key(rows) -> dict[tuple[str, str], tuple]:
+    """(device_id, metric) → (time, value) of the newest row in a batch."""
+    newest: dict[tuple[str, str], tuple] = {}
+    for row in rows:
+        key = (row.device_id, row.metric)
+        current = newest.get(key)
+        if current is None or row.time > current[0]:
+            newest[key] = (row.time, float(row.value))
+    return newest
+
+
+async def upsert_latest(session: AsyncSession, rows) -> int:
+    """Record the newest value of each (device, metric) in a batch of inserted rows."""
+    newest = newest_per_key(rows)
+    if not newest:
+        return 0
+    await session.execute(_upsert_statement(session.get_bind().dialect.name), [
+        {"device_id": device_id, "metric": metric, "time": ts, "value": value}
+        for (device_id, metric), (ts, value) in newest.items()
+    ])
+    on_commit(session, latest_cache.apply, newest)
+    return len(newest)
+
+
+async def backfill_latest():
+    """Populate telemetry_latest from raw telemetry when it is still empty."""
+    async with db_manager.session_factory() as session:
+        if await session.scalar(select(TelemetryLatest.metric).limit(1)) is not None:
+            return
+        newest = (
+            select(Telemetry.device_id, Telemetry.metric_id, func.max(Telemetry.time).label("time"))
+            .group_by(Telemetry.device_id, Telemetry.metric_id)
+            .subquery()
+        )
+        result = await session.execute(
+            insert(TelemetryLatest).from_select(
+                ["device_id", "metric", "time", "value"],
+                select(Telemetry.device_id, Metric.name, Telemetry.time, Telemetry.value)
+                .join(newest, and_(
+                    Telemetry.device_id == newest.c.device_id,
+                    Telemetry.metric_id == newest.c.metric_id,
+                    Telemetry.time == newest.c.time,
+                ))
+                .join(Metric, Metric.id == Telemetry.metric_id),
+            )
+        )
+        await session.commit()
+    if result.rowcount:
+        print(f"LatestCache: Backfilled {result.rowcount} latest values")
+
+
+class LatestCache:
+    """In-memory mirror of telemetry_latest, per device."""
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._devices: dict[str, tuple[float, dict]] = {}  # device_id → (expiry, {metric: (time, value)})
+        self._hits = 0
+        self._misses = 0
+
+    async def get_many(self, session: AsyncSession, device_ids: list[str]) -> dict[str, dict]:
+        """device_id → {metric: (time, value)}; cache misses are loaded with one query."""
+        now = time.monotonic()
+        found: dict[str, dict] = {}
+        missing = []
+        for device_id in device_ids:
+            entry = self._devices.get(device_id)
+            if entry is not None and entry[0] > now:
+                found[device_id] = entry[1]
+            else:
+                missing.append(device_id)
+        self._hits += len(found)
+        self._misses += len(missing)
+
+        if missing:
+            loaded: dict[str, dict] = {device_id: {} for device_id in missing}
+            result = await session.execute(
+                select(TelemetryLatest).where(TelemetryLatest.device_id.in_(missing))
+            )
+            for row in result.scalars():
+                loaded[row.device_id][row.metric] = (row.time, row.value)
+            expiry = now + self._ttl
+            for device_id, metrics in loaded.items():
+                self._devices[device_id] = (expiry, metrics)
+            found.update(loaded)
+        return found
+
+    async def get(self, session: AsyncSession, device_id: str) -> dict:
+        return (await self.get_many(session, [device_id]))[device_id]
+
+    def apply(self, newest: dict[tuple[str, str], tuple]):
+        """Merge committed values into devices that are already cached."""
+        for (device_id, metric), (ts, value) in newest.items():
+            entry = self._devices.get(device_id)
+            if entry is None:
+                continue
+            current = entry[1].get(metric)
+            if current is None or ts > current[0]:
+                entry[1][metric] = (ts, value)
+
+    def forget(self, device_id: str):
+        self._devices.pop(device_id, None)
+
+    def clear(self):
+        self._devices = {}
+
+    def stats(self) -> dict:
+        return {
+            "cached_devices": len(self._devices),
+            "hits": self._hits,
+            "misses": self._misses,
+        }
+
+
+# Global instance
+latest_cache = LatestCache(ttl=settings.telemetry_latest_cache_ttl)
+db_manager.on_swap(backfill_latest, reset=latest_cache.clear)
@@ -0,0 +1,179 @@
+"""
+Metric catalog: which metrics each device reports.
+telemetry_catalog keeps one row per (device, metric) with the first and last
+sample time and the number of samples ingested. The ingest path upserts it in
+the same transaction as the raw rows, so listing available metrics never
+scans telemetry (samples counts every row ever ingested, including rows
+retention has since removed).
+
+MetricCatalog mirrors the whole table in memory (devices × metrics rows).
+Writes committed by this process are applied immediately; the mirror is
+reloaded after a TTL to pick up rows written by other workers.
+"""
+import time
+from collections import defaultdict
+from sqlalchemy import func, insert, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager, on_commit
+from app.models import Metric, Telemetry, TelemetryCatalog
+
+settings = get_settings()
+
+
+def _upsert_statement(dialect_name: str):
+    """INSERT that widens the seen range and adds to the sample count."""
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(TelemetryCatalog)
+        least, greatest = func.least, func.greatest
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(TelemetryCatalog)
+        least, greatest = func.min, func.max   # multi-argument scalar min/max
+    else:
+        raise ValueError(f"Catalog upsert is not supported on {dialect_name}")
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=["device_id", "metric"],
+        set_={
+            "first_seen": least(TelemetryCatalog.first_seen, excluded.first_seen),
+            "last_seen": greatest(TelemetryCatalog.last_seen, excluded.last_seen),
+            "samples": TelemetryCatalog.samples + excluded.samples,
+        },
+    )
+
+
+def catalog_deltas(rows) -> dict[tuple[str, str], list]:
+    """(device_id, metric) → [first_seen, last_seen, samples] of a batch of inserted rows."""
+    deltas: dict[tuple[str, str], list] = {}
+    for row in rows:
+        key = (row.device_id, row.metric)
+        delta = deltas.get(key)
+        if delta is None:
+            deltas[key] = [row.time, row.time, 1]
+        else:
+            if row.time < delta[0]:
+                delta[0] = row.time
+            elif row.time > delta[1]:
+                delta[1] = row.time
+            delta[2] += 1
+    return deltas
+
+
+async def update_catalog(session: AsyncSession, rows) -> int:
+    """Record a batch of inserted telemetry rows (time, device_id, metric, value) in the catalog."""
+    deltas = catalog_deltas(rows)
+    if not deltas:
+        return 0
+    await session.execute(_upsert_statement(session.get_bind().dialect.name), [
+        {"device_id": device_id, "metric": metric, "first_seen": first, "last_seen": last, "samples": samples}
+        for (device_id, metric), (first, last, samples) in deltas.items()
+    ])
+    on_commit(session, metric_catalog.apply, deltas)
+    return len(deltas)
+
+
+async def backfill_catalog():
+    """Populate telemetry_catalog from raw telemetry when it is still empty."""
+    async with db_manager.session_factory() as session:
+        if await session.scalar(select(TelemetryCatalog.metric).limit(1)) is not None:
+            return
+        result = await session.execute(
+            insert(TelemetryCatalog).from_select(
+                ["device_id", "metric", "first_seen", "last_seen", "samples"],
+                select(
+                    Telemetry.device_id,
+                    Metric.name,
+                    func.min(Telemetry.time),
+                    func.max(Telemetry.time),
+                    func.count(),
+                )
+                .join(Metric, Metric.id == Telemetry.metric_id)
+                .group_by(Telemetry.device_id, Metric.name),
+            )
+        )
+        await session.commit()
+    if result.rowcount:
+        print(f"MetricCatalog: Backfilled {result.rowcount} catalog entries")
+
+
+class MetricCatalog:
+    """In-memory mirror of telemetry_catalog."""
+
+    def __init__(self, ttl: float):
+        self._ttl = ttl
+        self._entries: dict[str, dict[str, list]] = {}  # device_id → {metric: [first_seen, last_seen, samples]}
+        self._expires = 0.0
+        self._reloads = 0
+
+    async def load(self, session: AsyncSession | None = None):
+        """(Re)load the whole catalog, with the given session or a new read session."""
+        if session is None:
+            async with db_manager.read_session_factory() as session:
+                return await self.load(session)
+        entries: dict[str, dict[str, list]] = defaultdict(dict)
+        result = await session.execute(select(TelemetryCatalog))
+        for row in result.scalars():
+            entries[row.device_id][row.metric] = [row.first_seen, row.last_seen, row.samples]
+        self._entries = dict(entries)
+        self._expires = time.monotonic() + self._ttl
+        self._reloads += 1
+
+    async def refresh(self, session: AsyncSession | None = None):
+        """Reload when the mirror is older than the TTL."""
+        if time.monotonic() >= self._expires:
+            await self.load(session)
+
+    async def metrics(self, session: AsyncSession, device_id: str | None = None) -> list[str]:
+        """Sorted metric names, of one device or of all devices."""
+        await self.refresh(session)
+        if device_id is not None:
+            return sorted(self._entries.get(device_id, ()))
+        return sorted({metric for metrics in self._entries.values() for metric in metrics})
+
+    def summary(self) -> dict[str, dict]:
+        """metric → {devices, first_seen, last_seen, samples} across all devices, from the mirror."""
+        summary: dict[str, dict] = {}
+        for metrics in self._entries.values():
+            for metric, (first, last, samples) in metrics.items():
+                entry = summary.get(metric)
+                if entry is None:
+                    summary[metric] = {"devices": 1, "first_seen": first, "last_seen": last, "samples": samples}
+                else:
+                    entry["devices"] += 1
+                    entry["first_seen"] = min(entry["first_seen"], first)
+                    entry["last_seen"] = max(entry["last_seen"], last)
+                    entry["samples"] += samples
+        return summary
+
+    def apply(self, deltas: dict[tuple[str, str], list]):
+        """Merge committed catalog deltas into the mirror."""
+        for (device_id, metric), (first, last, samples) in deltas.items():
+            metrics = self._entries.setdefault(device_id, {})
+            entry = metrics.get(metric)
+            if entry is None:
+                metrics[metric] = [first, last, samples]
+            else:
+                entry[0] = min(entry[0], first)
+                entry[1] = max(entry[1], last)
+                entry[2] += samples
+
+    def forget(self, device_id: str):
+        self._entries.pop(device_id, None)
+
+    def clear(self):
+        """Drop the mirror; the next read reloads it."""
+        self._entries = {}
+        self._expires = 0.0
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._entries),
+            "entries": sum(len(metrics) for metrics in self._entries.values()),
+            "reloads": self._reloads,
+        }
+
+
+# Global instance
+metric_catalog = MetricCatalog(ttl=settings.telemetry_catalog_cache_ttl)
+db_manager.on_swap(backfill_catalog, reset=metric_catalog.clear)
@@ -0,0 +1,117 @@
+"""
+Metric name dictionary.
+Telemetry rows reference their metric by a small integer id from the metrics
+table instead of repeating the name in every row and in the primary-key and
+metric indexes. The id ↔ name map is tiny and held in memory: once a metric
+has been seen, ingest resolves it without a query. Readers join metrics to
+get names back.
+
+Unknown names are inserted in the caller's transaction (ON CONFLICT DO
+NOTHING, so concurrent workers agree on one id) and enter the map only after
+that transaction commits. Since every ingest path can create metrics, names
+must fit the column and METRIC_NAME, and no more than TELEMETRY_MAX_METRICS
+are created (ids are SMALLINT on PostgreSQL); ingest rejects other points
+through reject_reason() before resolving.
+"""
+import re
+from sqlalchemy import select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager, on_commit
+from app.models import Metric
+
+settings = get_settings()
+
+# Letters, digits and _ . - / : up to the width of metrics.name
+METRIC_NAME = re.compile(rf"[\w.\-/:]{{1,{Metric.__table__.c.name.type.length}}}")
+
+
+def _insert_ignoring_existing(dialect_name: str):
+    if dialect_name == "postgresql":
+        return postgresql.insert(Metric).on_conflict_do_nothing(index_elements=["name"])
+    if dialect_name == "sqlite":
+        return sqlite.insert(Metric).on_conflict_do_nothing(index_elements=["name"])
+    raise ValueError(f"Metric dictionary is not supported on {dialect_name}")
+
+
+class MetricDictionary:
+    """In-memory metric name ↔ id map backed by the metrics table."""
+
+    def __init__(self, max_metrics: int):
+        self._ids: dict[str, int] = {}
+        self._names: dict[int, str] = {}
+        self._max_metrics = max_metrics
+        self._created = 0
+        self._refused = 0
+
+    async def load(self):
+        async with db_manager.session_factory() as session:
+            rows = (await session.execute(select(Metric.id, Metric.name))).all()
+        self._ids = {row.name: row.id for row in rows}
+        self._names = {row.id: row.name for row in rows}
+        print(f"MetricDictionary: Loaded {len(self._ids)} metrics")
+
+    def reject_reason(self, name) -> str | None:
+        """Why a point with this metric name cannot be stored, or None if it can."""
+        if name in self._ids:
+            return None
+        if not isinstance(name, str) or not METRIC_NAME.fullmatch(name):
+            return "Invalid metric name"
+        if len(self._ids) >= self._max_metrics:
+            return "Metric limit reached"
+        return None
+
+    async def resolve(self, session: AsyncSession, names) -> dict[str, int]:
+        """
+        name → id, creating ids for unknown metrics. Names failing
+        reject_reason(), or beyond the metric limit, are left out.
+        """
+        ids = {}
+        missing = []
+        room = self._max_metrics - len(self._ids)
+        for name in names:
+            metric_id = self._ids.get(name)
+            if metric_id is not None:
+                ids[name] = metric_id
+            elif len(missing) < room and METRIC_NAME.fullmatch(name):
+                missing.append(name)
+            else:
+                self._refused += 1
+        if missing:
+            await session.execute(
+                _insert_ignoring_existing(session.get_bind().dialect.name),
+                [{"name": name} for name in missing],
+            )
+            result = await session.execute(select(Metric.id, Metric.name).where(Metric.name.in_(missing)))
+            created = [(row.name, row.id) for row in result]
+            ids.update(created)
+            on_commit(session, self.remember, created)
+        return ids
+
+    def clear(self):
+        self._ids = {}
+        self._names = {}
+
+    def name(self, metric_id: int) -> str | None:
+        return self._names.get(metric_id)
+
+    def remember(self, pairs: list[tuple[str, int]]):
+        for name, metric_id in pairs:
+            if name not in self._ids:
+                self._created += 1
+            self._ids[name] = metric_id
+            self._names[metric_id] = name
+
+    def stats(self) -> dict:
+        return {
+            "metrics": len(self._ids),
+            "max_metrics": self._max_metrics,
+            "created": self._created,
+            "refused": self._refused,
+        }
+
+
+# Global instance
+metric_dictionary = MetricDictionary(max_metrics=settings.telemetry_max_metrics)
+db_manager.on_swap(metric_dictionary.load, reset=metric_dictionary.clear)
@@ -0,0 +1,131 @@
+"""
+Persistent MQTT publisher.
+Keeps one long-lived broker connection ({client_id}-pub) instead of a
+connect/publish/disconnect cycle per command. Publishes go through an
+internal queue drained by a fixed number of workers (the in-flight window);
+each caller is resolved once the broker acknowledges its message (PUBACK
+for QoS 1). The connection is re-established automatically and messages
+interrupted by a disconnect are retried on the next connection.
+"""
+import asyncio
+from app.core.config import get_settings
+
+settings = get_settings()
+
+
+class MQTTPublisher:
+    """Queue-fed publisher over a single reconnecting MQTT connection."""
+
+    def __init__(self, qos: int, inflight: int, queue_size: int, timeout: float):
+        self._qos = qos
+        self._inflight = inflight
+        self._timeout = timeout
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=queue_size)
+        self._running = False
+        self._connected = False
+        self._published = 0
+        self._failed = 0
+        self._dropped = 0
+        self._reconnects = 0
+
+    async def run(self):
+        """Connection loop: connect, run publish workers until the link drops, repeat."""
+        if not settings.mqtt_enabled:
+            return
+        import aiomqtt
+
+        self._running = True
+        while self._running:
+            try:
+                async with aiomqtt.Client(
+                    hostname=settings.mqtt_broker,
+                    port=settings.mqtt_port,
+                    username=settings.mqtt_username or None,
+                    password=settings.mqtt_password or None,
+                    identifier=f"{settings.mqtt_client_id}-pub",
+                    max_inflight_messages=self._inflight,
+                ) as client:
+                    self._connected = True
+                    print("MQTT Publisher: Connected")
+                    workers = [
+                        asyncio.create_task(self._worker(client))
+                        for _ in range(self._inflight)
+                    ]
+                    try:
+                        await asyncio.gather(*workers)
+                    finally:
+                        for worker in workers:
+                            worker.cancel()
+            except Exception as e:
+                if self._running:
+                    print(f"MQTT Publisher Error: {e}. Reconnecting in 5s...")
+            finally:
+                self._connected = False
+            if self._running:
+                self._reconnects += 1
+                await asyncio.sleep(5)
+
+    async def stop(self):
+        self._running = False
+
+    async def _worker(self, client):
+        while True:
+            item = await self._queue.get()
+            topic, payload, qos, future = item
+            if future.done():
+                # Caller already gave up (timeout/cancel)
+                continue
+            try:
+                await client.publish(topic, payload, qos=qos, timeout=self._timeout)
+            except BaseException:
+                # Connection trouble (or worker cancelled mid-publish):
+                # keep the message for the next connection, unless new
+                # publishes have filled the queue in the meantime
+                try:
+                    self._queue.put_nowait(item)
+                except asyncio.QueueFull:
+                    self._dropped += 1
+                    if not future.done():
+                        future.set_exception(asyncio.QueueFull())
+                raise
+            self._published += 1
+            if not future.done():
+                future.set_result(None)
+
+    async def publish(self, topic: str, payload: str, qos: int | None = None):
+        """
+        Queue a message and wait until the broker has acknowledged it.
+        Raises asyncio.TimeoutError if it is not acknowledged within the
+        configured timeout, or asyncio.QueueFull if the queue is saturated.
+        """
+        if not settings.mqtt_enabled:
+            print("MQTT: Cannot publish, MQTT is disabled")
+            return
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((topic, payload, self._qos if qos is None else qos, future))
+        try:
+            await asyncio.wait_for(future, timeout=self._timeout)
+        except asyncio.TimeoutError:
+            self._failed += 1
+            raise
+
+    def stats(self) -> dict:
+        return {
+            "connected": self._connected,
+            "queue_depth": self._queue.qsize(),
+            "inflight_window": self._inflight,
+            "qos": self._qos,
+            "published": self._published,
+            "failed": self._failed,
+            "dropped": self._dropped,
+            "reconnects": self._reconnects,
+        }
+
+
+# Global instance
+mqtt_publisher = MQTTPublisher(
+    qos=settings.mqtt_publish_qos,
+    inflight=settings.mqtt_publish_inflight,
+    queue_size=settings.mqtt_publish_queue_size,
+    timeout=settings.mqtt_publish_timeout,
+)
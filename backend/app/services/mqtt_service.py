@@ -4,20 +4,52 @@ Gracefully degrades when MQTT is not available.
 """
 import json
 import asyncio
-from datetime import datetime
+import math
+from datetime import datetime, timezone
 from app.core.config import get_settings
 from app.core.redis import redis_manager
+from app.services.command_tracker import command_tracker
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.shadow_store import shadow_store
+from app.services.status_writer import status_writer
+from app.services.telemetry_writer import telemetry_writer
+from app.services.topic_router import topic_router, decode_scaled
 
 settings = get_settings()
 
 
+def _is_number(value) -> bool:
+    """Finite int/float (bools, NaN and ±inf are not telemetry values)."""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def _parse_timestamp(value) -> datetime:
+    """Parse an ISO timestamp from a device payload, defaulting to now (UTC)."""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return datetime.utcnow()
+        if parsed.tzinfo is not None:
+            parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+        return parsed
+    return datetime.utcnow()
+
+
 class MQTTService:
     """MQTT client service for device communication."""
     
     def __init__(self):
         self._client = None
         self._running = False
-        self._message_handlers: dict = {}
+        self._message_handlers: dict = {
+            "telemetry": self._handle_telemetry,
+            "metric": self._handle_metric,
+            "status": self._handle_status,
+            "heartbeat": self._handle_heartbeat,
+            "shadow": self._handle_shadow_reported,
+            "command_ack": self._handle_command_response,
+        }
     
     async def start(self):
         """Start MQTT subscriber loop."""
@@ -45,15 +77,17 @@ class MQTTService:
                 async with _get_client() as client:
                     self._client = client
                     
-                    await client.subscribe("iot/+/+/telemetry")
-                    await client.subscribe("iot/+/+/status")
-                    await client.subscribe("iot/+/+/shadow/reported")
-                    await client.subscribe("iot/+/+/commands/response")
+                    for topic in topic_router.subscriptions:
+                        await client.subscribe(topic)
                     
                     print("MQTT: Connected and subscribed to device topics")
                     
                     async for message in client.messages:
-                        await self._handle_message(message)
+                        try:
+                            await self._handle_message(message)
+                        except Exception as e:
+                            # One malformed message must not drop the connection
+                            print(f"MQTT: Failed to handle message on {message.topic.value}: {e}")
                         
             except Exception as e:
                 print(f"MQTT Error: {e}. Reconnecting in 5s...")
@@ -64,77 +98,127 @@ class MQTTService:
         self._running = False
     
     async def _handle_message(self, message):
-        """Route incoming MQTT messages to handlers."""
-        topic = str(message.topic)
-        payload = message.payload.decode()
+        """Route incoming MQTT messages to handlers via the precompiled topic table."""
+        route = topic_router.match(message.topic.value)
+        if route is None:
+            return
         
+        payload = message.payload.decode()
         try:
             data = json.loads(payload)
         except json.JSONDecodeError:
-            print(f"Invalid JSON on topic {topic}: {payload}")
+            print(f"Invalid JSON on topic {message.topic.value}: {payload}")
             return
-        
-        parts = topic.split("/")
-        if len(parts) < 4:
+        if route.metric is None and not isinstance(data, dict):
             return
         
-        _, site_id, device_id, msg_type = parts[0], parts[1], parts[2], parts[3]
-        
         await redis_manager.increment_message_count()
-        
-        if msg_type == "telemetry":
-            await self._handle_telemetry(device_id, data)
-        elif msg_type == "status":
-            await self._handle_status(device_id, data)
-        elif msg_type == "shadow":
-            await self._handle_shadow_reported(device_id, data)
-        elif msg_type == "commands":
-            await self._handle_command_response(device_id, data)
+        await self._message_handlers[route.kind](route, data)
     
-    async def _handle_telemetry(self, device_id: str, data: dict):
+    async def _handle_telemetry(self, route, data: dict):
+        device_id = route.device_id
+        metrics = data.get("metrics", data)
+        if not isinstance(metrics, dict):
+            print(f"MQTT: Ignoring telemetry without a metrics object from {device_id}")
+            return
+        # NaN / ±inf would poison rollup sums and min/max (and are not valid JSON)
+        metrics = {
+            k: v for k, v in metrics.items()
+            if not isinstance(v, float) or math.isfinite(v)
+        }
+        timestamp = _parse_timestamp(data.get("timestamp"))
+        
+        # Hand off to the write-behind pipeline (non-blocking)
+        telemetry_writer.submit(
+            device_id,
+            {k: v for k, v in metrics.items() if _is_number(v)},
+            timestamp,
+        )
+        
         event = {
             "type": "telemetry",
             "payload": {
                 "device_id": device_id,
-                "metrics": data.get("metrics", data),
-                "timestamp": data.get("timestamp", datetime.utcnow().isoformat())
+                "metrics": metrics,
+                "timestamp": timestamp.isoformat()
             }
         }
         await redis_manager.publish_event("ws:events", json.dumps(event))
     
-    async def _handle_status(self, device_id: str, data: dict):
+    async def _handle_metric(self, route, data):
+        """Single scaled value from a Chickin data topic (e.g. SENSOR/TEMP 250 → 25.0)."""
+        value = decode_scaled(data, route.scale)
+        if value is None:
+            return
+        timestamp = datetime.utcnow()
+        
+        if route.device_id:
+            telemetry_writer.submit(route.device_id, {route.metric: value}, timestamp)
+        
+        event = {
+            "type": "telemetry",
+            "payload": {
+                "device_id": route.device_id,
+                "flock_id": route.flock_id,
+                "metrics": {route.metric: value},
+                "timestamp": timestamp.isoformat()
+            }
+        }
+        await redis_manager.publish_event("ws:events", json.dumps(event))
+    
+    async def _handle_heartbeat(self, route, data):
+        """Chickin STATUS/C connection heartbeat: the floor controller is online."""
+        if route.device_id:
+            await self._handle_status(route, {"status": "online"})
+    
+    async def _handle_status(self, route, data: dict):
+        device_id = route.device_id
         status = data.get("status", "online")
+        last_seen = datetime.utcnow()
         if status == "online":
-            await redis_manager.set_device_online(device_id)
+            await redis_manager.set_device_online(device_id, ttl=int(settings.device_offline_after))
         else:
             await redis_manager.set_device_offline(device_id)
+        # Persisted to devices.status / last_seen on the writer's next flush
+        status_writer.record(device_id, str(status), last_seen)
         
         event = {
             "type": "status",
             "payload": {
                 "device_id": device_id,
                 "status": status,
-                "last_seen": datetime.utcnow().isoformat()
+                "last_seen": last_seen.isoformat()
             }
         }
         await redis_manager.publish_event("ws:events", json.dumps(event))
     
-    async def _handle_shadow_reported(self, device_id: str, data: dict):
+    async def _handle_shadow_reported(self, route, data: dict):
+        if not route.device_id:
+            return
+        # Only what changed is persisted (batched) and pushed to clients
+        reported = data["reported"] if isinstance(data.get("reported"), dict) else data
+        delta = shadow_store.report(route.device_id, reported)
+        if not delta:
+            return
         event = {
             "type": "shadow",
             "payload": {
-                "device_id": device_id,
-                "reported": data
+                "device_id": route.device_id,
+                "delta": delta
             }
         }
         await redis_manager.publish_event("ws:events", json.dumps(event))
     
-    async def _handle_command_response(self, device_id: str, data: dict):
+    async def _handle_command_response(self, route, data: dict):
+        command_id = data.get("command_id")
+        if command_id:
+            # Applied to the commands table on the tracker's next batched flush
+            command_tracker.ack(command_id, data.get("status"), data.get("response"))
         event = {
             "type": "command_ack",
             "payload": {
-                "device_id": device_id,
-                "command_id": data.get("command_id"),
+                "device_id": route.device_id,
+                "command_id": command_id,
                 "status": data.get("status", "acked"),
                 "response": data.get("response")
             }
@@ -142,50 +226,14 @@ class MQTTService:
         await redis_manager.publish_event("ws:events", json.dumps(event))
     
     async def publish_command(self, site_id: str, device_id: str, command: dict):
-        """Publish command to device."""
-        if not settings.mqtt_enabled:
-            print("MQTT: Cannot publish, MQTT is disabled")
-            return
-        import aiomqtt
-        from contextlib import asynccontextmanager
-        
-        @asynccontextmanager
-        async def _get_client():
-            async with aiomqtt.Client(
-                hostname=settings.mqtt_broker,
-                port=settings.mqtt_port,
-                username=settings.mqtt_username or None,
-                password=settings.mqtt_password or None,
-                identifier=f"{settings.mqtt_client_id}-pub",
-            ) as client:
-                yield client
-        
+        """Publish command to device (returns once the broker acks it)."""
         topic = f"iot/{site_id}/{device_id}/commands"
-        async with _get_client() as client:
-            await client.publish(topic, json.dumps(command))
+        await mqtt_publisher.publish(topic, json.dumps(command))
     
     async def publish_shadow_desired(self, site_id: str, device_id: str, desired: dict):
         """Publish desired shadow state to device."""
-        if not settings.mqtt_enabled:
-            print("MQTT: Cannot publish, MQTT is disabled")
-            return
-        import aiomqtt
-        from contextlib import asynccontextmanager
-        
-        @asynccontextmanager
-        async def _get_client():
-            async with aiomqtt.Client(
-                hostname=settings.mqtt_broker,
-                port=settings.mqtt_port,
-                username=settings.mqtt_username or None,
-                password=settings.mqtt_password or None,
-                identifier=f"{settings.mqtt_client_id}-pub",
-            ) as client:
-                yield client
-        
         topic = f"iot/{site_id}/{device_id}/shadow/desired"
-        async with _get_client() as client:
-            await client.publish(topic, json.dumps(desired))
+        await mqtt_publisher.publish(topic, json.dumps(desired))
 
 
 # Global instance
@@ -0,0 +1,220 @@
+"""
+Telemetry retention job.
+Raw telemetry older than the retention window is processed one UTC day at a
+time: the rows are exported to the cold-tier segment archive (when enabled),
+then deleted in bounded chunks, committing after each chunk to keep
+transactions and locks short. Retention is configurable per metric. The
+ingest path already folded every row into the rollups, so expired history
+stays queryable at rollup resolution without re-reading raw rows; 1m rollups
+are pruned after TELEMETRY_ROLLUP_1M_RETENTION_DAYS, 1h / 1d rollups (and
+their sketch bins) are kept.
+
+Works on SQLite as well as PostgreSQL/TimescaleDB; reclaimed bytes are
+measured from the SQLite freelist or the relation/hypertable size.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, select, text, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Metric, Telemetry, TelemetryRollup
+from app.services.aggregation import floor_time
+from app.services.archive import telemetry_archive
+
+settings = get_settings()
+
+DAY = timedelta(days=1)
+
+
+async def telemetry_storage_bytes(session: AsyncSession) -> int | None:
+    """
+    Bytes in use: SQLite pages not on the freelist, or the on-disk size of the
+    telemetry hypertable/relation on PostgreSQL. None when it cannot be measured.
+    """
+    dialect_name = session.get_bind().dialect.name
+    try:
+        if dialect_name == "sqlite":
+            page_size = await session.scalar(text("PRAGMA page_size"))
+            page_count = await session.scalar(text("PRAGMA page_count"))
+            freelist = await session.scalar(text("PRAGMA freelist_count"))
+            return (page_count - freelist) * page_size
+        if dialect_name == "postgresql":
+            try:
+                return await session.scalar(text("SELECT hypertable_size('telemetry')"))
+            except Exception:
+                await session.rollback()
+                return await session.scalar(text("SELECT pg_total_relation_size('telemetry')"))
+    except Exception:
+        return None
+    return None
+
+
+class RetentionJob:
+    """Scheduled downsample-then-delete of expired raw telemetry."""
+
+    def __init__(
+        self,
+        default_days: int,
+        overrides: dict[str, int],
+        interval: float,
+        chunk_rows: int,
+        minute_rollup_days: int = 0,
+    ):
+        self._default_days = default_days
+        self._overrides = overrides
+        self._minute_rollup_days = minute_rollup_days
+        self._interval = interval
+        self._chunk_rows = chunk_rows
+        self._running = False
+        self._last_report: dict | None = None
+        self._rows_deleted_total = 0
+
+    def hot_window_start(self) -> datetime:
+        """Oldest day that may still be in the raw table (older days are archived)."""
+        default, overrides = self.cutoffs(datetime.utcnow())
+        return max([default, *overrides.values()])
+
+    def cutoffs(self, now: datetime) -> tuple[datetime, dict[str, datetime]]:
+        """Day-aligned cutoff for the default policy and for each overridden metric."""
+        default = floor_time(now - timedelta(days=self._default_days), 86400)
+        overrides = {
+            metric: floor_time(now - timedelta(days=days), 86400)
+            for metric, days in self._overrides.items()
+        }
+        return default, overrides
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            try:
+                await self.run_once()
+            except Exception as e:
+                print(f"Retention: Run failed: {e}")
+            await asyncio.sleep(self._interval)
+
+    async def stop(self):
+        self._running = False
+
+    async def run_once(self) -> dict:
+        """Downsample and delete every expired day; returns the run report."""
+        started = time.perf_counter()
+        default_cutoff, override_cutoffs = self.cutoffs(datetime.utcnow())
+        latest_cutoff = max([default_cutoff, *override_cutoffs.values()])
+        earliest_cutoff = min([default_cutoff, *override_cutoffs.values()])
+
+        async with db_manager.session_factory() as session:
+            bytes_before = await telemetry_storage_bytes(session)
+            oldest = await session.scalar(select(func.min(Telemetry.time)))
+
+        rows_deleted = 0
+        archived = 0
+        days = 0
+        day = floor_time(oldest, 86400) if oldest is not None else latest_cutoff
+        while day + DAY <= latest_cutoff:
+            day_end = day + DAY
+            async with db_manager.session_factory() as session:
+                if day_end <= earliest_cutoff:
+                    metrics = None   # every metric has expired for this day
+                else:
+                    present = (await session.execute(
+                        select(Metric.name)
+                        .where(Metric.id.in_(
+                            select(Telemetry.metric_id).distinct()
+                            .where(Telemetry.time >= day, Telemetry.time < day_end)
+                        ))
+                    )).scalars().all()
+                    metrics = [
+                        metric for metric in present
+                        if day_end <= override_cutoffs.get(metric, default_cutoff)
+                    ]
+                    if not metrics:
+                        day = day_end
+                        continue
+
+                if settings.telemetry_archive_enabled:
+                    archived += await telemetry_archive.archive_day(session, day, day_end, metrics)
+                    await session.commit()
+                deleted = await self._delete_day(session, day, day_end, metrics)
+            rows_deleted += deleted
+            days += 1
+            day = day_end
+
+        rollup_rows_pruned = 0
+        if self._minute_rollup_days:
+            minute_cutoff = floor_time(datetime.utcnow() - timedelta(days=self._minute_rollup_days), 86400)
+            async with db_manager.session_factory() as session:
+                rollup_rows_pruned = await self._prune_minute_rollups(session, minute_cutoff)
+
+        async with db_manager.session_factory() as session:
+            bytes_after = await telemetry_storage_bytes(session)
+
+        self._rows_deleted_total += rows_deleted
+        self._last_report = {
+            "finished_at": datetime.utcnow().isoformat(),
+            "days_processed": days,
+            "rows_deleted": rows_deleted,
+            "rollup_rows_pruned": rollup_rows_pruned,
+            "rows_archived": archived,
+            "bytes_reclaimed": (
+                max(bytes_before - bytes_after, 0)
+                if bytes_before is not None and bytes_after is not None else None
+            ),
+            "default_cutoff": default_cutoff.isoformat(),
+            "duration_ms": round((time.perf_counter() - started) * 1000, 2),
+        }
+        if rows_deleted:
+            print(
+                f"Retention: Deleted {rows_deleted} raw rows over {days} days, "
+                f"reclaimed {self._last_report['bytes_reclaimed']} bytes"
+            )
+        return self._last_report
+
+    async def _delete_chunked(self, session: AsyncSession, model, key_columns: tuple, *conditions) -> int:
+        """Delete matching rows in chunks of chunk_rows (selected by primary key), committing each chunk."""
+        key = tuple_(*key_columns)
+        chunk = select(*key_columns).where(*conditions).limit(self._chunk_rows)
+        deleted = 0
+        while True:
+            result = await session.execute(delete(model).where(key.in_(chunk)))
+            await session.commit()
+            deleted += result.rowcount
+            if result.rowcount < self._chunk_rows:
+                return deleted
+
+    async def _delete_day(self, session: AsyncSession, day: datetime, day_end: datetime, metrics: list[str] | None) -> int:
+        """Delete one day of raw rows."""
+        conditions = [Telemetry.time >= day, Telemetry.time < day_end]
+        if metrics is not None:
+            conditions.append(Telemetry.metric_id.in_(select(Metric.id).where(Metric.name.in_(metrics))))
+        return await self._delete_chunked(
+            session, Telemetry, (Telemetry.time, Telemetry.device_id, Telemetry.metric_id), *conditions
+        )
+
+    async def _prune_minute_rollups(self, session: AsyncSession, cutoff: datetime) -> int:
+        """Delete 1m rollups with buckets before cutoff."""
+        return await self._delete_chunked(
+            session, TelemetryRollup,
+            (TelemetryRollup.resolution, TelemetryRollup.device_id, TelemetryRollup.metric, TelemetryRollup.bucket),
+            TelemetryRollup.resolution == "1m", TelemetryRollup.bucket < cutoff,
+        )
+
+    def stats(self) -> dict:
+        return {
+            "default_days": self._default_days,
+            "overrides": self._overrides,
+            "minute_rollup_days": self._minute_rollup_days,
+            "rows_deleted_total": self._rows_deleted_total,
+            "last_run": self._last_report,
+        }
+
+
+# Global instance
+retention_job = RetentionJob(
+    default_days=settings.telemetry_retention_days,
+    overrides=settings.telemetry_retention_overrides,
+    interval=settings.telemetry_retention_interval,
+    chunk_rows=settings.telemetry_retention_chunk_rows,
+    minute_rollup_days=settings.telemetry_rollup_1m_retention_days,
+)
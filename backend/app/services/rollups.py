@@ -0,0 +1,233 @@
+"""
+Telemetry rollup maintenance.
+Rows inserted into telemetry are folded into telemetry_rollups at 1m / 1h / 1d
+resolution in the same transaction: each batch is pre-aggregated per
+(resolution, device, metric, bucket) and merged with an upsert that widens
+min/max and adds sum/samples. Quantile-sketch bins (app.services.sketches)
+of the 1h / 1d buckets go to telemetry_rollup_bins, merged by adding counts.
+rebuild_rollups() recomputes a time range from raw rows (backfill, or after
+raw data was edited outside the ingest path).
+"""
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, literal, select
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Metric, Telemetry, TelemetryRollup, TelemetryRollupBin
+from app.services.aggregation import RESOLUTIONS, SKETCH_RESOLUTIONS, floor_time, telemetry_aggregate_query
+from app.services.sketches import sketch_rows
+
+settings = get_settings()
+
+ROLLUP_KEY = ("resolution", "device_id", "metric", "bucket")
+
+# Raw rows fetched per batch when sketch bins are rebuilt
+BIN_REBUILD_BATCH_ROWS = 50000
+
+
+def _upsert_statement(dialect_name: str):
+    """INSERT that merges into an existing rollup bucket."""
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(TelemetryRollup)
+        least, greatest = func.least, func.greatest
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(TelemetryRollup)
+        least, greatest = func.min, func.max   # multi-argument scalar min/max
+    else:
+        raise ValueError(f"Rollup upsert is not supported on {dialect_name}")
+    excluded = stmt.excluded
+    return stmt.on_conflict_do_update(
+        index_elements=list(ROLLUP_KEY),
+        set_={
+            "min_value": least(TelemetryRollup.min_value, excluded.min_value),
+            "max_value": greatest(TelemetryRollup.max_value, excluded.max_value),
+            "sum_value": TelemetryRollup.sum_value + excluded.sum_value,
+            "samples": TelemetryRollup.samples + excluded.samples,
+        },
+    )
+
+
+def _bins_upsert_statement(dialect_name: str):
+    """INSERT that adds to the count of an existing sketch bin."""
+    if dialect_name == "postgresql":
+        stmt = postgresql.insert(TelemetryRollupBin)
+    elif dialect_name == "sqlite":
+        stmt = sqlite.insert(TelemetryRollupBin)
+    else:
+        raise ValueError(f"Rollup upsert is not supported on {dialect_name}")
+    return stmt.on_conflict_do_update(
+        index_elements=[*ROLLUP_KEY, "bin"],
+        set_={"samples": TelemetryRollupBin.samples + stmt.excluded.samples},
+    )
+
+
+def aggregate_rows(rows) -> list[dict]:
+    """Pre-aggregate inserted telemetry rows into one rollup row per key."""
+    buckets: dict[tuple, list] = defaultdict(lambda: [float("inf"), float("-inf"), 0.0, 0])
+    for row in rows:
+        for resolution, width in RESOLUTIONS.items():
+            acc = buckets[(resolution, row.device_id, row.metric, floor_time(row.time, width))]
+            acc[0] = min(acc[0], row.value)
+            acc[1] = max(acc[1], row.value)
+            acc[2] += row.value
+            acc[3] += 1
+    return [
+        {
+            "resolution": resolution,
+            "device_id": device_id,
+            "metric": metric,
+            "bucket": bucket,
+            "min_value": acc[0],
+            "max_value": acc[1],
+            "sum_value": acc[2],
+            "samples": acc[3],
+        }
+        for (resolution, device_id, metric, bucket), acc in buckets.items()
+    ]
+
+
+async def apply_rollups(session: AsyncSession, inserted_rows) -> int:
+    """Fold newly inserted telemetry rows (time, device_id, metric, value) into the rollups."""
+    dialect_name = session.get_bind().dialect.name
+    rollup_rows = aggregate_rows(inserted_rows)
+    if rollup_rows:
+        await session.execute(_upsert_statement(dialect_name), rollup_rows)
+    if settings.telemetry_sketches_enabled:
+        bin_rows = sketch_rows(inserted_rows, SKETCH_RESOLUTIONS)
+        if bin_rows:
+            await session.execute(_bins_upsert_statement(dialect_name), bin_rows)
+    return len(rollup_rows)
+
+
+async def rebuild_rollups(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    device_ids: list[str] | None = None,
+    metrics: list[str] | None = None,
+) -> int:
+    """
+    Recompute every rollup bucket overlapping [start, end) from raw telemetry
+    with INSERT ... SELECT, so aggregation runs in the database, then their
+    sketch bins. Limited to device_ids / metrics when given. Returns the
+    number of rollup rows written.
+    """
+    dialect_name = session.get_bind().dialect.name
+    written = 0
+    for resolution, width in RESOLUTIONS.items():
+        range_start = floor_time(start, width)
+        stale = delete(TelemetryRollup).where(
+            TelemetryRollup.resolution == resolution,
+            TelemetryRollup.bucket >= range_start,
+            TelemetryRollup.bucket < end,
+        )
+        if device_ids is not None:
+            stale = stale.where(TelemetryRollup.device_id.in_(device_ids))
+        if metrics:
+            stale = stale.where(TelemetryRollup.metric.in_(metrics))
+        await session.execute(stale)
+
+        aggregated = telemetry_aggregate_query(
+            dialect_name, device_ids, width, range_start, end, metrics,
+            aggregates=("min", "max", "sum", "count"), use_rollups=False,
+        ).where(Telemetry.time < end).order_by(None).subquery()
+        result = await session.execute(
+            insert(TelemetryRollup).from_select(
+                [*ROLLUP_KEY, "min_value", "max_value", "sum_value", "samples"],
+                select(
+                    literal(resolution),
+                    aggregated.c.device_id,
+                    aggregated.c.metric,
+                    aggregated.c.bucket_time,
+                    aggregated.c.min_value,
+                    aggregated.c.max_value,
+                    aggregated.c.sum_value,
+                    aggregated.c.count_value,
+                ),
+            )
+        )
+        written += max(result.rowcount, 0)
+    if settings.telemetry_sketches_enabled:
+        await rebuild_bins(session, start, end, device_ids, metrics)
+    return written
+
+
+async def rebuild_bins(
+    session: AsyncSession,
+    start: datetime,
+    end: datetime,
+    device_ids: list[str] | None = None,
+    metrics: list[str] | None = None,
+) -> int:
+    """
+    Recompute the sketch bins of every rollup bucket overlapping [start, end).
+    Bin keys are computed in Python (one definition for ingest and rebuild),
+    so raw rows are streamed in batches and each batch is upserted.
+    Returns the number of bin rows written (before merging across batches).
+    """
+    since = {resolution: floor_time(start, width) for resolution, width in SKETCH_RESOLUTIONS.items()}
+    for resolution, range_start in since.items():
+        stale = delete(TelemetryRollupBin).where(
+            TelemetryRollupBin.resolution == resolution,
+            TelemetryRollupBin.bucket >= range_start,
+            TelemetryRollupBin.bucket < end,
+        )
+        if device_ids is not None:
+            stale = stale.where(TelemetryRollupBin.device_id.in_(device_ids))
+        if metrics:
+            stale = stale.where(TelemetryRollupBin.metric.in_(metrics))
+        await session.execute(stale)
+
+    query = (
+        select(Telemetry.time, Telemetry.device_id, Metric.name.label("metric"), Telemetry.value)
+        .join(Metric, Metric.id == Telemetry.metric_id)
+        .where(Telemetry.time >= min(since.values()), Telemetry.time < end)
+        .order_by(Telemetry.time)
+        .execution_options(yield_per=BIN_REBUILD_BATCH_ROWS)
+    )
+    if device_ids is not None:
+        query = query.where(Telemetry.device_id.in_(device_ids))
+    if metrics:
+        query = query.where(Metric.name.in_(metrics))
+
+    upsert = _bins_upsert_statement(session.get_bind().dialect.name)
+    written = 0
+    result = await session.stream(query)
+    async for partition in result.partitions():
+        bin_rows = sketch_rows(partition, SKETCH_RESOLUTIONS, since)
+        if bin_rows:
+            await session.execute(upsert, bin_rows)
+            written += len(bin_rows)
+    return written
+
+
+async def backfill_rollups():
+    """Build rollups (and sketch bins) for existing telemetry when their tables are still empty."""
+    async with db_manager.session_factory() as session:
+        rollups_empty = await session.scalar(select(TelemetryRollup.bucket).limit(1)) is None
+        bins_empty = (
+            settings.telemetry_sketches_enabled
+            and await session.scalar(select(TelemetryRollupBin.bucket).limit(1)) is None
+        )
+        if not (rollups_empty or bins_empty):
+            return
+        first, last = (await session.execute(
+            select(func.min(Telemetry.time), func.max(Telemetry.time))
+        )).one()
+        if first is None:
+            return
+        end = last + timedelta(seconds=1)
+        if rollups_empty:
+            written = await rebuild_rollups(session, first, end)
+            message = f"Backfilled {written} rollup rows"
+        else:
+            written = await rebuild_bins(session, first, end)
+            message = f"Backfilled sketch bins ({written} bin rows)"
+        await session.commit()
+    print(f"Rollups: {message}")
+
+
+if settings.telemetry_rollups_enabled:
+    db_manager.on_swap(backfill_rollups)
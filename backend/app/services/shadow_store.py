@@ -0,0 +1,145 @@
+"""
+Device shadow (reported state) engine.
+The current reported document of every device is kept in memory. Each
+incoming report is merged into it and only the part that actually changed
+(the delta) is returned; unchanged re-reports cost a dict walk and nothing
+else. Changed documents are written back to devices.shadow_reported in one
+batched UPDATE per flush interval.
+
+Merge rules follow the usual device-shadow convention: nested objects are
+merged key by key, any other value replaces the stored one, and null
+deletes the key.
+"""
+import asyncio
+import copy
+from sqlalchemy import bindparam, select, update
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Device
+from app.services.device_registry import device_registry
+
+settings = get_settings()
+
+_devices = Device.__table__
+
+SHADOW_UPDATE = (
+    update(_devices)
+    .where(_devices.c.id == bindparam("b_id"))
+    .values(shadow_reported=bindparam("b_reported"))
+)
+
+
+def merge_delta(current: dict, report: dict) -> dict:
+    """
+    Merge report into current in place and return the delta: the subset of
+    report that changed current (deleted keys appear as None).
+    """
+    delta = {}
+    for key, value in report.items():
+        if value is None:
+            if key in current:
+                del current[key]
+                delta[key] = None
+        elif isinstance(value, dict) and isinstance(current.get(key), dict):
+            nested = merge_delta(current[key], value)
+            if nested:
+                delta[key] = nested
+        elif key not in current or current[key] != value:
+            current[key] = copy.deepcopy(value)
+            delta[key] = value
+    return delta
+
+
+class ShadowStore:
+    """In-memory reported shadows with diff-only, batched persistence."""
+
+    def __init__(self, flush_interval: float):
+        self._flush_interval = flush_interval
+        self._docs: dict[str, dict] = {}   # device_id → reported document
+        self._dirty: set[str] = set()
+        self._running = False
+        self._reports = 0
+        self._unknown = 0
+        self._changed = 0
+        self._written = 0
+        self._flush_errors = 0
+
+    async def load(self):
+        """Load the stored reported documents of all devices."""
+        async with db_manager.session_factory() as session:
+            result = await session.execute(select(Device.id, Device.shadow_reported))
+            self._docs = {row.id: dict(row.shadow_reported or {}) for row in result}
+        print(f"ShadowStore: Loaded {len(self._docs)} device shadows")
+
+    def report(self, device_id: str, reported: dict) -> dict:
+        """
+        Apply a reported state; returns the delta (empty when nothing changed
+        or the device is not registered, so stray topics allocate nothing).
+        """
+        self._reports += 1
+        if not device_registry.exists(device_id):
+            self._unknown += 1
+            return {}
+        doc = self._docs.setdefault(device_id, {})
+        delta = merge_delta(doc, reported)
+        if delta:
+            self._changed += 1
+            self._dirty.add(device_id)
+        return delta
+
+    def get(self, device_id: str) -> dict | None:
+        return self._docs.get(device_id)
+
+    def forget(self, device_id: str):
+        """Drop a deleted device."""
+        self._docs.pop(device_id, None)
+        self._dirty.discard(device_id)
+
+    def clear(self):
+        self._docs = {}
+        self._dirty = set()
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    async def stop(self):
+        self._running = False
+        await self.flush()
+
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            {"b_id": device_id, "b_reported": copy.deepcopy(self._docs[device_id])}
+            for device_id in dirty if device_id in self._docs
+        ]
+        try:
+            async with db_manager.session_factory() as session:
+                await session.execute(SHADOW_UPDATE, rows)
+                await session.commit()
+        except Exception as e:
+            self._flush_errors += 1
+            self._dirty |= dirty
+            print(f"ShadowStore: Flush of {len(rows)} shadows failed: {e}")
+            return
+        self._written += len(rows)
+
+    def stats(self) -> dict:
+        return {
+            "devices": len(self._docs),
+            "dirty": len(self._dirty),
+            "reports": self._reports,
+            "unknown_device_reports": self._unknown,
+            "changed_reports": self._changed,
+            "rows_written": self._written,
+            "flush_errors": self._flush_errors,
+        }
+
+
+# Global instance
+shadow_store = ShadowStore(flush_interval=settings.shadow_flush_interval)
+db_manager.on_swap(shadow_store.load, flush=shadow_store.flush, reset=shadow_store.clear)
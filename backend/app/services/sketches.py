@@ -0,0 +1,146 @@
+"""
+Mergeable quantile sketches for telemetry rollups (DDSketch-style).
+Every value falls in a logarithmic bin about 2% of its magnitude wide:
+
+    key = sign(v) * (ceil(log_γ |v|) + KEY_OFFSET),   γ = (1 + α) / (1 − α)
+
+with key 0 for |v| < MIN_VALUE, so integer key order is value order. A
+sketch is a set of (key, count) pairs; merging two sketches adds counts per
+key, which is why telemetry_rollup_bins can be maintained with an upsert
+(samples + excluded.samples) and coarser buckets merged with
+SUM(samples) GROUP BY key. Quantiles read from the counts are within α
+relative error of the exact sample quantile.
+
+Bins are kept for the 1h and 1d rollups only (SKETCH_RESOLUTIONS), so
+percentiles need an interval of 1h or more. Storage: one row per distinct
+bin hit in a bucket, at most about ln(max / min) / ln(γ) ≈ 50 · ln(max / min)
+for positive values. A sensor moving between 25 and 35 fills ~17 bins per
+hour and ~25 per day, i.e. roughly 18 hourly + 1 daily bin rows per device
+and metric per hour, independent of the sample rate.
+"""
+import math
+from collections import defaultdict
+from datetime import datetime
+from app.services.aggregation import floor_time
+
+ALPHA = 0.01   # relative accuracy; changing it invalidates stored bins
+GAMMA = (1 + ALPHA) / (1 - ALPHA)
+LOG_GAMMA = math.log(GAMMA)
+MIN_VALUE = 1e-9
+# Smallest indexable magnitude maps to key 1
+KEY_OFFSET = 1 - math.ceil(math.log(MIN_VALUE) / LOG_GAMMA)
+
+# Quantiles returned as p50 / p95 / p99
+QUANTILES = {"p50": 0.50, "p95": 0.95, "p99": 0.99}
+
+
+def sketch_key(value: float) -> int:
+    """Bin key of a value."""
+    magnitude = abs(value)
+    if magnitude < MIN_VALUE:
+        return 0
+    key = math.ceil(math.log(magnitude) / LOG_GAMMA) + KEY_OFFSET
+    return key if value > 0 else -key
+
+
+def key_value(key: int) -> float:
+    """Representative value of a bin (relative error at most ALPHA)."""
+    if key == 0:
+        return 0.0
+    value = 2 * GAMMA ** (abs(key) - KEY_OFFSET) / (GAMMA + 1)
+    return value if key > 0 else -value
+
+
+def key_bounds(key: int) -> tuple[float, float]:
+    """Value range covered by a bin."""
+    if key == 0:
+        return 0.0, 0.0
+    k = abs(key) - KEY_OFFSET
+    low, high = GAMMA ** (k - 1), GAMMA ** k
+    return (low, high) if key > 0 else (-high, -low)
+
+
+def quantile(bins: list[tuple[int, int]], q: float) -> float | None:
+    """q-quantile of a sketch given as (key, count) pairs sorted by key."""
+    total = sum(count for _, count in bins)
+    if not total:
+        return None
+    rank = q * (total - 1)
+    seen = 0
+    for key, count in bins:
+        seen += count
+        if seen > rank:
+            return key_value(key)
+    return key_value(bins[-1][0])
+
+
+def fraction_above(bins: list[tuple[int, int]], threshold: float) -> float | None:
+    """
+    Share of the samples of a sketch above threshold; samples of the bin
+    holding the threshold are assumed evenly spread over its range.
+    """
+    total = sum(count for _, count in bins)
+    if not total:
+        return None
+    above = 0.0
+    for key, count in bins:
+        low, high = key_bounds(key)
+        if low > threshold:
+            above += count
+        elif high > threshold:
+            above += count * (high - threshold) / (high - low)
+    return above / total
+
+
+def distribution(
+    bins: list[tuple[int, int]],
+    low: float,
+    high: float,
+    covered_seconds: float,
+    threshold: float | None = None,
+) -> dict:
+    """
+    p50/p95/p99 of a sketch clamped to the bucket's exact [low, high], plus
+    seconds_above (share of samples above threshold times the seconds the
+    bucket covers, i.e. assuming evenly spaced samples) when a threshold is given.
+    """
+    bins = sorted(bins)
+    stats = {}
+    for name, q in QUANTILES.items():
+        value = quantile(bins, q)
+        stats[name] = None if value is None else min(max(value, low), high)
+    if threshold is not None:
+        if high <= threshold:
+            share = 0.0
+        elif low > threshold:
+            share = 1.0
+        else:
+            share = fraction_above(bins, threshold)
+        stats["seconds_above"] = None if share is None else share * covered_seconds
+    return stats
+
+
+def sketch_rows(rows, resolutions: dict[str, int], since: dict[str, datetime] | None = None) -> list[dict]:
+    """
+    Pre-aggregate telemetry rows (time, device_id, metric, value) into one
+    bin-count row per (resolution, device, metric, bucket, key). With since,
+    rows older than since[resolution] are skipped for that resolution.
+    """
+    counts: dict[tuple, int] = defaultdict(int)
+    for row in rows:
+        key = sketch_key(row.value)
+        for resolution, width in resolutions.items():
+            if since is not None and row.time < since[resolution]:
+                continue
+            counts[(resolution, row.device_id, row.metric, floor_time(row.time, width), key)] += 1
+    return [
+        {
+            "resolution": resolution,
+            "device_id": device_id,
+            "metric": metric,
+            "bucket": bucket,
+            "bin": key,
+            "samples": samples,
+        }
+        for (resolution, device_id, metric, bucket, key), samples in counts.items()
+    ]
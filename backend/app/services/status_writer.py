@@ -0,0 +1,117 @@
+"""
+Device status write-back.
+Status messages and heartbeats only touch Redis on the hot path; the latest
+status / last_seen per device is coalesced in memory and written to the
+devices table in one bulk UPDATE per flush interval, so the SQL aggregates
+(devices by type, sites map) stay current without a write per heartbeat.
+Devices that stop reporting for longer than offline_after are flipped to
+offline, mirroring the Redis online TTL.
+"""
+import asyncio
+import time
+from datetime import datetime
+from sqlalchemy import bindparam, update
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Device
+
+settings = get_settings()
+
+_devices = Device.__table__
+
+STATUS_UPDATE = (
+    update(_devices)
+    .where(_devices.c.id == bindparam("b_id"))
+    .values(status=bindparam("b_status"), last_seen=bindparam("b_last_seen"))
+)
+OFFLINE_UPDATE = (
+    update(_devices)
+    .where(_devices.c.id == bindparam("b_id"), _devices.c.status == "online")
+    .values(status="offline")
+)
+
+
+class StatusWriter:
+    """Coalescing write-behind buffer for devices.status / last_seen."""
+
+    def __init__(self, flush_interval: float, offline_after: float):
+        self._flush_interval = flush_interval
+        self._offline_after = offline_after
+        self._pending: dict[str, tuple[str, datetime]] = {}  # device_id → (status, last_seen)
+        self._online: dict[str, float] = {}                   # device_id → monotonic last report
+        self._running = False
+        self._received = 0
+        self._written = 0
+        self._expired = 0
+        self._flush_errors = 0
+
+    def record(self, device_id: str, status: str, last_seen: datetime | None = None):
+        """Remember the latest status of a device (written on the next flush)."""
+        self._received += 1
+        self._pending[device_id] = (status[:20], last_seen or datetime.utcnow())
+        if status == "online":
+            self._online[device_id] = time.monotonic()
+        else:
+            self._online.pop(device_id, None)
+
+    async def run(self):
+        self._running = True
+        while self._running:
+            await asyncio.sleep(self._flush_interval)
+            await self.flush()
+
+    async def stop(self):
+        self._running = False
+        await self.flush()
+
+    async def flush(self):
+        pending, self._pending = self._pending, {}
+        expired = self._pop_expired()
+        if not pending and not expired:
+            return
+
+        rows = [
+            {"b_id": device_id, "b_status": status, "b_last_seen": last_seen}
+            for device_id, (status, last_seen) in pending.items()
+        ]
+        try:
+            async with db_manager.session_factory() as session:
+                if rows:
+                    await session.execute(STATUS_UPDATE, rows)
+                if expired:
+                    await session.execute(OFFLINE_UPDATE, [{"b_id": device_id} for device_id in expired])
+                await session.commit()
+        except Exception as e:
+            self._flush_errors += 1
+            print(f"StatusWriter: Flush of {len(rows)} devices failed: {e}")
+            # Keep the newest state for the next attempt
+            for device_id, state in pending.items():
+                self._pending.setdefault(device_id, state)
+            return
+        self._written += len(rows)
+        self._expired += len(expired)
+
+    def _pop_expired(self) -> list[str]:
+        cutoff = time.monotonic() - self._offline_after
+        expired = [device_id for device_id, seen in self._online.items() if seen < cutoff]
+        for device_id in expired:
+            del self._online[device_id]
+        return expired
+
+    def stats(self) -> dict:
+        return {
+            "pending": len(self._pending),
+            "online_tracked": len(self._online),
+            "received": self._received,
+            "written": self._written,
+            "expired_offline": self._expired,
+            "flush_errors": self._flush_errors,
+        }
+
+
+# Global instance
+status_writer = StatusWriter(
+    flush_interval=settings.device_status_flush_interval,
+    offline_after=settings.device_offline_after,
+)
+db_manager.on_swap(flush=status_writer.flush)
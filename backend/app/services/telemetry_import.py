@@ -0,0 +1,313 @@
+"""
+Bulk import of historical telemetry from CSV (e.g. exported Ci-Touch logs).
+The file needs a header row with a `time` column and is read in one of two
+layouts:
+
+    long   time,device_key,metric,value
+    wide   time,device_key,temperature,humidity,...   (one column per metric)
+
+Devices are identified by a `device_key` (Ci-Touch "{pn}/Lantai{n}") or a
+`device_id` column; files without either are imported for the device_key
+given to the importer. Times are ISO 8601 (offsets are converted to UTC) or
+unix seconds.
+
+Lines are split into CSV records (a quoted field may span lines, so a record
+is only parsed once its quotes are balanced) and every chunk of records is
+written in its own transaction:
+COPY into a temporary staging table then INSERT ... SELECT ... ON CONFLICT DO
+NOTHING on PostgreSQL, one executemany INSERT on SQLite. Rows already stored
+are skipped, so an interrupted import can simply be re-run. Inserted rows
+update telemetry_latest, the metric catalog and the rollups like the live
+ingest path; they do not pass through the MQTT queue or the dedup window.
+"""
+import csv
+import math
+import time
+from datetime import datetime, timezone
+from sqlalchemy import select, text
+from sqlalchemy.dialects import sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager
+from app.models import Device, Telemetry
+from app.services.device_registry import device_registry
+from app.services.latest_values import upsert_latest
+from app.services.metric_catalog import update_catalog
+from app.services.metric_dictionary import metric_dictionary
+from app.services.rollups import apply_rollups
+from app.services.telemetry_writer import TELEMETRY_KEY, InsertedRow
+
+settings = get_settings()
+
+# Cap on rejects kept for the report (the count is always exact)
+MAX_REPORTED_REJECTS = 100
+
+STAGE_TABLE = "telemetry_import_stage"
+COLUMNS = ["time", "device_id", "metric_id", "value"]
+
+CREATE_STAGE = text(
+    f"CREATE TEMP TABLE IF NOT EXISTS {STAGE_TABLE} (LIKE telemetry) ON COMMIT DELETE ROWS"
+)
+MERGE_STAGE = text(
+    "INSERT INTO telemetry (time, device_id, metric_id, value) "
+    f"SELECT time, device_id, metric_id, value FROM {STAGE_TABLE} "
+    "ON CONFLICT DO NOTHING "
+    "RETURNING time, device_id, metric_id, value"
+)
+
+
+def parse_time(raw: str) -> datetime:
+    """ISO 8601 or unix seconds → naive UTC datetime."""
+    try:
+        ts = datetime.fromisoformat(raw)
+    except ValueError:
+        return datetime.utcfromtimestamp(float(raw))
+    if ts.tzinfo is not None:
+        ts = ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+class TelemetryImport:
+    """
+    One CSV import. Call feed() with successive batches of lines (the header
+    first), finish() after the last one, then result() for the report.
+    """
+
+    def __init__(self, device_key: str | None = None, chunk_rows: int | None = None):
+        self._default_key = device_key
+        self._chunk_rows = chunk_rows or settings.telemetry_import_chunk_rows
+        self._header: list[str] | None = None
+        self._time_column = 0
+        self._device_column: int | None = None
+        self._by_key = True
+        # long layout: (metric column, value column); wide layout: (column, metric) pairs
+        self._long_columns: tuple[int, int] | None = None
+        self._metric_columns: list[tuple[int, str]] = []
+        # device_key / device_id from the file → device id (None when unknown)
+        self._devices: dict[str, str | None] = {}
+        self._unknown: set[str] = set()
+        # Lines of a record whose quoted field is still open, and its first line number
+        self._pending: list[str] = []
+        self._pending_line = 0
+        self._quotes = 0
+        # Parsed (first line number, record) pairs waiting for the next write
+        self._records: list[tuple[int, list[str]]] = []
+        self._line = 0
+        self._rows = 0
+        self._inserted = 0
+        self._chunks = 0
+        self._rejected_count = 0
+        self._rejected: list[dict] = []
+        self._rejected_lines: set[int] = set()   # of the chunk being written
+        self._started = time.perf_counter()
+
+    # ---- Parsing ----
+
+    def _read_header(self, header: list[str]):
+        names = [name.strip().lower() for name in header]
+        if "time" not in names:
+            raise ValueError("CSV header has no 'time' column")
+        self._header = names
+        self._time_column = names.index("time")
+        for column in ("device_key", "device_id"):
+            if column in names:
+                self._device_column = names.index(column)
+                self._by_key = column == "device_key"
+                break
+        else:
+            if not self._default_key:
+                raise ValueError("CSV has no device_key/device_id column and no device key was given")
+        if "metric" in names and "value" in names:
+            self._long_columns = (names.index("metric"), names.index("value"))
+        else:
+            skip = {"time", "device_key", "device_id"}
+            self._metric_columns = [
+                (index, header[index].strip()) for index, name in enumerate(names) if name not in skip
+            ]
+            if not self._metric_columns:
+                raise ValueError("CSV has no metric columns")
+
+    def _reject(self, line: int, reason: str):
+        """Record a rejected record; later problems with the same record are not counted again."""
+        if line in self._rejected_lines:
+            return
+        self._rejected_lines.add(line)
+        self._rejected_count += 1
+        if len(self._rejected) < MAX_REPORTED_REJECTS:
+            self._rejected.append({"index": line, "reason": reason})
+
+    def _split(self, lines: list[str]):
+        """Group lines into complete records (double quotes balanced) and parse them."""
+        for line in lines:
+            self._line += 1
+            if not self._pending:
+                self._pending_line = self._line
+            self._pending.append(line)
+            self._quotes += line.count('"')
+            if self._quotes % 2 == 0:
+                self._take_pending()
+
+    def _take_pending(self):
+        for record in csv.reader(self._pending):
+            self._records.append((self._pending_line, record))
+        self._pending, self._quotes = [], 0
+
+    def _parse(self, records: list[tuple[int, list[str]]]) -> list[tuple]:
+        """(line, device, time, metric, value) for every value in the chunk."""
+        points = []
+        for line, record in records:
+            if not record:
+                continue
+            if self._header is None:
+                self._read_header(record)
+                continue
+            if len(record) != len(self._header):
+                self._reject(line, "Wrong number of columns")
+                continue
+            device = record[self._device_column] if self._device_column is not None else self._default_key
+            try:
+                ts = parse_time(record[self._time_column])
+            except (ValueError, OverflowError, OSError):
+                self._reject(line, "Invalid time")
+                continue
+            if self._long_columns:
+                metric_column, value_column = self._long_columns
+                cells = [(record[metric_column].strip(), record[value_column])]
+            else:
+                cells = [(metric, record[index]) for index, metric in self._metric_columns]
+            problems, invalid = [], []
+            for metric, raw in cells:
+                if not raw:
+                    continue
+                reason = metric_dictionary.reject_reason(metric)
+                if reason:
+                    problems.append(f"{reason}: {metric!r}")
+                    continue
+                try:
+                    value = float(raw)
+                except ValueError:
+                    value = math.nan
+                if not math.isfinite(value):
+                    invalid.append(metric)
+                    continue
+                points.append((line, device, ts, metric, value))
+            if invalid:
+                problems.append(f"Invalid value for {', '.join(invalid)}")
+            if problems:
+                # One reject per record; its valid values are still imported
+                self._reject(line, "; ".join(problems))
+        return points
+
+    # ---- Device mapping ----
+
+    async def _map_devices(self, session: AsyncSession, refs: set[str]):
+        """Resolve device keys / ids not seen before, one query for the misses."""
+        missing = {ref for ref in refs if ref not in self._devices}
+        if not missing:
+            return
+        if self._by_key:
+            for ref in list(missing):
+                device_id = device_registry.resolve_key(ref)
+                if device_id is not None:
+                    self._devices[ref] = device_id
+                    missing.discard(ref)
+            if missing:
+                result = await session.execute(
+                    select(Device.device_key, Device.id).where(Device.device_key.in_(missing))
+                )
+                for row in result:
+                    self._devices[row.device_key] = row.id
+                    missing.discard(row.device_key)
+        else:
+            known = await device_registry.filter_known(session, missing)
+            self._devices.update({device_id: device_id for device_id in known})
+            missing -= known
+        for ref in missing:
+            self._devices[ref] = None
+            self._unknown.add(ref)
+
+    # ---- Writing ----
+
+    async def _insert(self, session: AsyncSession, records: list[tuple]):
+        """Insert (time, device_id, metric_id, value) records; returns the inserted ones."""
+        if session.get_bind().dialect.name == "postgresql":
+            await session.execute(CREATE_STAGE)
+            connection = await (await session.connection()).get_raw_connection()
+            await connection.driver_connection.copy_records_to_table(
+                STAGE_TABLE, records=records, columns=COLUMNS
+            )
+            return (await session.execute(MERGE_STAGE)).all()
+        # Core executemany on the session's connection skips the ORM bulk-insert bookkeeping
+        stmt = sqlite.insert(Telemetry.__table__).on_conflict_do_nothing(index_elements=list(TELEMETRY_KEY))
+        connection = await session.connection()
+        result = await connection.execute(
+            stmt.returning(Telemetry.time, Telemetry.device_id, Telemetry.metric_id, Telemetry.value),
+            [dict(zip(COLUMNS, record)) for record in records],
+        )
+        return result.all()
+
+    async def feed(self, lines: list[str]) -> int:
+        """Parse a batch of CSV lines, writing every full chunk of records. Returns the rows inserted."""
+        self._split(lines)
+        inserted = 0
+        while len(self._records) >= self._chunk_rows:
+            chunk, self._records = self._records[:self._chunk_rows], self._records[self._chunk_rows:]
+            inserted += await self._write(chunk)
+        return inserted
+
+    async def finish(self) -> int:
+        """Write the remaining records (an unterminated quoted field ends the file)."""
+        if self._pending:
+            self._take_pending()
+        chunk, self._records = self._records, []
+        return await self._write(chunk)
+
+    async def _write(self, records: list[tuple[int, list[str]]]) -> int:
+        """Parse and write one chunk of records in its own transaction."""
+        self._rejected_lines = set()
+        points = self._parse(records)
+        if not points:
+            return 0
+        async with db_manager.session_factory() as session:
+            await self._map_devices(session, {point[1] for point in points})
+            metric_ids = await metric_dictionary.resolve(session, {point[3] for point in points})
+            records = []
+            for line, ref, ts, metric, value in points:
+                device_id = self._devices[ref]
+                if device_id is None:
+                    self._reject(line, "Device not found")
+                    continue
+                records.append((ts, device_id, metric_ids[metric], value))
+            if not records:
+                return 0
+            inserted = await self._insert(session, records)
+            metric_names = {metric_id: name for name, metric_id in metric_ids.items()}
+            inserted = [
+                InsertedRow(row.time, row.device_id, metric_names[row.metric_id], row.value)
+                for row in inserted
+            ]
+            await upsert_latest(session, inserted)
+            await update_catalog(session, inserted)
+            if settings.telemetry_rollups_enabled:
+                await apply_rollups(session, inserted)
+            await session.commit()
+        self._rows += len(records)
+        self._inserted += len(inserted)
+        self._chunks += 1
+        return len(inserted)
+
+    def result(self) -> dict:
+        elapsed = time.perf_counter() - self._started
+        return {
+            "status": "ok" if not self._rejected_count else "partial",
+            "lines": self._line,
+            "rows": self._rows,
+            "inserted": self._inserted,
+            "duplicates": self._rows - self._inserted,
+            "chunks": self._chunks,
+            "rejected_count": self._rejected_count,
+            "rejected": self._rejected,
+            "unknown_devices": sorted(self._unknown),
+            "seconds": round(elapsed, 2),
+            "rows_per_sec": round(self._rows / elapsed) if elapsed > 0 else 0,
+        }
@@ -0,0 +1,338 @@
+"""
+Telemetry write-behind pipeline.
+The MQTT loop pushes decoded points into a bounded queue; a background writer
+task drains it and flushes to the telemetry table in multi-row inserts,
+either when a batch fills up or when the flush interval elapses.
+
+Rows carry metric names; they are stored by metric id (see metric_dictionary).
+
+Writes are idempotent: rows whose (time, device_id, metric) key already exists
+are ignored by the database (ON CONFLICT DO NOTHING), and a short in-memory
+window of recently committed keys drops obvious repeats (QoS 1 redelivery,
+gateway retries) before they reach it.
+"""
+import asyncio
+import time
+from collections import OrderedDict, namedtuple
+from datetime import datetime
+from sqlalchemy import exc, insert
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+from app.core.config import get_settings
+from app.core.database import db_manager, on_commit
+from app.models import Telemetry
+from app.services.aggregation import naive_utc
+from app.services.device_registry import device_registry
+from app.services.latest_values import upsert_latest
+from app.services.metric_catalog import update_catalog
+from app.services.metric_dictionary import metric_dictionary
+from app.services.rollups import apply_rollups
+
+settings = get_settings()
+
+TELEMETRY_KEY = ("time", "device_id", "metric_id")
+
+# An inserted row with its metric name, as consumed by rollups and latest values
+InsertedRow = namedtuple("InsertedRow", "time device_id metric value")
+
+
+class DedupWindow:
+    """Recently committed telemetry keys, bounded by age and size."""
+
+    def __init__(self, ttl: float, max_keys: int):
+        self._ttl = ttl
+        self._max_keys = max_keys
+        self._keys: OrderedDict[tuple, float] = OrderedDict()  # key → expiry (monotonic)
+        self._hits = 0
+
+    def filter(self, rows: list[dict]) -> list[dict]:
+        """Rows whose key was not committed within the window."""
+        if not self._keys:
+            return rows
+        self._expire()
+        fresh = [row for row in rows if (row["time"], row["device_id"], row["metric"]) not in self._keys]
+        self._hits += len(rows) - len(fresh)
+        return fresh
+
+    def remember(self, keys: list[tuple]):
+        expiry = time.monotonic() + self._ttl
+        for key in keys:
+            self._keys[key] = expiry
+            self._keys.move_to_end(key)
+        while len(self._keys) > self._max_keys:
+            self._keys.popitem(last=False)
+
+    def clear(self):
+        self._keys.clear()
+
+    def _expire(self):
+        now = time.monotonic()
+        while self._keys:
+            key, expiry = next(iter(self._keys.items()))
+            if expiry > now:
+                break
+            del self._keys[key]
+
+    def stats(self) -> dict:
+        return {"dedup_keys": len(self._keys), "dedup_hits": self._hits}
+
+
+telemetry_dedup = DedupWindow(
+    ttl=settings.telemetry_dedup_window,
+    max_keys=settings.telemetry_dedup_max_keys,
+)
+db_manager.on_swap(reset=telemetry_dedup.clear)
+
+
+def _insert_ignoring_duplicates(dialect_name: str):
+    """INSERT that skips rows whose primary key already exists."""
+    if dialect_name == "postgresql":
+        return postgresql.insert(Telemetry).on_conflict_do_nothing(index_elements=list(TELEMETRY_KEY))
+    if dialect_name == "sqlite":
+        return sqlite.insert(Telemetry).on_conflict_do_nothing(index_elements=list(TELEMETRY_KEY))
+    return insert(Telemetry)
+
+
+async def write_telemetry_rows(session: AsyncSession, rows: list[dict]) -> int:
+    """
+    Insert telemetry rows as one executemany statement.
+    Each row is a dict with time (naive UTC), device_id, metric and value. Rows already
+    stored (or committed moments ago) are skipped; newly inserted rows
+    update telemetry_latest, the metric catalog and the rollup tables; rows
+    whose metric cannot be created (see MetricDictionary.reject_reason) are
+    dropped. Returns the number of rows sent to the database.
+    """
+    rows = telemetry_dedup.filter(rows)
+    if not rows:
+        return 0
+    metric_ids = await metric_dictionary.resolve(session, {row["metric"] for row in rows})
+    rows = [row for row in rows if row["metric"] in metric_ids]
+    if not rows:
+        return 0
+    metric_names = {metric_id: name for name, metric_id in metric_ids.items()}
+    stmt = _insert_ignoring_duplicates(session.get_bind().dialect.name)
+    # RETURNING yields only rows actually inserted, so duplicates are not double counted
+    result = await session.execute(
+        stmt.returning(Telemetry.time, Telemetry.device_id, Telemetry.metric_id, Telemetry.value),
+        [
+            {
+                "time": row["time"],
+                "device_id": row["device_id"],
+                "metric_id": metric_ids[row["metric"]],
+                "value": row["value"],
+            }
+            for row in rows
+        ],
+    )
+    inserted = [
+        InsertedRow(row.time, row.device_id, metric_names[row.metric_id], row.value)
+        for row in result
+    ]
+    await upsert_latest(session, inserted)
+    await update_catalog(session, inserted)
+    if settings.telemetry_rollups_enabled:
+        await apply_rollups(session, inserted)
+    on_commit(session, telemetry_dedup.remember, [(row["time"], row["device_id"], row["metric"]) for row in rows])
+    return len(rows)
+
+
+def _is_transient(error: exc.DBAPIError) -> bool:
+    """Errors worth retrying unchanged: lost connections and locked / unavailable databases."""
+    return error.connection_invalidated or isinstance(error, (exc.OperationalError, exc.InterfaceError))
+
+
+class TelemetryWriter:
+    """Bounded queue + batching writer for telemetry points."""
+
+    def __init__(self, max_queue: int, batch_size: int, flush_interval: float):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self._batch_size = batch_size
+        self._flush_interval = flush_interval
+        self._running = False
+        self._stopped: asyncio.Event | None = None
+        # Points taken off the queue and not written yet
+        self._batch: list[dict] = []
+        # Pipeline counters
+        self._points_written = 0
+        self._points_dropped = 0
+        self._points_rejected = 0
+        self._batches_written = 0
+        self._flush_errors = 0
+        self._last_flush_ms = 0.0
+        self._max_flush_ms = 0.0
+        self._total_flush_ms = 0.0
+
+    def submit(self, device_id: str, metrics: dict, timestamp: datetime | None = None) -> int:
+        """
+        Queue the metrics of one message without blocking the caller.
+        Points with a metric name that cannot be stored are rejected, points
+        that do not fit in the queue are dropped; both are counted.
+        """
+        ts = naive_utc(timestamp)
+        queued = 0
+        for metric, value in metrics.items():
+            if metric_dictionary.reject_reason(metric):
+                self._points_rejected += 1
+                continue
+            try:
+                self._queue.put_nowait({
+                    "time": ts,
+                    "device_id": device_id,
+                    "metric": metric,
+                    "value": float(value),
+                })
+                queued += 1
+            except asyncio.QueueFull:
+                self._points_dropped += 1
+        return queued
+
+    async def run(self):
+        """Writer loop: collect a batch by size or time, then flush it."""
+        self._running = True
+        self._stopped = asyncio.Event()
+        print("TelemetryWriter: Started")
+        try:
+            while self._running:
+                await self._collect_batch()
+                if self._batch:
+                    await self._flush()
+        finally:
+            self._stopped.set()
+
+    async def stop(self):
+        """
+        Stop the writer loop, then flush the batch it was working on and
+        whatever is still queued.
+        """
+        self._running = False
+        if self._stopped is not None:
+            # The loop notices within one flush interval (or after the flush in progress)
+            await self._stopped.wait()
+        while self._batch or not self._queue.empty():
+            while len(self._batch) < self._batch_size and not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            if not await self._flush():
+                print(f"TelemetryWriter: Database unavailable at shutdown, "
+                      f"{len(self._batch) + self._queue.qsize()} points not written")
+                return
+
+    async def _collect_batch(self):
+        """Fill self._batch by size or time (points stay on the instance until written)."""
+        try:
+            self._batch.append(await asyncio.wait_for(self._queue.get(), timeout=self._flush_interval))
+        except asyncio.TimeoutError:
+            return
+
+        deadline = time.monotonic() + self._flush_interval
+        while len(self._batch) < self._batch_size:
+            # Drain whatever is already queued before waiting again
+            while len(self._batch) < self._batch_size and not self._queue.empty():
+                self._batch.append(self._queue.get_nowait())
+            remaining = deadline - time.monotonic()
+            if len(self._batch) >= self._batch_size or remaining <= 0:
+                break
+            try:
+                self._batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+
+    async def _flush(self) -> bool:
+        """
+        Write self._batch. Returns False (keeping the batch) only when the
+        database stayed unavailable and the writer is stopping.
+        """
+        started = time.perf_counter()
+        batch = self._batch
+        written = await self._write(batch)
+        if written is None:
+            return False
+        self._batch = []
+
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        self._points_written += written
+        self._points_rejected += len(batch) - written
+        self._batches_written += 1
+        self._last_flush_ms = elapsed_ms
+        self._max_flush_ms = max(self._max_flush_ms, elapsed_ms)
+        self._total_flush_ms += elapsed_ms
+        return True
+
+    async def _write(self, rows: list[dict]) -> int | None:
+        """
+        Write rows in one transaction; returns how many were sent (points of
+        unknown devices are skipped). Transient errors (writer connection
+        busy, database locked or gone) are retried while the writer runs;
+        None means it gave up because it is stopping. Any other error is
+        blamed on the rows: the batch is split in halves until the offending
+        points are isolated and rejected, so the rest is still written
+        (already written halves are skipped on a retry by ON CONFLICT).
+        """
+        while True:
+            try:
+                async with db_manager.session_factory() as session:
+                    known = await self._filter_known_devices(session, rows)
+                    await write_telemetry_rows(session, known)
+                    await session.commit()
+                return len(known)
+            except exc.TimeoutError as e:
+                # Writer connection busy past its pool timeout: nothing was written,
+                # keep the batch (the queue buffers new points) and try again
+                self._flush_errors += 1
+                print(f"TelemetryWriter: Writer connection busy, retrying {len(rows)} points: {e}")
+                if not self._running:
+                    return None
+            except exc.DBAPIError as e:
+                if not _is_transient(e):
+                    return await self._split(rows, e)
+                self._flush_errors += 1
+                print(f"TelemetryWriter: Database unavailable, retrying {len(rows)} points: {e}")
+                if not self._running:
+                    return None
+                await asyncio.sleep(self._flush_interval)
+            except Exception as e:
+                return await self._split(rows, e)
+
+    async def _split(self, rows: list[dict], error: Exception) -> int | None:
+        self._flush_errors += 1
+        if len(rows) == 1:
+            print(f"TelemetryWriter: Rejected point {rows[0]}: {error}")
+            return 0
+        middle = len(rows) // 2
+        first = await self._write(rows[:middle])
+        if first is None:
+            return None
+        second = await self._write(rows[middle:])
+        return None if second is None else first + second
+
+    async def _filter_known_devices(self, session: AsyncSession, batch: list[dict]) -> list[dict]:
+        """Drop points for devices that are not registered (FK would reject the batch)."""
+        known = await device_registry.filter_known(session, {row["device_id"] for row in batch})
+        return [row for row in batch if row["device_id"] in known]
+
+    def stats(self) -> dict:
+        """Queue depth and flush latency for monitoring."""
+        batches = self._batches_written
+        return {
+            "running": self._running,
+            "queue_depth": self._queue.qsize(),
+            "queue_capacity": self._queue.maxsize,
+            "batch_size": self._batch_size,
+            "flush_interval": self._flush_interval,
+            "points_written": self._points_written,
+            "points_dropped": self._points_dropped,
+            "points_rejected": self._points_rejected,
+            "batches_written": batches,
+            "flush_errors": self._flush_errors,
+            "last_flush_ms": round(self._last_flush_ms, 2),
+            "avg_flush_ms": round(self._total_flush_ms / batches, 2) if batches else 0.0,
+            "max_flush_ms": round(self._max_flush_ms, 2),
+            **telemetry_dedup.stats(),
+        }
+
+
+# Global instance
+telemetry_writer = TelemetryWriter(
+    max_queue=settings.telemetry_queue_size,
+    batch_size=settings.telemetry_batch_size,
+    flush_interval=settings.telemetry_flush_interval,
+)
@@ -0,0 +1,137 @@
+"""
+MQTT topic router.
+Incoming topics are resolved through a precompiled exact-topic table instead of
+splitting and if-chaining on every message. Chickin Ci-Touch topics
+(data/{pn}/Lantai{n}/.../8883) are expanded once per known part number and
+floor; generic iot/{site}/{device}/... topics are matched by a single compiled
+pattern and memoized into the same table.
+"""
+import math
+import re
+from typing import NamedTuple
+from app.services.device_registry import device_registry
+
+
+class Route(NamedTuple):
+    """Resolved destination of an MQTT topic."""
+    kind: str                   # telemetry | metric | status | heartbeat | shadow | command_ack
+    device_id: str | None
+    flock_id: str | None = None
+    metric: str | None = None   # set for single-value Chickin topics
+    scale: float = 1.0          # raw integer × scale = engineering value
+
+
+# Chickin data topics: data/{pn}/Lantai{n}/<suffix>/8883 (see docs/MQTT_TOPICS_COMPLETE.md)
+CHICKIN_PORT = "8883"
+CHICKIN_DATA_ROUTES: dict[str, tuple[str, str | None, float]] = {
+    "SENSOR/TEMP": ("metric", "temperature", 0.1),   # 250 → 25.0 °C
+    "SENSOR/HUMI": ("metric", "humidity", 0.1),      # 717 → 71.7 %
+    "B1": ("metric", "blower_1", 1.0),
+    "B2": ("metric", "blower_2", 1.0),
+    "B3": ("metric", "blower_3", 1.0),
+    "B4": ("metric", "blower_4", 1.0),
+    "B5": ("metric", "blower_5", 1.0),
+    "H": ("metric", "heater", 1.0),
+    "C": ("metric", "cooler", 1.0),
+    "INV/VAL": ("metric", "inverter", 1.0),          # 0-100 %
+    "STATUS/C": ("heartbeat", None, 1.0),
+    "SYNC": ("shadow", None, 1.0),
+}
+CHICKIN_SUBSCRIPTIONS = [
+    f"data/+/+/SENSOR/+/{CHICKIN_PORT}",
+    f"data/+/+/+/{CHICKIN_PORT}",
+    f"data/+/+/INV/VAL/{CHICKIN_PORT}",
+    f"data/+/+/STATUS/C/{CHICKIN_PORT}",
+]
+
+# Generic topics: iot/{site_id}/{device_id}/<message type>
+GENERIC_SUBSCRIPTIONS = [
+    "iot/+/+/telemetry",
+    "iot/+/+/status",
+    "iot/+/+/shadow/reported",
+    "iot/+/+/commands/response",
+]
+GENERIC_TOPIC = re.compile(r"^iot/[^/]+/([^/]+)/(telemetry|status|shadow/reported|commands/response)$")
+GENERIC_KINDS = {
+    "telemetry": "telemetry",
+    "status": "status",
+    "shadow/reported": "shadow",
+    "commands/response": "command_ack",
+}
+
+
+class TopicRouter:
+    """Precompiled topic → Route lookup table."""
+
+    # Upper bound for memoized generic topics (unknown devices cannot grow it forever)
+    MAX_MEMOIZED = 100_000
+
+    def __init__(self):
+        self._table: dict[str, Route] = {}
+        self._static_size = 0
+        self._unrouted = 0
+        self._built_version = -1
+
+    def build(self, floors: dict[tuple[str, int], tuple[str | None, str | None]]):
+        """
+        Compile the exact-topic table.
+        floors maps (part_number, floor_number) → (device_id, flock_id).
+        """
+        table: dict[str, Route] = {}
+        for (pn, floor), (device_id, flock_id) in floors.items():
+            prefix = f"data/{pn}/Lantai{floor}/"
+            for suffix, (kind, metric, scale) in CHICKIN_DATA_ROUTES.items():
+                table[f"{prefix}{suffix}/{CHICKIN_PORT}"] = Route(kind, device_id, flock_id, metric, scale)
+        self._table = table
+        self._static_size = len(table)
+
+    def refresh(self):
+        """Recompile from the device registry if it changed since the last build."""
+        if self._built_version != device_registry.version:
+            self._built_version = device_registry.version
+            self.build(device_registry.chickin_floors())
+
+    def match(self, topic: str) -> Route | None:
+        """Resolve a topic to its Route, or None if it is not routable."""
+        self.refresh()
+        route = self._table.get(topic)
+        if route is not None:
+            return route
+
+        match = GENERIC_TOPIC.match(topic)
+        if match is None:
+            self._unrouted += 1
+            return None
+        route = Route(GENERIC_KINDS[match[2]], match[1])
+        if len(self._table) - self._static_size < self.MAX_MEMOIZED:
+            self._table[topic] = route
+        return route
+
+    @property
+    def subscriptions(self) -> list[str]:
+        return GENERIC_SUBSCRIPTIONS + CHICKIN_SUBSCRIPTIONS
+
+    def stats(self) -> dict:
+        return {
+            "routes": self._static_size,
+            "memoized": len(self._table) - self._static_size,
+            "unrouted": self._unrouted,
+        }
+
+
+def decode_scaled(data, scale: float) -> float | None:
+    """
+    Decode a Chickin value payload.
+    Payloads are either a bare number or {"status": "250", ...}; integers are
+    scaled (250 × 0.1 → 25.0).
+    """
+    raw = data.get("status") if isinstance(data, dict) else data
+    try:
+        value = float(raw) * scale
+    except (TypeError, ValueError):
+        return None
+    return round(value, 4) if math.isfinite(value) else None
+
+
+# Global instance
+topic_router = TopicRouter()
@@ -0,0 +1,77 @@
+"""
+Bulk-import historical telemetry from CSV files.
+Accepted layouts and device mapping are described in
+app/services/telemetry_import.py. Files are streamed in chunks of
+TELEMETRY_IMPORT_CHUNK_ROWS records (override with --chunk-rows); rows already
+stored are skipped, so an interrupted import can be re-run.
+
+Run: python import_telemetry.py logs/*.csv
+     python import_telemetry.py --device-key "CT-0042/Lantai1" lantai1.csv
+"""
+import argparse
+import asyncio
+from itertools import islice
+
+# Setup path so imports work
+import sys
+sys.path.insert(0, ".")
+
+import app.models  # noqa: F401  (register tables on Base.metadata)
+from app.core.config import get_settings
+from app.core.database import init_db
+from app.services.device_registry import device_registry
+from app.services.metric_dictionary import metric_dictionary
+from app.services.telemetry_import import TelemetryImport
+
+
+async def import_file(path: str, device_key: str | None, chunk_rows: int) -> dict:
+    importer = TelemetryImport(device_key=device_key, chunk_rows=chunk_rows)
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        while lines := list(islice(f, chunk_rows)):
+            await importer.feed(lines)
+            progress = importer.result()
+            print(f"  {progress['rows']} rows ({progress['rows_per_sec']} rows/s)", end="\r")
+        await importer.finish()
+    return importer.result()
+
+
+async def main():
+    parser = argparse.ArgumentParser(description="Import historical telemetry from CSV files.")
+    parser.add_argument("files", nargs="+", help="CSV files to import")
+    parser.add_argument("--device-key", help="device key for files without a device_key/device_id column")
+    parser.add_argument("--chunk-rows", type=int, default=get_settings().telemetry_import_chunk_rows,
+                        help="records per transaction")
+    args = parser.parse_args()
+
+    await init_db()
+    await metric_dictionary.load()
+    await device_registry.load()
+
+    total_rows = total_inserted = 0
+    total_seconds = 0.0
+    for path in args.files:
+        print(f"{path}:")
+        try:
+            result = await import_file(path, args.device_key, args.chunk_rows)
+        except (OSError, ValueError) as e:
+            print(f"  ❌ {e}")
+            continue
+        print(
+            f"  {result['rows']} rows, {result['inserted']} inserted, "
+            f"{result['duplicates']} already stored, {result['rejected_count']} rejected "
+            f"in {result['seconds']}s ({result['rows_per_sec']} rows/s)"
+        )
+        for reject in result["rejected"][:10]:
+            print(f"    line {reject['index']}: {reject['reason']}")
+        if result["unknown_devices"]:
+            print(f"    unknown devices: {', '.join(result['unknown_devices'])}")
+        total_rows += result["rows"]
+        total_inserted += result["inserted"]
+        total_seconds += result["seconds"]
+
+    rate = round(total_rows / total_seconds) if total_seconds else 0
+    print(f"\n✅ Import complete: {total_rows} rows, {total_inserted} inserted ({rate} rows/s).")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
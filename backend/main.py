@@ -10,7 +10,19 @@ from app.core.config import get_settings
 from app.core.database import init_db
 from app.core.redis import redis_manager
 from app.api import api_router
+from app.api.pagination import NEXT_CURSOR_HEADER
+from app.services.command_tracker import command_tracker
+from app.services.device_registry import device_registry
+from app.services.latest_values import backfill_latest
+from app.services.metric_catalog import backfill_catalog, metric_catalog
+from app.services.metric_dictionary import metric_dictionary
+from app.services.mqtt_publisher import mqtt_publisher
+from app.services.retention import retention_job
+from app.services.rollups import backfill_rollups
+from app.services.shadow_store import shadow_store
+from app.services.status_writer import status_writer
 from app.services.mqtt_service import mqtt_service
+from app.services.telemetry_writer import telemetry_writer
 from app.services.websocket_service import ws_manager, websocket_endpoint
 
 settings = get_settings()
@@ -29,8 +41,42 @@ async def lifespan(app: FastAPI):
     # Connect to Redis (optional)
     await redis_manager.connect()
     
-    # Start MQTT subscriber in background (optional)
+    # Load metric dictionary (metric name ↔ id of telemetry rows)
+    await metric_dictionary.load()
+    
+    # Load device registry (id/key/part-number lookups for the ingest path)
+    await device_registry.load()
+    registry_task = asyncio.create_task(device_registry.run())
+    
+    # Build latest values / catalog / rollups for pre-existing telemetry (no-op once populated)
+    await backfill_latest()
+    await backfill_catalog()
+    await metric_catalog.load()
+    if settings.telemetry_rollups_enabled:
+        await backfill_rollups()
+    
+    # Start telemetry write-behind pipeline
+    writer_task = asyncio.create_task(telemetry_writer.run())
+    
+    # Scheduled retention (archive, then delete expired raw telemetry; prune old 1m rollups)
+    retention_task = None
+    if settings.telemetry_retention_enabled:
+        retention_task = asyncio.create_task(retention_job.run())
+    
+    # Track command acks / timeouts (re-arms commands still marked sent)
+    await command_tracker.load()
+    tracker_task = asyncio.create_task(command_tracker.run())
+    
+    # Coalesced device status / last_seen write-back
+    status_task = asyncio.create_task(status_writer.run())
+    
+    # Device shadows (reported state, diff-only persistence)
+    await shadow_store.load()
+    shadow_task = asyncio.create_task(shadow_store.run())
+    
+    # Start MQTT subscriber and persistent publisher in background (optional)
     mqtt_task = asyncio.create_task(mqtt_service.start())
+    publisher_task = asyncio.create_task(mqtt_publisher.run())
     
     # Start WebSocket Redis subscriber in background (only if Redis available)
     ws_task = asyncio.create_task(ws_manager.start_redis_subscriber())
@@ -43,9 +89,24 @@ async def lifespan(app: FastAPI):
     # Shutdown
     print("Shutting down...")
     await mqtt_service.stop()
+    await mqtt_publisher.stop()
+    publisher_task.cancel()
     await ws_manager.stop()
     mqtt_task.cancel()
     ws_task.cancel()
+    await telemetry_writer.stop()
+    writer_task.cancel()
+    await command_tracker.stop()
+    tracker_task.cancel()
+    await status_writer.stop()
+    status_task.cancel()
+    await shadow_store.stop()
+    shadow_task.cancel()
+    if retention_task:
+        await retention_job.stop()
+        retention_task.cancel()
+    await device_registry.stop()
+    registry_task.cancel()
     await redis_manager.disconnect()
     print("Cleanup complete")
 
@@ -67,6 +128,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER],
 )
 
 # Include API routes
@@ -0,0 +1,82 @@
+"""
+Convert JSON columns of an existing PostgreSQL database from TEXT to JSONB.
+Databases created before JSONType mapped to JSONB store every JSON column
+as TEXT. This converts each such column in place (ALTER COLUMN ... TYPE
+JSONB USING col::jsonb) and creates the GIN indexes on devices.meta_data,
+flocks.sensors and flocks.features (unless PG_JSON_GIN_INDEXES=false).
+Columns that are already JSONB are left alone, so it is safe to re-run.
+
+SQLite keeps JSON as TEXT; there is nothing to migrate.
+
+Run: python migrate_json_columns.py
+"""
+import asyncio
+
+# Setup path so imports work
+import sys
+sys.path.insert(0, ".")
+
+from sqlalchemy import inspect, text
+
+import app.models  # noqa: F401  (register tables on Base.metadata)
+from app.core.database import Base, db_manager
+from app.models.models import JSONType
+
+
+def _column_types(sync_conn) -> dict[tuple[str, str], str]:
+    inspector = inspect(sync_conn)
+    types = {}
+    for table in Base.metadata.sorted_tables:
+        if inspector.has_table(table.name):
+            for column in inspector.get_columns(table.name):
+                types[(table.name, column["name"])] = column["type"].__class__.__name__
+    return types
+
+
+def _create_gin_indexes(sync_conn) -> int:
+    inspector = inspect(sync_conn)
+    created = 0
+    for table in Base.metadata.sorted_tables:
+        if not inspector.has_table(table.name):
+            continue
+        existing = {index["name"] for index in inspector.get_indexes(table.name)}
+        for index in table.indexes:
+            if index.dialect_options["postgresql"]["using"] == "gin" and index.name not in existing:
+                index.create(sync_conn)
+                created += 1
+    return created
+
+
+async def migrate():
+    engine = db_manager.engine
+    if engine.dialect.name != "postgresql":
+        print(f"{engine.dialect.name} stores JSON as TEXT. Nothing to do.")
+        return
+
+    async with engine.connect() as conn:
+        current = await conn.run_sync(_column_types)
+
+    converted = 0
+    for table in Base.metadata.sorted_tables:
+        for column in table.columns:
+            if not isinstance(column.type, JSONType):
+                continue
+            found = current.get((table.name, column.name))
+            if found is None or found == "JSONB":
+                continue
+            async with engine.begin() as conn:
+                await conn.execute(text(
+                    f'ALTER TABLE {table.name} ALTER COLUMN "{column.name}" '
+                    f'TYPE JSONB USING "{column.name}"::jsonb'
+                ))
+            converted += 1
+            print(f"  {table.name}.{column.name}: {found} → JSONB")
+
+    async with engine.begin() as conn:
+        indexes = await conn.run_sync(_create_gin_indexes)
+
+    print(f"\n✅ Migration complete: {converted} columns converted, {indexes} GIN indexes created.")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
@@ -0,0 +1,104 @@
+"""
+Migrate an existing telemetry table from metric names to metric ids.
+Older databases store `metric VARCHAR(50)` in every telemetry row; the
+current schema stores `metric_id` referencing the metrics dictionary.
+
+The old table is renamed to telemetry_legacy, the new tables are created,
+every distinct metric name gets an id, then rows are copied one day per
+transaction. Re-running resumes an interrupted copy (already copied rows are
+skipped); once everything is copied telemetry_legacy is dropped.
+
+Run: python migrate_metric_ids.py
+Stop the backend (and any ingest) while it runs.
+"""
+import asyncio
+import time
+from datetime import datetime, timedelta
+
+# Setup path so imports work
+import sys
+sys.path.insert(0, ".")
+
+from sqlalchemy import DateTime, bindparam, inspect, text
+
+import app.models  # noqa: F401  (register tables on Base.metadata)
+from app.core.database import Base, db_manager
+
+LEGACY = "telemetry_legacy"
+
+COPY_DAY = text(
+    "INSERT INTO telemetry (time, device_id, metric_id, value) "
+    f"SELECT l.time, l.device_id, m.id, l.value FROM {LEGACY} l "
+    "JOIN metrics m ON m.name = l.metric "
+    "WHERE l.time >= :start AND l.time < :end "
+    "ON CONFLICT DO NOTHING"
+).bindparams(bindparam("start", type_=DateTime()), bindparam("end", type_=DateTime()))
+
+
+def _telemetry_state(sync_conn) -> tuple[list[str], bool]:
+    inspector = inspect(sync_conn)
+    columns = (
+        [column["name"] for column in inspector.get_columns("telemetry")]
+        if inspector.has_table("telemetry") else []
+    )
+    return columns, inspector.has_table(LEGACY)
+
+
+async def migrate():
+    engine = db_manager.engine
+    dialect_name = engine.dialect.name
+
+    async with engine.connect() as conn:
+        columns, has_legacy = await conn.run_sync(_telemetry_state)
+
+    if not has_legacy:
+        if "metric" not in columns:
+            print("telemetry already uses metric ids. Nothing to do.")
+            return
+        async with engine.begin() as conn:
+            await conn.execute(text(f"ALTER TABLE telemetry RENAME TO {LEGACY}"))
+            # Index / constraint names must be free for the new table
+            await conn.execute(text("DROP INDEX IF EXISTS idx_telemetry_device_time"))
+            await conn.execute(text("DROP INDEX IF EXISTS idx_telemetry_metric"))
+            if dialect_name == "postgresql":
+                await conn.execute(text(f"ALTER TABLE {LEGACY} RENAME CONSTRAINT telemetry_pkey TO {LEGACY}_pkey"))
+            await conn.run_sync(Base.metadata.create_all)
+            if dialect_name == "postgresql":
+                try:
+                    async with conn.begin_nested():
+                        await conn.execute(text("SELECT create_hypertable('telemetry', 'time', if_not_exists => TRUE)"))
+                except Exception:
+                    print("TimescaleDB not available; telemetry stays a plain table.")
+        print(f"Renamed telemetry to {LEGACY} and created the new schema.")
+
+    async with engine.begin() as conn:
+        await conn.execute(text(
+            f"INSERT INTO metrics (name) SELECT DISTINCT metric FROM {LEGACY} WHERE true ON CONFLICT DO NOTHING"
+        ))
+        metric_count = (await conn.execute(text("SELECT COUNT(*) FROM metrics"))).scalar()
+        first, last = (await conn.execute(text(f"SELECT MIN(time), MAX(time) FROM {LEGACY}"))).one()
+    print(f"Metric dictionary has {metric_count} metrics.")
+
+    copied = 0
+    started = time.perf_counter()
+    if first is not None:
+        if isinstance(first, str):   # SQLite returns raw text from text() queries
+            first, last = datetime.fromisoformat(first), datetime.fromisoformat(last)
+        day = first.replace(hour=0, minute=0, second=0, microsecond=0)
+        while day <= last:
+            async with engine.begin() as conn:
+                result = await conn.execute(COPY_DAY, {"start": day, "end": day + timedelta(days=1)})
+            copied += max(result.rowcount, 0)
+            print(f"  {day:%Y-%m-%d}: {copied} rows copied")
+            day += timedelta(days=1)
+
+    async with engine.begin() as conn:
+        await conn.execute(text(f"DROP TABLE {LEGACY}"))
+    elapsed = time.perf_counter() - started
+    print(f"\n✅ Migration complete: {copied} rows copied in {elapsed:.1f}s, {LEGACY} dropped.")
+    if dialect_name == "sqlite":
+        print("Run VACUUM on the database file to return the freed pages to the OS.")
+
+
+if __name__ == "__main__":
+    asyncio.run(migrate())
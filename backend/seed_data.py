@@ -13,6 +13,7 @@ sys.path.insert(0, ".")
 
 from app.core.database import db_manager, init_db
 from app.models.models import Site, Device, Telemetry, Alarm
+from app.services.metric_dictionary import metric_dictionary
 
 
 SITES = [
@@ -94,6 +95,9 @@ async def seed():
         now = datetime.utcnow()
         telemetry_count = 0
         batch = []
+        metric_ids = await metric_dictionary.resolve(
+            session, {metric for metrics in METRICS_BY_TYPE.values() for metric, _, _ in metrics}
+        )
 
         for device in devices:
             metrics = METRICS_BY_TYPE.get(device.type, [("temperature", 25, 35)])
@@ -115,7 +119,7 @@ async def seed():
                             batch.append(Telemetry(
                                 time=t,
                                 device_id=device.id,
-                                metric=metric_name,
+                                metric_id=metric_ids[metric_name],
                                 value=value,
                             ))
                             telemetry_count += 1
@@ -0,0 +1,38 @@
+"""
+Shared fixtures: the app runs against a throwaway SQLite database with MQTT
+and Redis off, and retention with the telemetry archive in a temporary directory.
+Run from backend/: python -m pytest -q
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+_TMP = tempfile.mkdtemp(prefix="iot-backend-tests-")
+os.environ["DATABASE_URL"] = f"sqlite+aiosqlite:///{_TMP}/test.db"
+os.environ["TELEMETRY_RETENTION_ENABLED"] = "true"
+os.environ["TELEMETRY_ARCHIVE_ENABLED"] = "true"
+os.environ["TELEMETRY_ARCHIVE_DIR"] = f"{_TMP}/archive"
+os.environ["MQTT_ENABLED"] = "false"
+os.environ["REDIS_ENABLED"] = "false"
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+DEVICE_ID = "test-device-1"
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from main import app
+    from app.core.database import db_manager
+    from app.models import Device
+
+    with TestClient(app) as client:
+        async def add_device():
+            async with db_manager.session_factory() as session:
+                session.add(Device(id=DEVICE_ID, device_key="test/device-1", name="Test device", type="sensor"))
+                await session.commit()
+        client.portal.call(add_device)
+        yield client
@@ -0,0 +1,22 @@
+"""Telemetry archive segments."""
+import asyncio
+from datetime import datetime, timedelta
+
+
+def test_segment_listing_sees_newly_written_days(tmp_path):
+    from app.services.archive import TelemetryArchive, to_us
+
+    archive = TelemetryArchive(root=str(tmp_path), compress=False)
+    day = datetime(2026, 1, 1)
+    start, end = day, day + timedelta(days=3)
+
+    def listed():
+        return [path.name for _, path in archive.segments("dev", ["temp"], start, end)]
+
+    asyncio.run(archive._write(("dev", "temp"), day, [to_us(day)], [1.0]))
+    assert listed() == ["2026-01-01.seg"]
+
+    later = day + timedelta(days=2)
+    asyncio.run(archive._write(("dev", "temp"), later, [to_us(later)], [2.0]))
+    assert listed() == ["2026-01-01.seg", "2026-01-03.seg"]
+    assert [point[2] for point in archive.points("dev", ["temp"], start, end)] == [1.0, 2.0]
@@ -0,0 +1,26 @@
+"""Command ack tracking."""
+import asyncio
+
+from app.core.database import db_manager
+from app.services.command_tracker import CommandTracker
+
+
+class _FailingSessionFactory:
+    def __call__(self):
+        raise RuntimeError("database unavailable")
+
+
+def test_acks_and_timeouts_are_kept_when_flush_fails(monkeypatch):
+    tracker = CommandTracker(timeout=0.0, flush_interval=1.0)
+    tracker.track("cmd-timeout")
+    tracker.track("cmd-acked")
+    tracker.ack("cmd-acked", "ok")
+
+    monkeypatch.setattr(db_manager, "_session_factory", _FailingSessionFactory())
+    asyncio.run(tracker.flush())
+
+    stats = tracker.stats()
+    assert stats["flush_errors"] == 1
+    assert stats["pending_acks"] == 1
+    assert stats["outstanding"] == 1
+    assert tracker._pop_expired() == ["cmd-timeout"]
@@ -0,0 +1,36 @@
+"""Runtime database hot-swap."""
+import json
+
+from tests.conftest import DEVICE_ID
+
+
+def test_ingest_after_database_swap(client, tmp_path):
+    from app.core.database import db_manager
+
+    # Metric ids, the device and its latest values are cached for the original database
+    response = client.post("/api/v1/telemetry", json={"device_id": DEVICE_ID, "metrics": {"swap_a": 1.0, "swap_b": 2.0}})
+    assert response.status_code == 200
+    client.get(f"/api/v1/telemetry/latest/{DEVICE_ID}")
+
+    original = db_manager.current_url
+    result = client.portal.call(db_manager.swap, f"sqlite+aiosqlite:///{tmp_path}/swapped.db")
+    try:
+        assert result["success"] and "failed" not in result["message"]
+        response = client.post("/api/v1/telemetry", json={"device_id": DEVICE_ID, "metrics": {"swap_a": 1.0}})
+        assert response.status_code == 404
+
+        device = client.post("/api/v1/devices", json={"device_key": "swap/1", "name": "Swapped", "type": "sensor"}).json()
+        response = client.post("/api/v1/telemetry", json={
+            "device_id": device["id"], "metrics": {"swap_b": 3.0}, "timestamp": "2026-06-01T00:00:00",
+        })
+        assert response.status_code == 200
+        response = client.get("/api/v1/telemetry/export", params={
+            "device_ids": device["id"], "start": "2026-06-01T00:00:00", "end": "2026-06-02T00:00:00", "format": "ndjson",
+        })
+        assert [json.loads(line) for line in response.text.splitlines()] == [
+            {"time": "2026-06-01T00:00:00", "device_id": device["id"], "metric": "swap_b", "value": 3.0},
+        ]
+        assert client.get(f"/api/v1/telemetry/latest/{device['id']}").json()["latest"]["swap_b"]["value"] == 3.0
+    finally:
+        client.portal.call(db_manager.swap, original)
+    assert client.get(f"/api/v1/telemetry/latest/{DEVICE_ID}").json()["latest"]["swap_b"]["value"] == 2.0
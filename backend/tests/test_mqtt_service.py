@@ -0,0 +1,30 @@
+"""MQTT telemetry payload handling."""
+import asyncio
+
+from app.services.mqtt_service import MQTTService, _is_number
+from app.services.telemetry_writer import telemetry_writer
+from app.services.topic_router import Route, decode_scaled
+
+
+def _route(device_id: str) -> Route:
+    return Route(kind="telemetry", device_id=device_id)
+
+
+def test_is_number_rejects_non_finite():
+    assert _is_number(1) and _is_number(2.5)
+    assert not any(_is_number(value) for value in (float("nan"), float("inf"), -float("inf"), True, "1"))
+
+
+def test_decode_scaled_rejects_non_finite():
+    assert decode_scaled({"status": "250"}, 0.1) == 25.0
+    assert decode_scaled("nan", 0.1) is None
+    assert decode_scaled({"status": "inf"}, 1.0) is None
+
+
+def test_telemetry_drops_non_object_metrics_and_non_finite_values(monkeypatch):
+    submitted = []
+    monkeypatch.setattr(telemetry_writer, "submit", lambda device_id, metrics, ts: submitted.append(metrics))
+    service = MQTTService()
+    asyncio.run(service._handle_telemetry(_route("dev-x"), {"metrics": [1, 2, 3]}))
+    asyncio.run(service._handle_telemetry(_route("dev-x"), {"metrics": {"temp": float("nan"), "rh": 61.0}}))
+    assert submitted == [{"rh": 61.0}]
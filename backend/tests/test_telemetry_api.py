@@ -0,0 +1,177 @@
+"""Telemetry query endpoints."""
+import json
+from datetime import datetime, timedelta
+
+from tests.conftest import DEVICE_ID
+
+
+def test_device_series_accepts_utc_z_start(client):
+    # Aware start with the default (naive utcnow) end used to raise TypeError → 500
+    response = client.get(
+        f"/api/v1/telemetry/devices/{DEVICE_ID}",
+        params={"start": "2026-01-01T00:00:00Z", "interval": "1d"},
+    )
+    assert response.status_code == 200
+    assert response.json()["start"] == "2026-01-01T00:00:00"
+
+
+def test_device_series_bucket_limit_with_utc_z_range(client):
+    response = client.get(
+        f"/api/v1/telemetry/devices/{DEVICE_ID}",
+        params={"start": "2000-01-01T00:00:00Z", "end": "2026-01-01T00:00:00+07:00", "interval": "1m"},
+    )
+    assert response.status_code == 400
+
+
+def test_compare_accepts_utc_z_start(client):
+    response = client.get(
+        "/api/v1/telemetry/compare",
+        params={"metric": "temperature", "device_ids": DEVICE_ID, "start": "2026-01-01T00:00:00Z", "interval": "1d"},
+    )
+    assert response.status_code == 200
+    assert response.json()["series"] == {DEVICE_ID: []}
+
+
+def test_export_includes_archived_days(client):
+    from app.core.database import db_manager
+    from app.services.retention import retention_job
+    from app.services.telemetry_writer import write_telemetry_rows
+
+    now = datetime.utcnow().replace(minute=0, second=0, microsecond=0)
+    old, recent = now - timedelta(days=400), now - timedelta(hours=2)
+    rows = [
+        {"time": ts + timedelta(minutes=minute), "device_id": DEVICE_ID, "metric": "export_test", "value": float(minute)}
+        for ts in (old, recent) for minute in range(3)
+    ]
+
+    async def write_and_expire():
+        async with db_manager.session_factory() as session:
+            await write_telemetry_rows(session, rows)
+            await session.commit()
+        await retention_job.run_once()
+
+    client.portal.call(write_and_expire)
+    response = client.get("/api/v1/telemetry/export", params={
+        "device_ids": DEVICE_ID, "metrics": "export_test",
+        "start": f"{(old - timedelta(days=1)).isoformat()}Z", "format": "ndjson",
+    })
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert [row["time"] for row in exported] == [row["time"].isoformat() for row in rows]
+
+
+def test_stream_ingest_writes_chunks(client):
+    body = "\n".join(
+        json.dumps({"device_id": DEVICE_ID, "timestamp": f"2026-02-01T00:0{minute}:00", "metrics": {"stream_test": minute}})
+        for minute in range(3)
+    ) + '\n{"device_id": "no-such-device", "metrics": {"x": 1}}\n'
+    response = client.post("/api/v1/telemetry/stream", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["accepted"], result["rejected_count"]) == (3, 1)
+
+
+def test_series_reads_archive_past_minute_rollups(client):
+    from app.core.database import db_manager
+    from app.services.aggregation import uses_rollups
+    from app.services.retention import retention_job
+    from app.services.telemetry_writer import write_telemetry_rows
+
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=300)
+    rows = [
+        {"time": day + timedelta(minutes=minute), "device_id": DEVICE_ID, "metric": "archive_test", "value": float(minute)}
+        for minute in range(10)
+    ]
+
+    async def write_and_expire():
+        async with db_manager.session_factory() as session:
+            await write_telemetry_rows(session, rows)
+            await session.commit()
+        await retention_job.run_once()   # archives + deletes the raw rows, prunes the 1m rollups
+
+    client.portal.call(write_and_expire)
+    assert uses_rollups(3600, day) and not uses_rollups(300, day)
+    params = {"metric": "archive_test", "start": f"{day.isoformat()}Z", "end": f"{(day + timedelta(hours=1)).isoformat()}Z"}
+    for interval in ("5m", "1h"):
+        response = client.get(f"/api/v1/telemetry/devices/{DEVICE_ID}", params={**params, "interval": interval})
+        assert response.status_code == 200
+        assert sum(point["count"] for point in response.json()["metrics"]["archive_test"]) == 10
+
+
+def test_import_rejects_once_per_record_and_keeps_quoted_newlines(client):
+    body = (
+        "time,device_id,note,import_a,import_b\n"
+        f'2026-03-01T00:00:00,{DEVICE_ID},"two\nlines",1,2\n'
+        f"2026-03-01T00:01:00,{DEVICE_ID},x,bad,worse\n"
+        "2026-03-01T00:02:00,no-such-device,x,1,2\n"
+    )
+    response = client.post("/api/v1/telemetry/import", content=body)
+    assert response.status_code == 200
+    result = response.json()
+    assert result["rows"] == 2
+    assert [reject["reason"] for reject in result["rejected"]] == [
+        "Invalid value for note", "Invalid value for note, import_a, import_b", "Invalid value for note",
+    ]
+
+
+def test_export_skips_archived_rows_still_in_raw_table(client):
+    from app.core.database import db_manager
+    from app.services.archive import telemetry_archive
+    from app.services.telemetry_writer import write_telemetry_rows
+
+    day = datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0) - timedelta(days=500)
+    rows = [
+        {"time": day + timedelta(minutes=minute), "device_id": DEVICE_ID, "metric": metric, "value": float(minute)}
+        for minute in range(3) for metric in ("export_dup_a", "export_dup_b")
+    ]
+
+    async def write_and_archive():
+        # Archived but not deleted yet, as when retention stops between the two steps
+        async with db_manager.session_factory() as session:
+            await write_telemetry_rows(session, rows)
+            await session.commit()
+            await telemetry_archive.archive_day(session, day, day + timedelta(days=1))
+
+    client.portal.call(write_and_archive)
+    response = client.get("/api/v1/telemetry/export", params={
+        "device_ids": DEVICE_ID, "metrics": ["export_dup_a", "export_dup_b"],
+        "start": f"{day.isoformat()}Z", "end": f"{(day + timedelta(days=1)).isoformat()}Z", "format": "ndjson",
+    })
+    assert response.status_code == 200
+    exported = [json.loads(line) for line in response.text.splitlines()]
+    assert len(exported) == len(rows)
+
+
+def test_ingest_stores_offset_timestamps_as_utc(client):
+    response = client.post("/api/v1/telemetry/batch", json={
+        "rows": [{"device_id": DEVICE_ID, "metric": "tz_test", "value": 1.0, "time": "2026-04-01T07:00:00+07:00"}],
+    })
+    assert response.status_code == 200
+    response = client.post("/api/v1/telemetry", json={
+        "device_id": DEVICE_ID, "metrics": {"tz_test": 2.0}, "timestamp": "2026-04-01T01:00:00Z",
+    })
+    assert response.status_code == 200
+    response = client.get("/api/v1/telemetry/export", params={
+        "device_ids": DEVICE_ID, "metrics": "tz_test", "start": "2026-04-01T00:00:00Z", "format": "ndjson",
+    })
+    assert [json.loads(line)["time"] for line in response.text.splitlines()] == [
+        "2026-04-01T00:00:00", "2026-04-01T01:00:00",
+    ]
+
+
+def test_invalid_metric_names_are_rejected_per_point(client):
+    bad_name = "x" * 51
+    response = client.post("/api/v1/telemetry/batch", json={"rows": [
+        {"device_id": DEVICE_ID, "metric": "name_test", "value": 1.0},
+        {"device_id": DEVICE_ID, "metric": bad_name, "value": 1.0},
+        {"device_id": DEVICE_ID, "metric": "bad name", "value": 1.0},
+    ]})
+    assert response.status_code == 200
+    result = response.json()
+    assert result["accepted"] == 1
+    assert [(reject["index"], reject["reason"]) for reject in result["rejected"]] == [
+        (1, "Invalid metric name"), (2, "Invalid metric name"),
+    ]
+
+    response = client.post("/api/v1/telemetry", json={"device_id": DEVICE_ID, "metrics": {"name_test": 2.0, bad_name: 3.0}})
+    assert response.json() == {"status": "partial", "points": 1, "rejected": {bad_name: "Invalid metric name"}}
@@ -0,0 +1,31 @@
+"""Telemetry write-behind pipeline."""
+from datetime import datetime
+
+from tests.conftest import DEVICE_ID
+
+
+def _point(minute: int, value):
+    return {"time": datetime(2026, 5, 1, 0, minute), "device_id": DEVICE_ID, "metric": "writer_test", "value": value}
+
+
+def test_bad_point_is_rejected_without_dropping_the_batch(client):
+    from app.services.telemetry_writer import TelemetryWriter
+
+    writer = TelemetryWriter(max_queue=100, batch_size=100, flush_interval=0.1)
+    writer._running = True
+    writer._batch = [_point(minute, None if minute == 2 else float(minute)) for minute in range(5)]
+    assert client.portal.call(writer._flush)
+
+    stats = writer.stats()
+    assert (stats["points_written"], stats["points_rejected"]) == (4, 1)
+
+
+def test_stop_flushes_the_batch_in_progress(client):
+    from app.services.telemetry_writer import TelemetryWriter
+
+    writer = TelemetryWriter(max_queue=100, batch_size=100, flush_interval=0.1)
+    writer._batch = [_point(10, 1.0)]
+    writer.submit(DEVICE_ID, {"writer_test": 2.0}, datetime(2026, 5, 1, 0, 11))
+    client.portal.call(writer.stop)
+
+    assert writer.stats()["points_written"] == 2
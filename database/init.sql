@@ -19,6 +19,8 @@ CREATE TABLE IF NOT EXISTS sites (
 
 CREATE INDEX idx_sites_region ON sites(region);
 CREATE INDEX idx_sites_location ON sites(latitude, longitude);
+-- Keyset pagination order (name, id)
+CREATE INDEX idx_sites_name ON sites(name, id);
 
 -- ============================================
 -- Devices table
@@ -43,6 +45,17 @@ CREATE INDEX idx_devices_key ON devices(device_key);
 CREATE INDEX idx_devices_type ON devices(type);
 CREATE INDEX idx_devices_status ON devices(status);
 CREATE INDEX idx_devices_site ON devices(site_id);
+CREATE INDEX idx_devices_name ON devices(name, id);
+-- JSONB containment filters (meta={"vendor":"chickin"}); see PG_JSON_GIN_INDEXES
+CREATE INDEX idx_devices_meta_data ON devices USING GIN (metadata jsonb_path_ops);
+
+-- ============================================
+-- Metric dictionary (telemetry stores metric ids, not names)
+-- ============================================
+CREATE TABLE IF NOT EXISTS metrics (
+    id SMALLSERIAL PRIMARY KEY,
+    name VARCHAR(50) UNIQUE NOT NULL
+);
 
 -- ============================================
 -- Telemetry table (TimescaleDB hypertable)
@@ -50,8 +63,9 @@ CREATE INDEX idx_devices_site ON devices(site_id);
 CREATE TABLE IF NOT EXISTS telemetry (
     time TIMESTAMPTZ NOT NULL,
     device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
-    metric VARCHAR(50) NOT NULL,
-    value DOUBLE PRECISION NOT NULL
+    metric_id SMALLINT NOT NULL REFERENCES metrics(id),
+    value DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (time, device_id, metric_id)
 );
 
 -- Create hypertable (TimescaleDB)
@@ -59,18 +73,73 @@ SELECT create_hypertable('telemetry', 'time', if_not_exists => TRUE);
 
 -- Create indexes for fast queries
 CREATE INDEX idx_telemetry_device_time ON telemetry(device_id, time DESC);
-CREATE INDEX idx_telemetry_metric ON telemetry(metric);
+CREATE INDEX idx_telemetry_metric ON telemetry(metric_id);
 
 -- Set up retention policy (90 days)
+-- The backend has its own opt-in retention job (TELEMETRY_RETENTION_ENABLED,
+-- TELEMETRY_RETENTION_DAYS), which archives expired days (already in
+-- telemetry_rollups, archive when TELEMETRY_ARCHIVE_ENABLED) before deleting raw rows.
+-- Only enable the native policy instead of that job, never both.
 -- SELECT add_retention_policy('telemetry', INTERVAL '90 days');
 
 -- Set up compression (compress data older than 7 days)
 -- ALTER TABLE telemetry SET (
 --     timescaledb.compress,
---     timescaledb.compress_segmentby = 'device_id, metric'
+--     timescaledb.compress_segmentby = 'device_id, metric_id'
 -- );
 -- SELECT add_compression_policy('telemetry', INTERVAL '7 days');
 
+-- ============================================
+-- Telemetry rollups (1m / 1h / 1d, maintained at ingest)
+-- ============================================
+CREATE TABLE IF NOT EXISTS telemetry_rollups (
+    resolution VARCHAR(4) NOT NULL,
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    min_value DOUBLE PRECISION NOT NULL,
+    max_value DOUBLE PRECISION NOT NULL,
+    sum_value DOUBLE PRECISION NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (resolution, device_id, metric, bucket)
+);
+
+CREATE INDEX idx_rollups_device_bucket ON telemetry_rollups(resolution, device_id, bucket DESC);
+
+-- Quantile-sketch bins per rollup bucket (sample count per logarithmic value bin)
+CREATE TABLE IF NOT EXISTS telemetry_rollup_bins (
+    resolution VARCHAR(4) NOT NULL,
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    bucket TIMESTAMPTZ NOT NULL,
+    bin INTEGER NOT NULL,
+    samples INTEGER NOT NULL,
+    PRIMARY KEY (resolution, device_id, metric, bucket, bin)
+);
+
+-- ============================================
+-- Latest value per device/metric (maintained at ingest)
+-- ============================================
+CREATE TABLE IF NOT EXISTS telemetry_latest (
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    time TIMESTAMPTZ NOT NULL,
+    value DOUBLE PRECISION NOT NULL,
+    PRIMARY KEY (device_id, metric)
+);
+
+-- ============================================
+-- Metric catalog per device (maintained at ingest)
+-- ============================================
+CREATE TABLE IF NOT EXISTS telemetry_catalog (
+    device_id UUID NOT NULL REFERENCES devices(id) ON DELETE CASCADE,
+    metric VARCHAR(50) NOT NULL,
+    first_seen TIMESTAMPTZ NOT NULL,
+    last_seen TIMESTAMPTZ NOT NULL,
+    samples BIGINT NOT NULL,
+    PRIMARY KEY (device_id, metric)
+);
+
 -- ============================================
 -- Alarms table
 -- ============================================
@@ -88,7 +157,7 @@ CREATE TABLE IF NOT EXISTS alarms (
 CREATE INDEX idx_alarms_device ON alarms(device_id);
 CREATE INDEX idx_alarms_severity ON alarms(severity);
 CREATE INDEX idx_alarms_active ON alarms(ts_close) WHERE ts_close IS NULL;
-CREATE INDEX idx_alarms_time ON alarms(ts_open DESC);
+CREATE INDEX idx_alarms_time ON alarms(ts_open DESC, id DESC);
 
 -- ============================================
 -- Commands table
@@ -107,6 +176,7 @@ CREATE TABLE IF NOT EXISTS commands (
 CREATE INDEX idx_commands_device ON commands(device_id);
 CREATE INDEX idx_commands_status ON commands(status);
 CREATE INDEX idx_commands_time ON commands(ts_sent DESC);
+CREATE INDEX idx_commands_device_time ON commands(device_id, ts_sent DESC, id DESC);
 
 -- ============================================
 -- Sample seed data